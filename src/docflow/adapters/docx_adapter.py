@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from docflow.adapters.base import DocumentAdapter
 from docx import Document
 import re
@@ -23,8 +23,10 @@ def clean_markdown_text(text: str) -> str:
 
 
 class DocxAdapter(DocumentAdapter):
-    def __init__(self, path: str):
+    def __init__(self, path: str, data: Optional[bytes] = None):
         super().__init__(Path(path))
+        # optional preloaded template bytes (avoids re-reading the file)
+        self.data = data
         self.doc = None
 
     def load(self):
@@ -33,7 +35,7 @@ class DocxAdapter(DocumentAdapter):
         last_exc = None
         while attempts < 3:
             try:
-                self.doc = Document(self.path)
+                self.doc = Document(io.BytesIO(self.data) if self.data is not None else self.path)
                 return
             except Exception as e:
                 last_exc = e
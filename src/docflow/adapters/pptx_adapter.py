@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from docflow.adapters.base import DocumentAdapter
 import re
 import io
@@ -11,12 +11,14 @@ VAR_RE = re.compile(r"{{\s*([^}]+)\s*}}")
 
 
 class PptxAdapter(DocumentAdapter):
-    def __init__(self, path: str):
+    def __init__(self, path: str, data: Optional[bytes] = None):
         super().__init__(Path(path))
+        # optional preloaded template bytes (avoids re-reading the file)
+        self.data = data
         self.prs = None
 
     def load(self):
-        self.prs = Presentation(self.path)
+        self.prs = Presentation(io.BytesIO(self.data) if self.data is not None else self.path)
 
     def list_placeholders(self) -> List[str]:
         if self.prs is None:
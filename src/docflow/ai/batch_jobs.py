@@ -0,0 +1,96 @@
+"""Offline (bulk) submission of provider requests.
+
+Provider batch APIs take a file of requests, process it within hours at a
+lower price and return a file of responses. :class:`DeferringAIClient`
+answers requests whose response is already known and otherwise records the
+request and raises :class:`RequestDeferred`, which aborts the workflow run
+that made it. The batch runner collects the deferred requests of every
+record, submits them as one job through a :class:`BatchBackend`, polls until
+the job is done and runs the deferred records again; each round answers one
+more level of generative actions.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+import copy
+import threading
+from .client import AIClient
+from .response_cache import request_key
+from ..errors import RequestDeferred
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class BatchBackend(ABC):
+    """A provider's bulk job API.
+
+    A request is ``{'custom_id', 'method', 'prompt', 'kwargs'}``; results map
+    ``custom_id`` to the ``generate_*`` response, or to ``{'error': message}``.
+    """
+
+    @abstractmethod
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        """Submit ``requests`` as one job and return its id."""
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """``in_progress``, ``completed`` or ``failed``."""
+
+    @abstractmethod
+    def results(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """Responses of a completed job keyed by ``custom_id``."""
+
+
+class DeferringAIClient(AIClient):
+    """``AIClient`` that queues unknown requests for a batch job instead of sending them."""
+
+    def __init__(self, inner: AIClient):
+        self.inner = inner
+        self.answers: Dict[str, Dict[str, Any]] = {}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if name == 'inner':  # not set yet (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def _call(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(method, prompt, kwargs, model=[getattr(self.inner, 'model', None), getattr(self.inner, 'img_model', None)])
+        with self._lock:
+            answer = self.answers.get(key)
+            if answer is None:
+                self.pending.setdefault(key, {'custom_id': key, 'method': method, 'prompt': prompt, 'kwargs': dict(kwargs)})
+        if answer is None:
+            raise RequestDeferred(f'{method} request {key[:12]} queued for the next batch job')
+        if 'error' in answer and 'text' not in answer and 'image_bytes' not in answer:
+            raise RuntimeError(f"batch request {key[:12]} failed: {answer['error']}")
+        return copy.deepcopy(answer)
+
+    def take_pending(self) -> List[Dict[str, Any]]:
+        """Requests queued since the last call (in first-seen order)."""
+        with self._lock:
+            out = list(self.pending.values())
+            self.pending.clear()
+        return out
+
+    def add_answers(self, results: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            self.answers.update(results)
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_text', prompt, kwargs)
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_image', prompt, kwargs)
+
+    def upload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return self.inner.upload_file(path, mime_type)
+
+    # retrieval needs the vectors now: never deferred
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        return self.inner.embed_texts(texts, model=model)
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
 
 
 class AIClient(ABC):
+    # how long an uploaded file stays usable on the provider (None = until deleted)
+    file_ttl_s: Optional[float] = None
+
     @abstractmethod
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         raise NotImplementedError()
@@ -17,3 +21,58 @@ class AIClient(ABC):
         Default implementation raises NotImplementedError so providers implement it when available.
         """
         raise NotImplementedError()
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        """Optional: one embedding vector per text (used by the ``vector`` KB strategy)."""
+        raise NotImplementedError()
+
+    def file_ref_to_json(self, ref: Any) -> Any:
+        """JSON-able form of an ``upload_file`` reference, persisted by the upload cache."""
+        if isinstance(ref, dict):
+            return {k: v for k, v in ref.items() if isinstance(v, (str, int, float, bool, type(None)))}
+        return ref
+
+    def file_ref_from_json(self, data: Any) -> Any:
+        """Inverse of :meth:`file_ref_to_json` (must not hit the network)."""
+        return data
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the completion as text chunks while it is generated.
+
+        The default yields the whole ``generate_text`` answer as one chunk;
+        providers with a streaming API override it.
+        """
+        text = (self.generate_text(prompt, **kwargs) or {}).get('text')
+        if text:
+            yield text
+
+    def batch_backend(self, root: Any) -> Any:
+        """``docflow.ai.batch_jobs.BatchBackend`` for offline bulk jobs, None if unsupported.
+
+        ``root`` is a directory the backend may use for its own files.
+        """
+        return None
+
+    # async interface: the defaults run the blocking call on a worker thread so
+    # every provider is usable from an event loop; providers with a native
+    # async SDK override these to avoid holding a thread per request.
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.generate_text, prompt, **kwargs)
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.generate_image, prompt, **kwargs)
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return await asyncio.to_thread(self.upload_file, path, mime_type)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        text = (await self.agenerate_text(prompt, **kwargs) or {}).get('text')
+        if text:
+            yield text
+
+
+def unwrap_client(client: Any) -> Any:
+    """The provider client underneath any wrapping clients (which expose ``.inner``)."""
+    while getattr(client, 'inner', None) is not None:
+        client = client.inner
+    return client
@@ -0,0 +1,144 @@
+"""Request coalescing ("singleflight") for provider calls.
+
+When parallel actions or batch records send the same prompt to the same
+model at the same time, :class:`CoalescingAIClient` lets the first caller
+make the provider call and has the others wait for its result instead of
+issuing their own. Callers that joined get a deep copy of the result (or the
+same exception), so mutating a response never leaks between actions.
+"""
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import copy
+import threading
+from .client import AIClient
+from .response_cache import request_key
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class CoalescingAIClient(AIClient):
+    """``AIClient`` sharing one in-flight call among identical concurrent requests.
+
+    ``stats['calls']`` counts provider calls made, ``stats['collapsed']`` the
+    requests that were answered by another caller's in-flight call.
+    """
+
+    def __init__(self, inner: AIClient):
+        self.inner = inner
+        self.stats = {'calls': 0, 'collapsed': 0}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        # per event loop: [future, followers]
+        self._ainflight: Dict[Tuple[int, str], List[Any]] = {}
+
+    def __getattr__(self, name: str):
+        if name == 'inner':  # not set yet (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def _key(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> str:
+        return request_key(method, prompt, kwargs, model=[getattr(self.inner, 'model', None), getattr(self.inner, 'img_model', None)])
+
+    def _call(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(method, prompt, kwargs)
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats['calls'] += 1
+            else:
+                flight.waiters += 1
+                self.stats['collapsed'] += 1
+        if not leader:
+            logger.info({'event': 'ai_request_coalesced', 'method': method, 'key': key[:12]})
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+        try:
+            out = getattr(self.inner, method)(prompt, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            flight.error = e
+            flight.done.set()
+            raise
+        with self._lock:
+            del self._inflight[key]
+            # no one can join once the flight is gone, so waiters is final here
+            if flight.waiters:
+                flight.result = copy.deepcopy(out)
+        flight.done.set()
+        return out
+
+    async def _acall(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        key = (id(loop), self._key(method, prompt, kwargs))
+        entry = self._ainflight.get(key)
+        if entry is not None:
+            entry[1] += 1
+            with self._lock:
+                self.stats['collapsed'] += 1
+            logger.info({'event': 'ai_request_coalesced', 'method': method, 'key': key[1][:12], 'async': True})
+            # shield: a cancelled follower must not cancel the leader's call
+            out = await asyncio.shield(entry[0])
+            return copy.deepcopy(out)
+        fut = loop.create_future()
+        entry = self._ainflight[key] = [fut, 0]
+        with self._lock:
+            self.stats['calls'] += 1
+        try:
+            out = await getattr(self.inner, 'a' + method)(prompt, **kwargs)
+        except BaseException as e:
+            del self._ainflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(e)
+                # mark retrieved so an unobserved failure doesn't warn at shutdown
+                fut.exception()
+            raise
+        del self._ainflight[key]
+        # followers resume after the leader may have mutated ``out``: hand them a pristine copy
+        fut.set_result(copy.deepcopy(out) if entry[1] else None)
+        return out
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_text', prompt, kwargs)
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_image', prompt, kwargs)
+
+    def upload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return self.inner.upload_file(path, mime_type)
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        return self.inner.embed_texts(texts, model=model)
+
+    # streams are consumed incrementally by one caller: never shared
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        return self.inner.stream_text(prompt, **kwargs)
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_text', prompt, kwargs)
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_image', prompt, kwargs)
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return await self.inner.aupload_file(path, mime_type)
+
+    def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        return self.inner.astream_text(prompt, **kwargs)
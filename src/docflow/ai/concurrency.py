@@ -0,0 +1,200 @@
+"""Adaptive (AIMD) concurrency limit for provider calls.
+
+:class:`AdaptiveLimiter` caps the number of in-flight calls to one provider.
+Every healthy response (no error, latency within tolerance of the best
+recent latency) raises the limit by ``1/limit`` (about +1 per "window" of
+calls); a throttling or timeout error multiplies it by ``backoff``, at most
+once per recent round-trip so a burst of failures from the same window
+counts as one congestion signal. Other errors leave the limit alone.
+
+Sync callers block on a ``threading.Event``; async callers await a future
+woken thread-safely, so threads and event loops share one limiter.
+"""
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Deque, Dict, Optional
+import asyncio
+import threading
+import time
+from .retry import RATE_LIMIT, classify_error
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+_TIMEOUT_NAMES = ('Timeout', 'DeadlineExceeded')
+
+
+def is_congestion_error(exc: BaseException) -> bool:
+    """Throttling or timeout: the signals that make the limit back off."""
+    if classify_error(exc) == RATE_LIMIT or isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any(marker in cls.__name__ for cls in type(exc).__mro__ for marker in _TIMEOUT_NAMES)
+
+
+def _wake_future(fut: 'asyncio.Future'):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent calls, with queue metrics (thread- and asyncio-safe)."""
+
+    def __init__(self, name: str, initial: int = 4, min_limit: int = 1, max_limit: int = 64,
+                 backoff: float = 0.5, latency_tolerance: float = 2.0, latency_target_s: Optional[float] = None,
+                 window: int = 50):
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        # fixed healthy-latency ceiling; None = tolerance x best recent latency
+        self.latency_target_s = latency_target_s
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.increases = 0
+        self.decreases = 0
+        self.errors = 0
+        self._latencies: Deque[float] = deque(maxlen=max(1, window))
+        self._last_decrease = 0.0
+        self._waiters: Deque[Any] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'limit': int(self.limit), 'in_flight': self.in_flight, 'queue_depth': len(self._waiters),
+                    'max_queue_depth': self.max_queue_depth, 'increases': self.increases,
+                    'decreases': self.decreases, 'errors': self.errors}
+
+    # -- slots -------------------------------------------------------------
+
+    def _take_or_enqueue(self, waiter: Any) -> bool:
+        """Take a free slot (True) or queue ``waiter`` behind earlier callers (False)."""
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            self._waiters.append(waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+            return False
+
+    def _wake(self):
+        # called with the lock held: hand freed slots to queued callers in order
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, fut = waiter
+                loop.call_soon_threadsafe(_wake_future, fut)
+
+    def acquire(self):
+        event = threading.Event()
+        if not self._take_or_enqueue(event):
+            event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        if self._take_or_enqueue(waiter):
+            return
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    handed = False
+                except ValueError:
+                    handed = True  # a slot was handed over just before the cancel
+            if handed:
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    # -- feedback ----------------------------------------------------------
+
+    def _healthy_latency(self, latency: float) -> bool:
+        if self.latency_target_s is not None:
+            return latency <= self.latency_target_s
+        if not self._latencies:
+            return True
+        return latency <= self.latency_tolerance * min(self._latencies)
+
+    def release(self, latency: float, error: Optional[BaseException] = None):
+        """Free the slot and adapt the limit to the call's outcome."""
+        with self._lock:
+            self.in_flight -= 1
+            old = int(self.limit)
+            if error is None:
+                if self._healthy_latency(latency):
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                self._latencies.append(latency)
+            else:
+                self.errors += 1
+                now = time.monotonic()
+                # one decrease per round-trip: calls of the same window fail together
+                recent = min(self._latencies) if self._latencies else 0.0
+                if is_congestion_error(error) and now - self._last_decrease >= recent:
+                    self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                    self._last_decrease = now
+                    self.decreases += 1
+            new = int(self.limit)
+            if new > old:
+                self.increases += 1
+            self._wake()
+            depth = len(self._waiters)
+        if new != old:
+            logger.info({'event': 'concurrency_limit_changed', 'limiter': self.name, 'limit': new,
+                         'previous': old, 'queue_depth': depth})
+
+    @contextmanager
+    def slot(self):
+        """``with limiter.slot(): call()`` — wait for a slot, then report the outcome."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(time.monotonic() - start, e)
+            raise
+        except BaseException:
+            self._release_slot()  # cancelled/interrupted: says nothing about the provider
+            raise
+        self.release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(time.monotonic() - start, e)
+            raise
+        except BaseException:
+            self._release_slot()  # cancelled/interrupted: says nothing about the provider
+            raise
+        self.release(time.monotonic() - start)
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(name: str, **settings) -> AdaptiveLimiter:
+    """Process-wide limiter of provider ``name`` (shared by actions and batch records)."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter(name, **settings)
+        return limiter
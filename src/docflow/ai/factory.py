@@ -1,5 +1,9 @@
 import os
 from ..ai.client import AIClient
+from ..ai.coalesce import CoalescingAIClient
+from ..ai.hedge import HedgingAIClient
+from ..ai.ratelimit import RateLimiter, RateLimitedAIClient
+from ..ai.providers.cassette import CassetteProvider, RECORD
 from ..ai.providers.mock import MockProvider
 from ..logging_lib import setup_logger
 
@@ -17,6 +21,41 @@ except Exception:  # pragma: no cover
 
 
 def make_ai_client(cfg: dict) -> AIClient:
+    """Provider client for ``cfg``, wrapped so identical concurrent requests share one call.
+
+    ``rate_limit: {'rpm', 'tpm', 'state_dir'}`` makes every call wait for the
+    host-wide budget of this provider and model. ``hedge: {'percentile',
+    'min_samples', 'max_extra_ratio', 'min_delay_s', 'fallback'}`` duplicates
+    slow text calls, to the ``fallback`` client config (same keys as ``cfg``)
+    when given. Pass ``coalesce: False`` to skip coalescing.
+
+    ``provider: 'cassette'`` replays ``cassette: {'path'}``; with ``mode:
+    'record'`` it records ``cassette['provider']`` (built from the same
+    model and key) to that path instead.
+    """
+    client = _make_limited(cfg)
+    hedge = cfg.get('hedge')
+    if hedge:
+        hedge = dict(hedge)
+        fallback = hedge.pop('fallback', None)
+        secondary = _make_limited(fallback) if fallback else None
+        client = HedgingAIClient(client, secondary, **hedge)
+    if cfg.get('coalesce', True):
+        client = CoalescingAIClient(client)
+    return client
+
+
+def _make_limited(cfg: dict) -> AIClient:
+    client = _make_provider(cfg)
+    rl = cfg.get('rate_limit') or {}
+    if rl.get('rpm') or rl.get('tpm'):
+        name = f"{cfg.get('provider', 'mock')}-{cfg.get('model') or 'default'}"
+        client = RateLimitedAIClient(client, RateLimiter(name, rpm=rl.get('rpm'), tpm=rl.get('tpm'),
+                                                         state_dir=rl.get('state_dir')))
+    return client
+
+
+def _make_provider(cfg: dict) -> AIClient:
     kind = cfg.get('provider', 'mock')
     api_key_env = cfg.get('api_key_envvar')
     api_key = os.environ.get(api_key_env) if api_key_env else None
@@ -24,15 +63,22 @@ def make_ai_client(cfg: dict) -> AIClient:
     logger.info({'event': 'ai_client_make_start', 'provider': kind, 'model': model})
     if kind == 'mock':
         logger.info({'event': 'ai_client_selected', 'provider': 'mock'})
-        return MockProvider(model=model)
+        return MockProvider(model=model, **(cfg.get('mock') or {}))
     if kind == 'openai':
         if OpenAIProvider is None:
             raise RuntimeError('OpenAI provider requested but dependencies not installed')
         logger.info({'event': 'ai_client_selected', 'provider': 'openai'})
-        return OpenAIProvider(api_key=api_key, model=model)  # type: ignore
+        return OpenAIProvider(api_key=api_key, model=model, timeout_s=cfg.get('timeout_s'),
+                              pool_size=cfg.get('http_pool_size', 10))  # type: ignore
     if kind == 'gemini':
         if GeminiProvider is None:
             raise RuntimeError('Gemini provider requested but dependencies not installed')
         logger.info({'event': 'ai_client_selected', 'provider': 'gemini'})
-        return GeminiProvider(api_key=api_key, model=model)  # type: ignore
+        return GeminiProvider(api_key=api_key, model=model, timeout_s=cfg.get('timeout_s'))  # type: ignore
+    if kind == 'cassette':
+        cc = cfg.get('cassette') or {}
+        mode = cc.get('mode', 'replay')
+        inner = _make_provider({**cfg, 'provider': cc.get('provider', 'mock')}) if mode == RECORD else None
+        logger.info({'event': 'ai_client_selected', 'provider': 'cassette', 'mode': mode, 'path': str(cc.get('path'))})
+        return CassetteProvider(cc.get('path'), mode=mode, inner=inner, model=model)
     raise ValueError(f"Unknown AI provider '{kind}'")
@@ -0,0 +1,231 @@
+"""Hedged ``generate_text`` calls to cut tail latency.
+
+:class:`HedgingAIClient` measures the latency of every call per model. Once
+a call has been running longer than the configured percentile of recent
+latencies, it sends a duplicate request — to a secondary provider when one
+is configured (e.g. Gemini behind OpenAI), else to the same one — and
+returns whichever answer arrives first. The loser is cancelled where
+possible: async calls are cancelled outright, sync calls that have not
+started yet are dropped and running ones are left to finish in the
+background. Hedges are capped at ``max_extra_ratio`` of all calls, which
+bounds the extra spend.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+import asyncio
+import math
+import threading
+import time
+from .client import AIClient
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per model."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Any, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: Any, latency: float):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(latency)
+
+    def count(self, model: Any) -> int:
+        with self._lock:
+            return len(self._samples.get(model, ()))
+
+    def percentile(self, model: Any, pct: float) -> Optional[float]:
+        """Nearest-rank ``pct`` percentile of ``model``'s recent latencies (None without samples)."""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if not samples:
+            return None
+        rank = max(1, min(len(samples), math.ceil(pct / 100.0 * len(samples))))
+        return samples[rank - 1]
+
+
+class HedgingAIClient(AIClient):
+    """``AIClient`` that duplicates slow ``generate_text`` calls and keeps the first answer.
+
+    ``stats``: ``calls``, ``hedged`` (duplicates sent), ``hedge_wins``
+    (duplicate answered first) and ``over_budget`` (hedges skipped by the cap).
+    """
+
+    def __init__(self, inner: AIClient, secondary: Optional[AIClient] = None, percentile: float = 95.0,
+                 min_samples: int = 20, max_extra_ratio: float = 0.1, min_delay_s: float = 0.0,
+                 tracker: Optional[LatencyTracker] = None, min_workers: int = 4):
+        self.inner = inner
+        self.secondary = secondary
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_extra_ratio = max_extra_ratio
+        self.min_delay_s = min_delay_s
+        self.tracker = tracker or LatencyTracker()
+        self.stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'over_budget': 0}
+        self._min_workers = max(2, min_workers)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_size = 0
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if name == 'inner':  # not set yet (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    # -- policy ------------------------------------------------------------
+
+    def _model(self) -> Any:
+        return getattr(self.inner, 'model', None)
+
+    def _threshold(self) -> Optional[float]:
+        """Seconds after which a call gets hedged, None while too few latencies are known."""
+        model = self._model()
+        if self.tracker.count(model) < self.min_samples:
+            return None
+        return max(self.min_delay_s, self.tracker.percentile(model, self.percentile))
+
+    def _start_call(self) -> Optional[float]:
+        with self._lock:
+            self.stats['calls'] += 1
+        return self._threshold()
+
+    def _reserve_hedge(self) -> bool:
+        with self._lock:
+            if self.stats['hedged'] + 1 > self.max_extra_ratio * self.stats['calls']:
+                self.stats['over_budget'] += 1
+                return False
+            self.stats['hedged'] += 1
+            return True
+
+    def _hedge_target(self, kwargs: Dict[str, Any]) -> AIClient:
+        # uploaded attachments belong to the primary provider: hedge on the same one
+        if self.secondary is None or kwargs.get('attachments'):
+            return self.inner
+        return self.secondary
+
+    def _won(self, out: Dict[str, Any], hedge: bool, threshold: float) -> Dict[str, Any]:
+        if isinstance(out, dict):
+            out.setdefault('meta', {}).update({'hedged': True, 'hedge_winner': 'hedge' if hedge else 'primary'})
+        if hedge:
+            with self._lock:
+                self.stats['hedge_wins'] += 1
+        logger.info({'event': 'ai_request_hedged', 'winner': 'hedge' if hedge else 'primary',
+                     'threshold_s': round(threshold, 3)})
+        return out
+
+    # -- sync --------------------------------------------------------------
+
+    def _submit(self, fn: Callable[..., Any], *args) -> Future:
+        # the pool grows with the calls in flight (losers still running
+        # included), so a call never queues behind other callers' requests
+        with self._lock:
+            self._busy += 1
+            if self._pool_size < max(self._min_workers, self._busy):
+                old = self._pool
+                self._pool_size = max(self._min_workers, 2 * self._busy)
+                self._pool = ThreadPoolExecutor(max_workers=self._pool_size, thread_name_prefix='docflow-hedge')
+                if old is not None:
+                    old.shutdown(wait=False)  # its running calls finish, idle threads exit
+            fut = self._pool.submit(fn, *args)
+        fut.add_done_callback(self._task_done)
+        return fut
+
+    def _task_done(self, _fut: Future):
+        with self._lock:
+            self._busy -= 1
+
+    def _timed(self, fn: Callable[..., Dict[str, Any]], prompt: str, kwargs: Dict[str, Any], record: bool):
+        start = time.monotonic()
+        out = fn(prompt, **kwargs)
+        if record:
+            # a primary call that lost the race still finishes here: its true latency is kept
+            self.tracker.record(self._model(), time.monotonic() - start)
+        return out
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        threshold = self._start_call()
+        if threshold is None:
+            return self._timed(self.inner.generate_text, prompt, kwargs, True)
+        primary = self._submit(self._timed, self.inner.generate_text, prompt, kwargs, True)
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._reserve_hedge():
+            return primary.result()
+        target = self._hedge_target(kwargs)
+        hedge = self._submit(self._timed, target.generate_text, prompt, kwargs, target is self.inner)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return self._won(fut.result(), fut is hedge, threshold)
+        # both failed: the primary's error is the meaningful one
+        return primary.result()
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self.inner.generate_image(prompt, **kwargs)
+
+    def upload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return self.inner.upload_file(path, mime_type)
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        return self.inner.embed_texts(texts, model=model)
+
+    # a stream is consumed as it arrives: never hedged
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        return self.inner.stream_text(prompt, **kwargs)
+
+    # -- async -------------------------------------------------------------
+
+    async def _atimed(self, client: AIClient, prompt: str, kwargs: Dict[str, Any], record: bool):
+        start = time.monotonic()
+        try:
+            out = await client.agenerate_text(prompt, **kwargs)
+        except asyncio.CancelledError:
+            if record:
+                # the loser's real latency is unknown but at least this long
+                self.tracker.record(self._model(), time.monotonic() - start)
+            raise
+        if record:
+            self.tracker.record(self._model(), time.monotonic() - start)
+        return out
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        threshold = self._start_call()
+        if threshold is None:
+            return await self._atimed(self.inner, prompt, kwargs, True)
+        primary = asyncio.ensure_future(self._atimed(self.inner, prompt, kwargs, True))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done or not self._reserve_hedge():
+                return await primary
+            target = self._hedge_target(kwargs)
+            hedge = asyncio.ensure_future(self._atimed(target, prompt, kwargs, target is self.inner))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._won(task.result(), task is hedge, threshold)
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self.inner.agenerate_image(prompt, **kwargs)
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return await self.inner.aupload_file(path, mime_type)
+
+    def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        return self.inner.astream_text(prompt, **kwargs)
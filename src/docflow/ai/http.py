@@ -0,0 +1,69 @@
+"""Connections shared by the providers of one process.
+
+Providers used to open a fresh connection (or SDK client) per call. Here
+plain HTTP goes through one keep-alive :class:`requests.Session` per pool
+size, SDK clients are built once per configuration with
+:func:`shared_client`, and :func:`download` streams a response body straight
+to a file instead of buffering it in memory.
+"""
+from typing import Any, Callable, Dict, Hashable, Optional
+from pathlib import Path
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+_CHUNK = 1 << 16
+
+_sessions: Dict[int, requests.Session] = {}
+_clients: Dict[Hashable, Any] = {}
+_lock = threading.Lock()
+
+
+def http_session(pool_size: int = 10) -> requests.Session:
+    """Process-wide keep-alive session holding at most ``pool_size`` connections per host."""
+    with _lock:
+        session = _sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[pool_size] = session
+        return session
+
+
+def shared_client(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """The SDK client built by ``factory`` for ``key``, created on first use."""
+    with _lock:
+        client = _clients.get(key)
+    if client is None:
+        client = factory()
+        with _lock:
+            # another thread may have won the race: keep the first one
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def download(url: str, dest: Any, timeout: Optional[float] = None, pool_size: int = 10) -> int:
+    """Stream ``url`` into ``dest`` (written atomically) and return the byte count."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f'.{dest.name}.{os.getpid()}.{threading.get_ident()}.part')
+    size = 0
+    try:
+        with http_session(pool_size).get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            with open(tmp, 'wb') as fh:
+                for block in resp.iter_content(chunk_size=_CHUNK):
+                    fh.write(block)
+                    size += len(block)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    logger.info({'event': 'http_download', 'path': str(dest), 'bytes': size})
+    return size
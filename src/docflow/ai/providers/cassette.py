@@ -0,0 +1,182 @@
+"""Record provider traffic to a cassette and replay it without the network.
+
+In ``record`` mode :class:`CassetteProvider` forwards every ``generate_text``,
+``generate_image`` and ``upload_file`` call to a real provider and appends
+the response to the cassette, a JSON-lines file with one entry per distinct
+request (``{'method', 'key', 'response'}``; image bytes are base64). In
+``replay`` mode the same requests are answered from memory, with no network
+and no latency, so the rest of the pipeline (KB, code actions, adapters) can
+be benchmarked and profiled on realistic payloads. A request missing from
+the cassette raises :class:`CassetteMiss`.
+
+Requests are keyed like the response cache (prompt, attachments and
+generation kwargs, not the model), uploads by content hash and MIME type.
+"""
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from pathlib import Path
+import asyncio
+import json
+import threading
+import time
+from ..client import AIClient
+from ..ratelimit import file_lock
+from ..response_cache import request_key
+from ..upload_cache import file_digest
+from ...core.cache import decode_value, encode_value
+from ...errors import CassetteMiss
+from docflow.logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+class CassetteProvider(AIClient):
+    def __init__(self, path: Any, mode: str = REPLAY, inner: Optional[AIClient] = None, model: Optional[str] = None):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"cassette mode must be '{RECORD}' or '{REPLAY}', got '{mode}'")
+        if mode == RECORD and inner is None:
+            raise ValueError('recording a cassette needs the provider to record')
+        self.path = Path(path)
+        self.mode = mode
+        # not ``inner``: the cassette is the provider as far as unwrap_client goes
+        self.source = inner if mode == RECORD else None
+        self.model = model or getattr(inner, 'model', None) or 'cassette'
+        self.img_model = getattr(inner, 'img_model', None)
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0}
+        self._entries: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            if self.mode == REPLAY:
+                raise FileNotFoundError(f'cassette not found: {self.path}')
+            return
+        with self.path.open('r', encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    entry = json.loads(line)
+                    # the first recording of a request wins
+                    self._entries.setdefault(entry['key'], entry['response'])
+        logger.info({'event': 'cassette_loaded', 'path': str(self.path), 'mode': self.mode,
+                     'entries': len(self._entries)})
+
+    def _ref_json(self, ref: Any) -> Any:
+        return self.source.file_ref_to_json(ref) if self.source is not None else ref
+
+    def _key(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> str:
+        kw = dict(kwargs)
+        if kw.get('attachments'):
+            # uploaded refs in the JSON form replay hands out, so both modes agree
+            kw['attachments'] = [self._ref_json(a) for a in kw['attachments']]
+        return f'{method}:{request_key(method, prompt, kw)}'
+
+    def _upload_key(self, path: str, mime_type: Optional[str]) -> str:
+        return f'upload_file:{file_digest(path)}:{mime_type or ""}'
+
+    def _replay(self, key: str) -> Any:
+        with self._lock:
+            encoded = self._entries.get(key)
+            self.stats['missed' if encoded is None else 'replayed'] += 1
+        if encoded is None:
+            raise CassetteMiss(f'{key[:40]} was not recorded in {self.path}')
+        return decode_value(encoded)
+
+    def _record(self, method: str, key: str, response: Any):
+        if isinstance(response, dict):
+            if (response.get('meta') or {}).get('error'):
+                return
+            if response.get('image_path'):
+                # streamed to the caller's file: keep the bytes, not the path
+                response = {**{k: v for k, v in response.items() if k != 'image_path'},
+                            'image_bytes': Path(response['image_path']).read_bytes()}
+        encoded = encode_value(response)
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = encoded
+            self.stats['recorded'] += 1
+        line = json.dumps({'method': method, 'key': key, 'response': encoded}, separators=(',', ':'))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # batch workers in other processes may append to the same cassette
+        with file_lock(self.path.with_name(self.path.name + '.lock')):
+            with self.path.open('a', encoding='utf-8') as fh:
+                fh.write(line + '\n')
+
+    def _answer(self, key: str) -> Dict[str, Any]:
+        t0 = time.time()
+        out = self._replay(key)
+        meta = out.get('meta') or {}
+        out['meta'] = {**meta, 'cassette': REPLAY, 'recorded_latency': meta.get('latency'), 'latency': time.time() - t0}
+        return out
+
+    def _call(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(method, prompt, kwargs)
+        if self.mode == REPLAY:
+            return self._answer(key)
+        out = getattr(self.source, method)(prompt, **kwargs)
+        self._record(method, key, out)
+        return out
+
+    async def _acall(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(method, prompt, kwargs)
+        if self.mode == REPLAY:
+            return self._answer(key)
+        out = await getattr(self.source, 'a' + method)(prompt, **kwargs)
+        await asyncio.to_thread(self._record, method, key, out)
+        return out
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_text', prompt, kwargs)
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_image', prompt, kwargs)
+
+    def upload_file(self, path: str, mime_type: str | None = None) -> Any:
+        key = self._upload_key(path, mime_type)
+        if self.mode == REPLAY:
+            return self._replay(key)
+        ref = self.source.upload_file(path, mime_type)
+        self._record('upload_file', key, self._ref_json(ref))
+        return ref
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        key = f'embed_texts:{request_key("embed_texts", json.dumps(texts), {"model": model})}'
+        if self.mode == REPLAY:
+            return self._replay(key)
+        out = self.source.embed_texts(texts, model=model)
+        self._record('embed_texts', key, out)
+        return out
+
+    def file_ref_to_json(self, ref: Any) -> Any:
+        return self._ref_json(ref)
+
+    def file_ref_from_json(self, data: Any) -> Any:
+        return self.source.file_ref_from_json(data) if self.source is not None else data
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        # recorded as a whole completion, replayed as one chunk
+        text = self.generate_text(prompt, **kwargs).get('text')
+        if text:
+            yield text
+
+    # replay answers inline on the loop; recording awaits the real provider
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_text', prompt, kwargs)
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_image', prompt, kwargs)
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        if self.mode == REPLAY:
+            return self.upload_file(path, mime_type)
+        ref = await self.source.aupload_file(path, mime_type)
+        await asyncio.to_thread(self._record, 'upload_file', self._upload_key(path, mime_type), self._ref_json(ref))
+        return ref
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        text = (await self.agenerate_text(prompt, **kwargs)).get('text')
+        if text:
+            yield text
@@ -1,5 +1,7 @@
 from ..client import AIClient
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, Iterator, List
+import asyncio
+import threading
 import time
 import os
 from docflow.logging_lib import setup_logger
@@ -12,60 +14,132 @@ except ImportError:  # pragma: no cover
     genai = None  # type: ignore
 
 
+def _extract_text(resp: Any) -> str:
+    if hasattr(resp, 'text') and resp.text:
+        return resp.text
+    if hasattr(resp, 'candidates') and resp.candidates:  # concatenate candidate parts
+        parts = []
+        for c in resp.candidates:
+            content = getattr(c, 'content', None)
+            if content and getattr(content, 'parts', None):
+                for part in content.parts:
+                    val = getattr(part, 'text', None)
+                    if val:
+                        parts.append(val)
+        return '\n'.join(parts) if parts else ''
+    return str(resp)
+
+
 class GeminiProvider(AIClient):
-    def __init__(self, api_key: str | None = None, model: str | None = None):
+    # the Files API deletes uploads after 48h; keep a margin
+    file_ttl_s = 47 * 3600
+
+    def __init__(self, api_key: str | None = None, model: str | None = None, timeout_s: float | None = None):
         if genai is None:
             raise RuntimeError('google-generativeai package not installed')
         if api_key:
             os.environ['GOOGLE_API_KEY'] = api_key
             genai.configure(api_key=api_key)  # type: ignore
         self.model = model or 'gemini-1'
+        self.timeout_s = timeout_s
+        # GenerativeModel handles are reusable: build one per model name
+        self._handles: Dict[str, Any] = {}
+        self._handles_lock = threading.Lock()
         logger.info({'event': 'gemini_init', 'model': self.model})
 
+    def _model_handle(self, name: str | None = None) -> Any:
+        if not hasattr(genai, 'GenerativeModel'):
+            raise RuntimeError('GenerativeModel API not present in google-generativeai package')
+        name = name or self.model
+        with self._handles_lock:
+            handle = self._handles.get(name)
+            if handle is None:
+                handle = self._handles[name] = genai.GenerativeModel(name)  # type: ignore
+            return handle
+
+    def _request_kwargs(self) -> Dict[str, Any]:
+        return {'request_options': {'timeout': self.timeout_s}} if self.timeout_s else {}
+
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         t0 = time.time()
         if genai is None:  # defensive; constructor prevents this
             raise RuntimeError('Gemini SDK unavailable')
         logger.info({'event': 'gemini_generate_text_start', 'model': self.model, 'chars': len(prompt)})
         try:
-            if not hasattr(genai, 'GenerativeModel'):
-                raise RuntimeError('GenerativeModel API not present in google-generativeai package')
-            gmodel = genai.GenerativeModel(self.model)  # type: ignore
-            resp = gmodel.generate_content(prompt)  # modern SDK call
-            # extract text
-            if hasattr(resp, 'text') and resp.text:
-                text = resp.text
-            elif hasattr(resp, 'candidates') and resp.candidates:  # concatenate candidate parts
-                parts = []
-                for c in resp.candidates:
-                    content = getattr(c, 'content', None)
-                    if content and getattr(content, 'parts', None):
-                        for part in content.parts:
-                            val = getattr(part, 'text', None)
-                            if val:
-                                parts.append(val)
-                text = '\n'.join(parts) if parts else ''
-            else:
-                text = str(resp)
+            gmodel = self._model_handle()
+            resp = gmodel.generate_content(prompt, **self._request_kwargs())  # modern SDK call
+            text = _extract_text(resp)
             latency = time.time() - t0
             logger.info({'event': 'gemini_generate_text_end', 'model': self.model, 'latency': latency, 'out_chars': len(text)})
             return {'text': text, 'meta': {'provider': 'gemini', 'model': self.model, 'latency': latency}}
         except Exception as e:  # no fallback, just classify error
+            self._raise_text_error(e, t0)
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        t0 = time.time()
+        if genai is None:  # defensive; constructor prevents this
+            raise RuntimeError('Gemini SDK unavailable')
+        logger.info({'event': 'gemini_generate_text_start', 'model': self.model, 'chars': len(prompt), 'async': True})
+        try:
+            gmodel = self._model_handle()
+            if not hasattr(gmodel, 'generate_content_async'):
+                return await super().agenerate_text(prompt, **kwargs)
+            resp = await gmodel.generate_content_async(prompt, **self._request_kwargs())
+            text = _extract_text(resp)
             latency = time.time() - t0
-            msg = str(e)
-            structured = {'event': 'gemini_generate_text_error', 'model': self.model, 'latency': latency, 'error': msg}
-            # detect invalid API key to raise cleaner actionable error
-            if 'API key not valid' in msg or 'API_KEY_INVALID' in msg:
-                structured['category'] = 'auth'
-                structured['auth_error'] = 'invalid_api_key'
-                logger.info(structured)
-                try:
-                    from docflow.errors import ActionError
-                except Exception:  # pragma: no cover - defensive
-                    raise RuntimeError('Gemini API key invalid. Provide a valid GEMINI_API_KEY.') from e
-                raise ActionError('Gemini API key invalid. Set a valid GEMINI_API_KEY environment variable or update config.ai.api_key.') from e
+            logger.info({'event': 'gemini_generate_text_end', 'model': self.model, 'latency': latency, 'out_chars': len(text), 'async': True})
+            return {'text': text, 'meta': {'provider': 'gemini', 'model': self.model, 'latency': latency}}
+        except Exception as e:  # no fallback, just classify error
+            self._raise_text_error(e, t0)
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        t0 = time.time()
+        if genai is None:
+            raise RuntimeError('Gemini SDK unavailable')
+        logger.info({'event': 'gemini_generate_text_start', 'model': self.model, 'chars': len(prompt), 'stream': True})
+        try:
+            gmodel = self._model_handle()
+            for chunk in gmodel.generate_content(prompt, stream=True, **self._request_kwargs()):
+                text = _extract_text(chunk)
+                if text:
+                    yield text
+        except Exception as e:
+            self._raise_text_error(e, t0)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        t0 = time.time()
+        if genai is None:
+            raise RuntimeError('Gemini SDK unavailable')
+        gmodel = self._model_handle()
+        if not hasattr(gmodel, 'generate_content_async'):
+            async for piece in super().astream_text(prompt, **kwargs):
+                yield piece
+            return
+        logger.info({'event': 'gemini_generate_text_start', 'model': self.model, 'chars': len(prompt), 'stream': True, 'async': True})
+        try:
+            async for chunk in await gmodel.generate_content_async(prompt, stream=True, **self._request_kwargs()):
+                text = _extract_text(chunk)
+                if text:
+                    yield text
+        except Exception as e:
+            self._raise_text_error(e, t0)
+
+    def _raise_text_error(self, e: Exception, t0: float):
+        latency = time.time() - t0
+        msg = str(e)
+        structured = {'event': 'gemini_generate_text_error', 'model': self.model, 'latency': latency, 'error': msg}
+        # detect invalid API key to raise cleaner actionable error
+        if 'API key not valid' in msg or 'API_KEY_INVALID' in msg:
+            structured['category'] = 'auth'
+            structured['auth_error'] = 'invalid_api_key'
             logger.info(structured)
-            raise
+            try:
+                from docflow.errors import ActionError
+            except Exception:  # pragma: no cover - defensive
+                raise RuntimeError('Gemini API key invalid. Provide a valid GEMINI_API_KEY.') from e
+            raise ActionError('Gemini API key invalid. Set a valid GEMINI_API_KEY environment variable or update config.ai.api_key.') from e
+        logger.info(structured)
+        raise e
 
     def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
         t0 = time.time()
@@ -73,9 +147,7 @@ class GeminiProvider(AIClient):
             raise RuntimeError('Gemini SDK unavailable')
         model = kwargs.get('model') or self.model
         logger.info({'event': 'gemini_generate_image_start', 'model': model, 'chars': len(prompt)})
-        if not hasattr(genai, 'GenerativeModel'):
-            raise RuntimeError('GenerativeModel API missing in installed gemini SDK')
-        gmodel = genai.GenerativeModel(model)  # type: ignore
+        gmodel = self._model_handle(model)
         # try modern generate_image / generate_images / generate_content order
         call_resp = None
         for attr in ('generate_image', 'generate_images', 'generate_content'):
@@ -85,6 +157,24 @@ class GeminiProvider(AIClient):
                 break
         if call_resp is None:
             raise RuntimeError('No usable image generation method found')
+        return self._image_result(call_resp, model, t0)
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        t0 = time.time()
+        if genai is None:
+            raise RuntimeError('Gemini SDK unavailable')
+        model = kwargs.get('model') or self.model
+        gmodel = self._model_handle(model)
+        # the SDK only has an async form of generate_content; the dedicated
+        # image methods (when the sync path would pick them) run on a thread
+        if (hasattr(gmodel, 'generate_image') or hasattr(gmodel, 'generate_images')
+                or not hasattr(gmodel, 'generate_content_async')):
+            return await super().agenerate_image(prompt, **kwargs)
+        logger.info({'event': 'gemini_generate_image_start', 'model': model, 'chars': len(prompt), 'async': True})
+        call_resp = await gmodel.generate_content_async(prompt)
+        return self._image_result(call_resp, model, t0)
+
+    def _image_result(self, call_resp: Any, model: str, t0: float) -> Dict[str, Any]:
         # naive extraction; expect SDK to expose .images[0].base64_data or similar
         b64_data = None
         images = getattr(call_resp, 'images', None)
@@ -103,6 +193,13 @@ class GeminiProvider(AIClient):
         logger.info({'event': 'gemini_generate_image_end', 'model': model, 'latency': latency, 'bytes': len(img_bytes)})
         return {'image_bytes': img_bytes, 'meta': {'provider': 'gemini', 'model': model, 'latency': latency}}
 
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        if genai is None or not hasattr(genai, 'embed_content'):
+            raise NotImplementedError('Gemini embeddings not available')
+        resp = genai.embed_content(model=model or 'models/text-embedding-004', content=texts,  # type: ignore
+                                   **self._request_kwargs())
+        return resp['embedding']
+
     def upload_file(self, path: str, mime_type: str | None = None) -> Any:
         if genai is None or not hasattr(genai, 'upload_file'):
             raise NotImplementedError('Gemini upload not available')
@@ -110,3 +207,13 @@ class GeminiProvider(AIClient):
         remote = genai.upload_file(path=str(path), mime_type=mime_type or 'application/octet-stream')  # type: ignore
         logger.info({'event': 'gemini_upload_end', 'path': path, 'remote': str(remote)})
         return remote
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        # google-generativeai has no async Files API: the upload runs on a worker thread
+        return await asyncio.to_thread(self.upload_file, path, mime_type)
+
+    def file_ref_to_json(self, ref: Any) -> Any:
+        if isinstance(ref, dict):
+            return super().file_ref_to_json(ref)
+        return {'name': getattr(ref, 'name', None), 'uri': getattr(ref, 'uri', None),
+                'mime_type': getattr(ref, 'mime_type', None)}
@@ -1,31 +1,266 @@
+from ..batch_jobs import COMPLETED, FAILED, IN_PROGRESS, BatchBackend
 from ..client import AIClient
-from typing import Dict, Any
+from ...core.cache import decode_value, encode_value
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from pathlib import Path
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import struct
+import threading
 import time
+import uuid
+import zlib
 from docflow.logging_lib import setup_logger
 
 logger = setup_logger()
 
 
+class MockBatchBackend(BatchBackend):
+    """File-based stand-in for a provider batch API, for offline tests and dry runs.
+
+    ``submit`` writes ``<root>/<job_id>/input.jsonl``; once ``complete_after_s``
+    has passed, the first ``status`` poll answers every line with ``provider``
+    and writes ``output.jsonl``, the way a provider returns a result file.
+    """
+
+    def __init__(self, root: Any, provider: AIClient | None = None, complete_after_s: float = 0.0):
+        self.root = Path(root)
+        self.provider = provider or MockProvider()
+        self.complete_after_s = complete_after_s
+        self.jobs_submitted = 0
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def _write_json(self, path: Path, data: Any):
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp, path)
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        job_id = f'batch_{uuid.uuid4().hex[:16]}'
+        job_dir = self._job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        with (job_dir / 'input.jsonl').open('w', encoding='utf-8') as fh:
+            for req in requests:
+                fh.write(json.dumps(encode_value(req), default=str) + '\n')
+        self._write_json(job_dir / 'job.json', {'id': job_id, 'status': IN_PROGRESS, 'created_at': time.time(),
+                                                'requests': len(requests)})
+        with self._lock:
+            self.jobs_submitted += 1
+        logger.info({'event': 'mock_batch_submitted', 'job_id': job_id, 'requests': len(requests)})
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        job_path = self._job_dir(job_id) / 'job.json'
+        job = json.loads(job_path.read_text(encoding='utf-8'))
+        if job['status'] == IN_PROGRESS and time.time() - job['created_at'] >= self.complete_after_s:
+            job['status'] = self._process(job_id)
+            self._write_json(job_path, job)
+        return job['status']
+
+    def _process(self, job_id: str) -> str:
+        job_dir = self._job_dir(job_id)
+        try:
+            with (job_dir / 'input.jsonl').open('r', encoding='utf-8') as src, \
+                    (job_dir / 'output.jsonl').open('w', encoding='utf-8') as dst:
+                for line in src:
+                    req = decode_value(json.loads(line))
+                    try:
+                        response = getattr(self.provider, req['method'])(req['prompt'], **req.get('kwargs', {}))
+                    except Exception as e:
+                        response = {'error': str(e)}
+                    dst.write(json.dumps({'custom_id': req['custom_id'], 'response': encode_value(response)}) + '\n')
+        except Exception as e:
+            logger.info({'event': 'mock_batch_failed', 'job_id': job_id, 'error': str(e)})
+            return FAILED
+        return COMPLETED
+
+    def results(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        with (self._job_dir(job_id) / 'output.jsonl').open('r', encoding='utf-8') as fh:
+            for line in fh:
+                row = json.loads(line)
+                out[row['custom_id']] = decode_value(row['response'])
+        return out
+
+
+class MockProviderError(Exception):
+    """Simulated provider failure (HTTP 503, retried as transient)."""
+    status_code = 503
+
+
+class MockRateLimitError(MockProviderError):
+    """Simulated throttling (HTTP 429)."""
+    status_code = 429
+
+
+LATENCY_KINDS = ('none', 'fixed', 'normal', 'longtail')
+
+
+def _noise_png(side: int, rng: random.Random) -> bytes:
+    """A ``side`` x ``side`` grayscale PNG of random pixels (does not compress, like a photo)."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    rows = b''.join(b'\x00' + rng.randbytes(side) for _ in range(side))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', side, side, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows, 1)) + chunk(b'IEND', b''))
+
+
 class MockProvider(AIClient):
-    def __init__(self, model: str = 'mock-1'):
+    """Offline provider echoing the prompt, optionally simulating a real one.
+
+    By default it answers instantly. For capacity planning it can sleep for
+    a latency drawn from a distribution (``fixed`` = ``latency_s``;
+    ``normal`` around ``latency_s`` with ``latency_jitter_s`` std dev;
+    ``longtail`` = lognormal with median ``latency_s`` and shape
+    ``tail_sigma``), fail a fraction of calls (``error_rate``, HTTP 503),
+    throttle (``throttle_rate`` of calls, and any call beyond
+    ``max_concurrency`` in flight, fail with HTTP 429), and pad answers to
+    ``output_chars`` characters / ``image_px`` square noise images.
+    """
+
+    def __init__(self, model: str = 'mock-1', latency: str = 'none', latency_s: float = 0.0,
+                 latency_jitter_s: float = 0.0, tail_sigma: float = 1.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, max_concurrency: Optional[int] = None,
+                 output_chars: Optional[int] = None, image_px: Optional[int] = None, seed: Optional[int] = None):
+        if latency not in LATENCY_KINDS:
+            raise ValueError(f"Unknown mock latency '{latency}': use one of {', '.join(LATENCY_KINDS)}")
         self.model = model
+        self.latency = latency
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.tail_sigma = tail_sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.output_chars = output_chars
+        self.image_px = image_px
+        self.stats = {'calls': 0, 'errors': 0, 'throttled': 0}
+        self._rng = random.Random(seed)
+        self._in_flight = 0
+        self._lock = threading.Lock()
 
-    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
-        t0 = time.time()
+    def _draw_latency(self) -> float:
+        if self.latency == 'fixed':
+            return self.latency_s
+        if self.latency == 'normal':
+            return max(0.0, self._rng.gauss(self.latency_s, self.latency_jitter_s))
+        if self.latency == 'longtail' and self.latency_s > 0:
+            return self._rng.lognormvariate(math.log(self.latency_s), self.tail_sigma)
+        return 0.0
+
+    def _begin(self) -> float:
+        """Count the call, maybe fail it, and return how long it should take."""
+        with self._lock:
+            self.stats['calls'] += 1
+            if (self.max_concurrency is not None and self._in_flight >= self.max_concurrency) \
+                    or self._rng.random() < self.throttle_rate:
+                self.stats['throttled'] += 1
+                raise MockRateLimitError(f'mock provider throttled ({self._in_flight} calls in flight)')
+            if self._rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                raise MockProviderError('mock provider error')
+            self._in_flight += 1
+            return self._draw_latency()
+
+    def _end(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _simulate(self):
+        delay = self._begin()
+        try:
+            if delay:
+                time.sleep(delay)
+        finally:
+            self._end()
+
+    async def _asimulate(self):
+        delay = self._begin()
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            self._end()
+
+    def _text(self, prompt: str) -> str:
         # deterministic echo with small transform
         out = f"MOCK_TEXT:{prompt[:100]}"
-        return {'text': out, 'meta': {'provider': 'mock', 'model': self.model, 'latency': time.time() - t0}}
+        if self.output_chars and len(out) < self.output_chars:
+            filler = ' lorem ipsum dolor sit amet'
+            out += (filler * (self.output_chars // len(filler) + 1))[:self.output_chars - len(out)]
+        return out
+
+    def _image(self) -> bytes:
+        if self.image_px:
+            with self._lock:
+                return _noise_png(self.image_px, self._rng)
+        # a deterministic valid 1x1 PNG (white)
+        png_1x1_b64 = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8Xw8AAmEBg6ou2hkAAAAASUVORK5CYII='
+        return base64.b64decode(png_1x1_b64)
+
+    def _meta(self, t0: float, **extra) -> Dict[str, Any]:
+        return {'provider': 'mock', 'model': self.model, 'latency': time.time() - t0, **extra}
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        t0 = time.time()
+        self._simulate()
+        return {'text': self._text(prompt), 'meta': self._meta(t0)}
+
+    def _chunks(self, text: str) -> Iterator[str]:
+        # the text a word at a time
+        start = 0
+        while start < len(text):
+            end = text.find(' ', start + 1)
+            end = len(text) if end == -1 else end
+            yield text[start:end]
+            start = end
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        # the same text as generate_text, a word at a time
+        yield from self._chunks(self.generate_text(prompt, **kwargs)['text'])
 
     def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
-        # return a deterministic valid 1x1 PNG (white)
         t0 = time.time()
-        png_1x1_b64 = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8Xw8AAmEBg6ou2hkAAAAASUVORK5CYII='
-        import base64
-        b = base64.b64decode(png_1x1_b64)
-        return {'image_bytes': b, 'meta': {'provider': 'mock', 'model': self.model, 'latency': time.time() - t0, 'placeholder': True}}
+        self._simulate()
+        return {'image_bytes': self._image(), 'meta': self._meta(t0, placeholder=True)}
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        # the offline hashing embedder: similar texts get similar vectors
+        from ...kb.vector import HashingEmbedder
+
+        self._simulate()
+        return HashingEmbedder(64).embed(texts).tolist()
 
     def upload_file(self, path: str, mime_type: str | None = None) -> Dict[str, str]:
         # deterministic mock reference for tests and local usage
         ref = {'id': f'mock://{path}', 'mime_type': mime_type or 'application/octet-stream'}
         logger.info({'event': 'upload_file', 'provider': 'mock', 'path': str(path), 'ref': ref})
         return ref
+
+    def batch_backend(self, root: Any) -> MockBatchBackend:
+        return MockBatchBackend(root, provider=self)
+
+    # the simulated wait is an asyncio.sleep, so the async variants never hold a thread
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        t0 = time.time()
+        await self._asimulate()
+        return {'text': self._text(prompt), 'meta': self._meta(t0)}
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        t0 = time.time()
+        await self._asimulate()
+        return {'image_bytes': self._image(), 'meta': self._meta(t0, placeholder=True)}
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Dict[str, str]:
+        return self.upload_file(path, mime_type=mime_type)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        for piece in self._chunks((await self.agenerate_text(prompt, **kwargs))['text']):
+            yield piece
@@ -1,8 +1,11 @@
 from ..client import AIClient
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, Iterator, List
+import asyncio
 import time
 import os
+from pathlib import Path
 from docflow.logging_lib import setup_logger
+from ..http import download, http_session, shared_client
 import requests
 
 logger = setup_logger()
@@ -12,27 +15,85 @@ try:
 except ImportError:
     OpenAI = None
 
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+try:  # ships with the openai SDK; used to bound its connection pool
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def _delta_text(chunk: Any) -> str:
+    choices = getattr(chunk, 'choices', None)
+    if not choices:
+        return ''
+    return getattr(choices[0].delta, 'content', None) or ''
+
 
 class OpenAIProvider(AIClient):
-    def __init__(self, api_key: str | None = None, model: str | None = None):
+    def __init__(self, api_key: str | None = None, model: str | None = None, timeout_s: float | None = None,
+                 pool_size: int = 10):
         if api_key:
             os.environ['OPENAI_API_KEY'] = api_key
         self.model = model or 'gpt-3.5-turbo'
+        self.timeout_s = timeout_s
+        self.pool_size = pool_size
         if OpenAI:
-            self.client = OpenAI()
+            # one SDK client (and connection pool) per key/settings, shared by every provider instance
+            self.client = shared_client(self._client_key(OpenAI), lambda: OpenAI(**self._client_kwargs(False)))
         else:
             self.client = None
+        # created on first async call so sync-only users never build it
+        self._aclient = None
+
+    def _client_key(self, factory: Any):
+        return (factory, os.environ.get('OPENAI_API_KEY'), self.timeout_s, self.pool_size)
+
+    def _client_kwargs(self, is_async: bool) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {}
+        if self.timeout_s:
+            kwargs['timeout'] = self.timeout_s
+        if httpx is not None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            kwargs['http_client'] = (httpx.AsyncClient if is_async else httpx.Client)(limits=limits, timeout=self.timeout_s)
+        return kwargs
+
+    def _get_aclient(self):
+        if self._aclient is None and AsyncOpenAI is not None and self.client is not None:
+            # async connection pools belong to one event loop: not shared between instances
+            self._aclient = AsyncOpenAI(**self._client_kwargs(True))
+        return self._aclient
+
+    def _fetch_image(self, url: str, out_path: str | None) -> Dict[str, Any]:
+        """Image at ``url``: streamed to ``out_path`` when given, else read into memory."""
+        if out_path:
+            download(url, out_path, timeout=self.timeout_s, pool_size=self.pool_size)
+            return {'image_path': str(out_path)}
+        resp = http_session(self.pool_size).get(url, timeout=self.timeout_s)
+        resp.raise_for_status()
+        return {'image_bytes': resp.content}
 
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         t0 = time.time()
         if not self.client:
-            return {'text': prompt, 'meta': {'provider': 'openai', 'model': self.model, 'latency': 0.0, 'error': 'openai library not available'}}
-        try:
-            resp = self.client.chat.completions.create(model=self.model, messages=[{'role': 'user', 'content': prompt}])
-            text = resp.choices[0].message.content
-            return {'text': text, 'meta': {'provider': 'openai', 'model': self.model, 'latency': time.time() - t0}}
-        except Exception as e:
-            return {'text': prompt, 'meta': {'provider': 'openai', 'model': self.model, 'latency': time.time() - t0, 'error': str(e)}}
+            raise RuntimeError('openai library not available')
+        # errors propagate so the retry policy can classify them (never echo the prompt back as text)
+        resp = self.client.chat.completions.create(model=self.model, messages=[{'role': 'user', 'content': prompt}])
+        text = resp.choices[0].message.content
+        return {'text': text, 'meta': {'provider': 'openai', 'model': self.model, 'latency': time.time() - t0}}
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        if not self.client:
+            raise RuntimeError('openai library not available')
+        stream = self.client.chat.completions.create(model=self.model, messages=[{'role': 'user', 'content': prompt}],
+                                                     stream=True)
+        for chunk in stream:
+            delta = _delta_text(chunk)
+            if delta:
+                yield delta
 
     def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
         t0 = time.time()
@@ -55,11 +116,9 @@ class OpenAIProvider(AIClient):
             image_url = response.data[0].url
 
             try:
-                image_response = requests.get(image_url)
-                image_response.raise_for_status()
-                image_bytes = image_response.content
+                image = self._fetch_image(image_url, kwargs.get('out_path'))
                 meta['latency'] = time.time() - t0
-                return {'image_bytes': image_bytes, 'meta': meta}
+                return {**image, 'meta': meta}
             except requests.exceptions.RequestException as e:
                 logger.error(f"Failed to download image from {image_url}: {e}")
                 meta['error'] = f"Failed to download image: {e}"
@@ -72,6 +131,12 @@ class OpenAIProvider(AIClient):
             meta['latency'] = time.time() - t0
             return {'image_bytes': b'', 'meta': meta}
 
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        if not self.client:
+            raise RuntimeError('openai library not available')
+        resp = self.client.embeddings.create(model=model or 'text-embedding-3-small', input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
     def upload_file(self, path: str, mime_type: str | None = None) -> Dict[str, Any]:
         """Upload a file using openai.File.create when available. Returns the file object or raises."""
         if not self.client:
@@ -86,3 +151,71 @@ class OpenAIProvider(AIClient):
         except Exception as e:
             logger.error(f"Error uploading file to OpenAI: {e}")
             raise
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        aclient = self._get_aclient()
+        if aclient is None:
+            return await super().agenerate_text(prompt, **kwargs)
+        t0 = time.time()
+        resp = await aclient.chat.completions.create(model=self.model, messages=[{'role': 'user', 'content': prompt}])
+        text = resp.choices[0].message.content
+        return {'text': text, 'meta': {'provider': 'openai', 'model': self.model, 'latency': time.time() - t0}}
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        aclient = self._get_aclient()
+        if aclient is None:
+            async for piece in super().astream_text(prompt, **kwargs):
+                yield piece
+            return
+        stream = await aclient.chat.completions.create(model=self.model, messages=[{'role': 'user', 'content': prompt}],
+                                                       stream=True)
+        async for chunk in stream:
+            delta = _delta_text(chunk)
+            if delta:
+                yield delta
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        aclient = self._get_aclient()
+        if aclient is None:
+            return await super().agenerate_image(prompt, **kwargs)
+        t0 = time.time()
+        model = kwargs.get('model', 'dall-e-3')
+        meta = {'provider': 'openai', 'model': model, 'latency': 0.0}
+        try:
+            response = await aclient.images.generate(
+                model=model,
+                prompt=prompt,
+                n=1,
+                size=kwargs.get('size', '1024x1024'),
+                response_format="url"
+            )
+            image_url = response.data[0].url
+        except Exception as e:
+            logger.error(f"Error generating image with OpenAI: {e}")
+            meta['error'] = str(e)
+            meta['latency'] = time.time() - t0
+            return {'image_bytes': b'', 'meta': meta}
+        try:
+            # the download is plain HTTP; keep it off the event loop
+            image = await asyncio.to_thread(self._fetch_image, image_url, kwargs.get('out_path'))
+            meta['latency'] = time.time() - t0
+            return {**image, 'meta': meta}
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to download image from {image_url}: {e}")
+            meta['error'] = f"Failed to download image: {e}"
+            meta['latency'] = time.time() - t0
+            return {'image_bytes': b'', 'meta': meta}
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Dict[str, Any]:
+        aclient = self._get_aclient()
+        if aclient is None:
+            return await super().aupload_file(path, mime_type)
+        data = await asyncio.to_thread(Path(path).read_bytes)
+        try:
+            file_obj = await aclient.files.create(file=(Path(path).name, data), purpose='assistants')
+            ref = {'id': getattr(file_obj, 'id', None), 'raw': file_obj}
+            logger.info({'event': 'upload_file', 'provider': 'openai', 'path': str(path), 'ref': ref})
+            return ref
+        except Exception as e:
+            logger.error(f"Error uploading file to OpenAI: {e}")
+            raise
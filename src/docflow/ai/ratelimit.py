@@ -0,0 +1,247 @@
+"""Client-side requests-per-minute / tokens-per-minute limiter.
+
+Each ``(provider, model)`` budget is a pair of token buckets persisted in a
+small JSON file under a host-wide directory (the system temp dir by
+default). Every acquire takes a thread lock and an exclusive file lock, so
+threads, batch worker processes and separate ``docflow`` invocations on the
+same host draw from the same buckets and together stay under the quota.
+
+Token usage is estimated before the call (prompt characters / 4) and the
+estimated output tokens are debited once the response is back; the token
+bucket may go negative, which simply delays later callers.
+"""
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from pathlib import Path
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from .client import AIClient
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+    import msvcrt
+
+_SAFE_RE = re.compile(r'[^A-Za-z0-9._-]+')
+
+# longest single sleep before re-checking the buckets
+_MAX_POLL_S = 1.0
+
+
+def estimate_tokens(text: Any) -> int:
+    """Rough token count (~4 characters per token) used for the TPM budget."""
+    return max(1, len(str(text or '')) // 4)
+
+
+def default_state_dir() -> Path:
+    return Path(tempfile.gettempdir()) / 'docflow-ratelimit'
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Exclusive lock on ``path`` shared with other processes (flock, msvcrt on Windows)."""
+    with open(path, 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RateLimiter:
+    """Token buckets for ``rpm`` requests and ``tpm`` tokens per minute, shared on this host."""
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 state_dir: Optional[Path] = None):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        root = Path(state_dir) if state_dir else default_state_dir()
+        root.mkdir(parents=True, exist_ok=True)
+        stem = _SAFE_RE.sub('_', name)
+        self.state_path = root / f'{stem}.json'
+        self.lock_path = root / f'{stem}.lock'
+        self.waits = 0
+        self.waited_s = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, now: float) -> Dict[str, float]:
+        try:
+            state = json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            state = {}
+        # a new bucket starts full
+        state.setdefault('requests', self.rpm or 0.0)
+        state.setdefault('tokens', self.tpm or 0.0)
+        state.setdefault('updated_at', now)
+        elapsed = max(0.0, now - state['updated_at'])
+        if self.rpm:
+            state['requests'] = min(self.rpm, state['requests'] + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            state['tokens'] = min(self.tpm, state['tokens'] + elapsed * self.tpm / 60.0)
+        state['updated_at'] = now
+        return state
+
+    def _save(self, state: Dict[str, float]):
+        tmp = self.state_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(state), encoding='utf-8')
+        os.replace(tmp, self.state_path)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take one request and ``tokens`` tokens if available; else seconds to wait."""
+        with self._lock, file_lock(self.lock_path):
+            state = self._load(time.time())
+            wait = 0.0
+            if self.rpm and state['requests'] < 1:
+                wait = max(wait, (1 - state['requests']) * 60.0 / self.rpm)
+            # a request larger than the whole budget only waits for a full bucket
+            need = min(tokens, self.tpm) if self.tpm else 0
+            if self.tpm and state['tokens'] < need:
+                wait = max(wait, (need - state['tokens']) * 60.0 / self.tpm)
+            if wait == 0.0:
+                if self.rpm:
+                    state['requests'] -= 1
+                if self.tpm:
+                    state['tokens'] -= tokens
+            self._save(state)
+            return wait
+
+    def _note_wait(self, waited: float):
+        with self._lock:
+            self.waits += 1
+            self.waited_s += waited
+        logger.info({'event': 'rate_limit_wait', 'limiter': self.name, 'waited_s': round(waited, 3)})
+
+    def acquire(self, tokens: int = 1):
+        t0 = None
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0.0:
+                break
+            t0 = t0 or time.monotonic()
+            time.sleep(min(wait, _MAX_POLL_S))
+        if t0 is not None:
+            self._note_wait(time.monotonic() - t0)
+
+    async def aacquire(self, tokens: int = 1):
+        t0 = None
+        while True:
+            # the bucket lives behind a file lock: keep that I/O off the event loop
+            wait = await asyncio.to_thread(self._try_acquire, tokens)
+            if wait == 0.0:
+                break
+            t0 = t0 or time.monotonic()
+            await asyncio.sleep(min(wait, _MAX_POLL_S))
+        if t0 is not None:
+            self._note_wait(time.monotonic() - t0)
+
+    def debit(self, tokens: int):
+        """Charge tokens consumed after the fact (e.g. the generated output)."""
+        if not self.tpm or tokens <= 0:
+            return
+        with self._lock, file_lock(self.lock_path):
+            state = self._load(time.time())
+            state['tokens'] -= tokens
+            self._save(state)
+
+    async def adebit(self, tokens: int):
+        if self.tpm and tokens > 0:
+            await asyncio.to_thread(self.debit, tokens)
+
+
+def _output_tokens(out: Any) -> int:
+    if not isinstance(out, dict):
+        return 0
+    usage = (out.get('meta') or {}).get('usage') or {}
+    if isinstance(usage, dict) and usage.get('completion_tokens'):
+        return int(usage['completion_tokens'])
+    return estimate_tokens(out['text']) if out.get('text') else 0
+
+
+class RateLimitedAIClient(AIClient):
+    """``AIClient`` whose generate calls wait for the shared :class:`RateLimiter` budget."""
+
+    def __init__(self, inner: AIClient, limiter: RateLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def __getattr__(self, name: str):
+        if name == 'inner':  # not set yet (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def _call(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        self.limiter.acquire(estimate_tokens(prompt))
+        out = getattr(self.inner, method)(prompt, **kwargs)
+        self.limiter.debit(_output_tokens(out))
+        return out
+
+    async def _acall(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        await self.limiter.aacquire(estimate_tokens(prompt))
+        out = await getattr(self.inner, 'a' + method)(prompt, **kwargs)
+        await self.limiter.adebit(_output_tokens(out))
+        return out
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_text', prompt, kwargs)
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_image', prompt, kwargs)
+
+    def upload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return self.inner.upload_file(path, mime_type)
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        self.limiter.acquire(sum(estimate_tokens(t) for t in texts))
+        return self.inner.embed_texts(texts, model=model)
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        self.limiter.acquire(estimate_tokens(prompt))
+        out_chars = 0
+        try:
+            for piece in self.inner.stream_text(prompt, **kwargs):
+                out_chars += len(piece)
+                yield piece
+        finally:
+            self.limiter.debit(out_chars // 4)
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_text', prompt, kwargs)
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_image', prompt, kwargs)
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return await self.inner.aupload_file(path, mime_type)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        await self.limiter.aacquire(estimate_tokens(prompt))
+        out_chars = 0
+        try:
+            async for piece in self.inner.astream_text(prompt, **kwargs):
+                out_chars += len(piece)
+                yield piece
+        finally:
+            await self.limiter.adebit(out_chars // 4)
@@ -0,0 +1,254 @@
+"""Disk cache of provider responses, shared by every process using the same temp dir.
+
+:class:`CachingAIClient` wraps any :class:`AIClient`; a ``generate_text`` or
+``generate_image`` call whose provider, model, prompt, attachments and
+generation kwargs were seen before is answered from
+``<kb_cache_dir>/responses`` instead of the provider. Entries are single
+JSON files written atomically, so concurrent batch workers can share the
+store. Each hit refreshes the file's mtime, which is what size-based LRU
+eviction orders by; entries older than the TTL are misses.
+"""
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import json
+import os
+import threading
+import time
+from .client import AIClient
+from ..core.cache import stable_hash, encode_value, decode_value
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+# after eviction the store is trimmed to this fraction of max_bytes
+_LOW_WATER = 0.9
+
+
+def attachment_fingerprint(ref: Any) -> Any:
+    """Stable identity of an uploaded-file reference returned by ``upload_file``."""
+    if isinstance(ref, (str, int, float)) or ref is None:
+        return ref
+    if isinstance(ref, dict):
+        return stable_hash(ref)
+    for attr in ('id', 'uri', 'name'):
+        value = getattr(ref, attr, None)
+        if value:
+            return f'{type(ref).__name__}:{value}'
+    return repr(ref)
+
+
+def request_key(method: str, prompt: str, kwargs: Dict[str, Any], model: Any = None, provider: Any = None) -> str:
+    """Hash identifying a provider request: method, provider/model, prompt, attachments and kwargs."""
+    kw = dict(kwargs)
+    attachments = [attachment_fingerprint(a) for a in kw.pop('attachments', None) or []]
+    # where the caller wants the image written does not change the request
+    kw.pop('out_path', None)
+    return stable_hash({
+        'method': method,
+        'provider': provider,
+        'model': model,
+        'prompt': prompt,
+        'attachments': attachments,
+        'kwargs': kw,
+    })
+
+
+class ResponseCache:
+    """Size-bounded, TTL-aware store of provider responses (one JSON file per key)."""
+
+    def __init__(self, root: Path, max_bytes: int = 512 * 1024 * 1024, ttl: Optional[float] = None):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        # bytes written since the last scan; other processes' writes are
+        # picked up by the next scan, so the bound is approximate but holds
+        self._size: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f'{key}.json'
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        out = None
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+            if self.ttl is None or time.time() - entry.get('created_at', 0) <= self.ttl:
+                out = decode_value(entry['response'])
+                # mtime is the LRU clock
+                os.utime(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.info({'event': 'response_cache_corrupt', 'path': str(path), 'error': str(e)})
+        with self._lock:
+            if out is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return out
+
+    def put(self, key: str, response: Dict[str, Any]):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps({'key': key, 'created_at': time.time(), 'response': encode_value(response)})
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(payload, encoding='utf-8')
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(payload)
+            over = self._size is None or self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self) -> List[Tuple[Path, os.stat_result]]:
+        files = []
+        for path in self.root.glob('*/*.json'):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                pass  # evicted by another process meanwhile
+        return files
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the store is under ``max_bytes``.
+
+        Expired entries are never refreshed by :meth:`get`, so they are the
+        first to go.
+        """
+        files = self._scan()
+        total = sum(st.st_size for _, st in files)
+        removed = 0
+        if total > self.max_bytes:
+            for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+                if total <= self.max_bytes * _LOW_WATER:
+                    break
+                try:
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                total -= st.st_size
+        with self._lock:
+            self._size = total
+            self.evicted += removed
+        if removed:
+            logger.info({'event': 'response_cache_evicted', 'removed': removed, 'bytes': total})
+        return removed
+
+
+class CachingAIClient(AIClient):
+    """``AIClient`` that answers repeated requests from a :class:`ResponseCache`.
+
+    Responses carrying ``meta.error`` are never stored. Hits are marked with
+    ``meta.response_cache = 'hit'``. Other attributes (``model``,
+    ``upload_file``...) are those of the wrapped client.
+    """
+
+    def __init__(self, inner: AIClient, cache: ResponseCache, provider: Optional[str] = None):
+        self.inner = inner
+        self.cache = cache
+        self.provider = provider or type(inner).__name__
+
+    def __getattr__(self, name: str):
+        if name == 'inner':  # not set yet (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def cache_key(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> str:
+        model = getattr(self.inner, 'model', None)
+        if method == 'generate_image':
+            model = [model, getattr(self.inner, 'img_model', None)]
+        return request_key(method, prompt, kwargs, model=model, provider=self.provider)
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        out = self.cache.get(key)
+        if out is not None:
+            out['meta'] = {**(out.get('meta') or {}), 'response_cache': 'hit'}
+            logger.info({'event': 'response_cache_hit', 'provider': self.provider, 'key': key[:12]})
+        return out
+
+    def _store(self, key: str, out: Dict[str, Any]):
+        if not isinstance(out, dict) or (out.get('meta') or {}).get('error'):
+            return
+        try:
+            if out.get('image_path'):
+                # the image was streamed to the caller's file: store its bytes, not the path
+                out = {**{k: v for k, v in out.items() if k != 'image_path'},
+                       'image_bytes': Path(out['image_path']).read_bytes()}
+            self.cache.put(key, out)
+        except Exception as e:
+            logger.info({'event': 'response_cache_store_error', 'error': str(e)})
+
+    def _call(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = self.cache_key(method, prompt, kwargs)
+        out = self._lookup(key)
+        if out is None:
+            out = getattr(self.inner, method)(prompt, **kwargs)
+            self._store(key, out)
+        return out
+
+    async def _acall(self, method: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = self.cache_key(method, prompt, kwargs)
+        out = await asyncio.to_thread(self._lookup, key)
+        if out is None:
+            out = await getattr(self.inner, 'a' + method)(prompt, **kwargs)
+            await asyncio.to_thread(self._store, key, out)
+        return out
+
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_text', prompt, kwargs)
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return self._call('generate_image', prompt, kwargs)
+
+    def upload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return self.inner.upload_file(path, mime_type)
+
+    def embed_texts(self, texts: List[str], model: str | None = None) -> List[List[float]]:
+        return self.inner.embed_texts(texts, model=model)
+
+    def _streamed(self, pieces: List[str]) -> Dict[str, Any]:
+        return {'text': ''.join(pieces), 'meta': {'provider': self.provider, 'model': getattr(self.inner, 'model', None),
+                                                  'streamed': True}}
+
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        """A hit is yielded as one chunk; a completed miss is stored like ``generate_text``."""
+        key = self.cache_key('generate_text', prompt, kwargs)
+        out = self._lookup(key)
+        if out is not None:
+            if out.get('text'):
+                yield out['text']
+            return
+        pieces: List[str] = []
+        for piece in self.inner.stream_text(prompt, **kwargs):
+            pieces.append(piece)
+            yield piece
+        self._store(key, self._streamed(pieces))
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_text', prompt, kwargs)
+
+    async def agenerate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        return await self._acall('generate_image', prompt, kwargs)
+
+    async def aupload_file(self, path: str, mime_type: str | None = None) -> Any:
+        return await self.inner.aupload_file(path, mime_type)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        key = self.cache_key('generate_text', prompt, kwargs)
+        out = await asyncio.to_thread(self._lookup, key)
+        if out is not None:
+            if out.get('text'):
+                yield out['text']
+            return
+        pieces: List[str] = []
+        async for piece in self.inner.astream_text(prompt, **kwargs):
+            pieces.append(piece)
+            yield piece
+        await asyncio.to_thread(self._store, key, self._streamed(pieces))
@@ -0,0 +1,258 @@
+"""Retry policy shared by every provider call.
+
+Errors are classified as ``rate_limit``, ``transient`` or ``permanent``
+(from HTTP status codes, SDK exception names and builtin network errors).
+Permanent errors fail at once; the others are retried with exponential
+backoff and full jitter, waiting at least as long as a ``Retry-After`` hint
+when the provider sends one. Each provider has a circuit breaker: after
+``breaker_threshold`` consecutive failed calls it opens and calls fail fast
+with :class:`ProviderUnavailableError` until ``breaker_reset_s`` has passed,
+then one probe call is let through (half-open).
+"""
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import random
+import threading
+import time
+from ..errors import ActionError, ProviderUnavailableError
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+RATE_LIMIT = 'rate_limit'
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+_TRANSIENT_STATUS = {408, 409, 425, 500, 502, 503, 504, 529}
+_RATE_LIMIT_NAMES = ('RateLimit', 'ResourceExhausted', 'TooManyRequests')
+_TRANSIENT_NAMES = ('Timeout', 'Connection', 'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError',
+                    'Overloaded', 'TemporarilyUnavailable', 'ServerError', 'Aborted')
+_PERMANENT_NAMES = ('Authentication', 'PermissionDenied', 'BadRequest', 'NotFound', 'InvalidArgument',
+                    'Unprocessable', 'PermissionError')
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ('status_code', 'http_status', 'code', 'status'):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(exc, 'response', None)
+    value = getattr(response, 'status_code', None)
+    return value if isinstance(value, int) else None
+
+
+def classify_error(exc: BaseException) -> str:
+    """``rate_limit``, ``transient`` or ``permanent`` for an exception raised by a provider."""
+    if isinstance(exc, (ActionError, ProviderUnavailableError)):
+        return PERMANENT
+    status = _status_code(exc)
+    if status == 429:
+        return RATE_LIMIT
+    if status is not None:
+        return TRANSIENT if status in _TRANSIENT_STATUS or status >= 500 else PERMANENT
+    names = [cls.__name__ for cls in type(exc).__mro__]
+    if any(marker in name for name in names for marker in _RATE_LIMIT_NAMES):
+        return RATE_LIMIT
+    if any(marker in name for name in names for marker in _PERMANENT_NAMES):
+        return PERMANENT
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return TRANSIENT
+    if any(marker in name for name in names for marker in _TRANSIENT_NAMES):
+        return TRANSIENT
+    if isinstance(exc, (TypeError, ValueError, KeyError, AttributeError, NotImplementedError)):
+        return PERMANENT  # programming/config errors won't fix themselves
+    # unknown provider failures were always retried; keep doing so
+    return TRANSIENT
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait (``Retry-After``/``retry-after-ms``), if any."""
+    value = getattr(exc, 'retry_after', None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        ms = headers.get('retry-after-ms')
+        if ms is not None:
+            return float(ms) / 1000.0
+        raw = headers.get('retry-after')
+    except Exception:
+        return None
+    if raw is None:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(raw).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one provider (thread-safe)."""
+
+    def __init__(self, name: str, threshold: int = 5, reset_s: float = 30.0):
+        self.name = name
+        self.threshold = max(1, int(threshold))
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half_open' if time.monotonic() - self.opened_at >= self.reset_s else 'open'
+
+    def before_call(self) -> bool:
+        """Raise :class:`ProviderUnavailableError` while open; admit one probe once half-open.
+
+        Returns True for the probe call, which must end in :meth:`record_success`,
+        :meth:`record_failure` or :meth:`abort_probe`.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.reset_s - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._probing:
+                raise ProviderUnavailableError(
+                    f"provider '{self.name}' circuit open after {self.failures} consecutive failures"
+                    f' (retry in {max(remaining, 0):.0f}s)')
+            self._probing = True
+            return True
+
+    def abort_probe(self):
+        """The probe ended without a verdict (permanent error, rate limit, cancellation): stay open for another reset_s."""
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info({'event': 'circuit_closed', 'provider': self.name})
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            was_probe, self._probing = self._probing, False
+            if was_probe or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                logger.info({'event': 'circuit_opened', 'provider': self.name, 'failures': self.failures})
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name: str, threshold: int = 5, reset_s: float = 30.0) -> CircuitBreaker:
+    """Process-wide breaker of provider ``name`` (shared by actions and batch records)."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, threshold=threshold, reset_s=reset_s)
+        return breaker
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 1
+    base_delay_s: float = 0.5
+    max_delay_s: float = 30.0
+    # longest Retry-After hint honoured; longer hints are capped
+    max_retry_after_s: float = 120.0
+    breaker_threshold: int = 5
+    breaker_reset_s: float = 30.0
+
+    def delay(self, attempt: int, exc: BaseException) -> float:
+        """Seconds to wait after failed attempt number ``attempt`` (1-based)."""
+        ceiling = min(self.max_delay_s, self.base_delay_s * (2 ** (attempt - 1)))
+        wait = random.uniform(0, ceiling)  # full jitter
+        hint = retry_after(exc)
+        if hint is not None:
+            wait = max(wait, min(hint, self.max_retry_after_s))
+        return wait
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        return breaker_for(provider, self.breaker_threshold, self.breaker_reset_s)
+
+    def _should_retry(self, exc: BaseException, attempt: int, attempts: int, provider: str) -> Optional[float]:
+        kind = classify_error(exc)
+        logger.info({'event': 'provider_call_error', 'provider': provider, 'attempt': attempt,
+                     'category': kind, 'error': str(exc)})
+        if kind == PERMANENT or attempt >= attempts:
+            return None
+        return self.delay(attempt, exc)
+
+    @staticmethod
+    def _record_error(breaker: CircuitBreaker, exc: BaseException, probe: bool):
+        # only transient errors count towards opening the circuit: a permanent error says
+        # nothing about the provider's health and a 429 means it is up but throttling us
+        # (a burst of them must not trip the breaker and bypass the Retry-After wait)
+        if classify_error(exc) == TRANSIENT:
+            breaker.record_failure()
+        elif probe:
+            breaker.abort_probe()
+
+    def call(self, fn: Callable[[], Any], provider: str, attempts: Optional[int] = None,
+             sleep: Callable[[float], None] = time.sleep) -> Any:
+        """Run ``fn`` under this policy and ``provider``'s circuit breaker."""
+        attempts = max(1, attempts or self.max_attempts)
+        breaker = self.breaker(provider)
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = breaker.before_call()
+            try:
+                out = fn()
+            except Exception as e:
+                self._record_error(breaker, e, probe)
+                wait = self._should_retry(e, attempt, attempts, provider)
+                # an open breaker would reject the next attempt anyway: don't sleep for it
+                if wait is None or breaker.state == 'open':
+                    raise
+                sleep(wait)
+                continue
+            except BaseException:
+                if probe:
+                    breaker.abort_probe()
+                raise
+            breaker.record_success()
+            return out
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], provider: str, attempts: Optional[int] = None) -> Any:
+        """Async counterpart of :meth:`call` (waits with ``asyncio.sleep``)."""
+        attempts = max(1, attempts or self.max_attempts)
+        breaker = self.breaker(provider)
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = breaker.before_call()
+            try:
+                out = await fn()
+            except Exception as e:
+                self._record_error(breaker, e, probe)
+                wait = self._should_retry(e, attempt, attempts, provider)
+                # an open breaker would reject the next attempt anyway: don't sleep for it
+                if wait is None or breaker.state == 'open':
+                    raise
+                await asyncio.sleep(wait)
+                continue
+            except BaseException:
+                # cancelled (or interrupted) mid-probe: free the probe slot
+                if probe:
+                    breaker.abort_probe()
+                raise
+            breaker.record_success()
+            return out
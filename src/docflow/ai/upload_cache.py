@@ -0,0 +1,131 @@
+"""Persistent map from file content hash to the provider's uploaded-file reference.
+
+KB files with the ``upload``/``hybrid`` strategies used to be uploaded again
+for every action of every run. :func:`upload_files` looks each file up by
+``sha256`` of its content under ``<kb_cache_dir>/uploads/<provider>/`` and
+only uploads misses, in parallel on a bounded thread pool. Entries carry
+``expires_at`` from the provider's ``file_ttl_s`` (Gemini deletes uploads
+after 48h) and are ignored once expired.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+from .client import unwrap_client
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+# (path, size, mtime_ns) -> sha256, so unchanged files are hashed once per process
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: Any) -> str:
+    st = os.stat(path)
+    memo_key = (str(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        digest = _digest_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with _digest_lock:
+            _digest_memo[memo_key] = digest
+    return digest
+
+
+class UploadCache:
+    """One JSON file per ``(provider, content hash)`` holding the remote reference."""
+
+    def __init__(self, root: Path, provider: str):
+        self.root = Path(root) / provider
+        self.provider = provider
+
+    def _path(self, digest: str) -> Path:
+        return self.root / f'{digest}.json'
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = json.loads(self._path(digest).read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.info({'event': 'upload_cache_corrupt', 'digest': digest, 'error': str(e)})
+            return None
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and time.time() >= expires_at:
+            return None
+        return entry
+
+    def put(self, digest: str, path: str, ref: Any, ttl: Optional[float]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        entry = {'digest': digest, 'path': str(path), 'ref': ref, 'uploaded_at': now,
+                 'expires_at': now + ttl if ttl else None}
+        target = self._path(digest)
+        tmp = target.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(entry), encoding='utf-8')
+        os.replace(tmp, target)
+
+
+def upload_files(client: Any, attachments: List[Dict[str, Any]], cache_dir: Optional[Path] = None,
+                 max_workers: int = 4) -> Tuple[List[Any], Dict[str, int]]:
+    """Upload KB ``attachments`` through ``client``, reusing cached references.
+
+    Returns the references in attachment order (failed uploads are logged
+    and left out) and ``{'reused', 'uploaded', 'failed'}`` counters.
+    """
+    provider = unwrap_client(client)
+    cache = UploadCache(Path(cache_dir) / 'uploads', type(provider).__name__) if cache_dir else None
+    refs: List[Any] = [None] * len(attachments)
+    stats = {'reused': 0, 'uploaded': 0, 'failed': 0}
+    misses: List[Tuple[int, Dict[str, Any], Optional[str]]] = []
+    for i, att in enumerate(attachments):
+        digest = None
+        if cache is not None:
+            try:
+                digest = file_digest(att['path'])
+                entry = cache.get(digest)
+            except OSError:
+                entry = None
+            if entry is not None:
+                refs[i] = provider.file_ref_from_json(entry['ref'])
+                stats['reused'] += 1
+                continue
+        misses.append((i, att, digest))
+
+    def _upload(item):
+        i, att, digest = item
+        try:
+            ref = client.upload_file(att['path'], mime_type=att.get('mime_type'))
+        except Exception as e:
+            logger.info({'event': 'kb_upload_error', 'path': att['path'], 'error': str(e)})
+            return i, None
+        if cache is not None and digest is not None:
+            try:
+                cache.put(digest, att['path'], provider.file_ref_to_json(ref), provider.file_ttl_s)
+            except Exception as e:
+                logger.info({'event': 'upload_cache_store_error', 'path': att['path'], 'error': str(e)})
+        return i, ref
+
+    if len(misses) == 1:
+        results = [_upload(misses[0])]
+    elif misses:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(misses))), thread_name_prefix='docflow-upload') as pool:
+            results = list(pool.map(_upload, misses))
+    else:
+        results = []
+    for i, ref in results:
+        if ref is None:
+            stats['failed'] += 1
+        else:
+            refs[i] = ref
+            stats['uploaded'] += 1
+    return [r for r in refs if r is not None], stats
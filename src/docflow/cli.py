@@ -3,6 +3,6 @@
 This module exists so existing imports like `from docflow.cli import init` used in
 tests continue to work after consolidating CLI logic in `docflow.cli.app`.
 """
-from .app import app, init, run, dry_run, inspect_template, config_validate
+from .app import app, init, run, dry_run, inspect_template, config_validate, batch, cache_info, cache_purge
 
-__all__ = ['app', 'init', 'run', 'dry_run', 'inspect_template', 'config_validate']
+__all__ = ['app', 'init', 'run', 'dry_run', 'inspect_template', 'config_validate', 'batch', 'cache_info', 'cache_purge']
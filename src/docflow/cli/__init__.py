@@ -3,6 +3,6 @@
 This package exposes `app` (Typer app) and the top-level command functions used by
 tests and by python -m docflow.cli.
 """
-from .app import app, init, run, dry_run, inspect_template, config_validate
+from .app import app, init, run, dry_run, inspect_template, config_validate, batch, bench, cache_info, cache_purge
 
-__all__ = ['app', 'init', 'run', 'dry_run', 'inspect_template', 'config_validate']
+__all__ = ['app', 'init', 'run', 'dry_run', 'inspect_template', 'config_validate', 'batch', 'bench', 'cache_info', 'cache_purge']
@@ -4,7 +4,7 @@ from ..config import load_config
 from ..runtime.orchestrator import run_config
 from ..adapters.docx_adapter import DocxAdapter
 from ..adapters.pptx_adapter import PptxAdapter
-from typing import List
+from typing import List, Optional
 from rich.table import Table
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
@@ -64,7 +64,7 @@ def dry_run(config: str, verbose: bool = False):
 
 
 @app.command()
-def run(config: str, verbose: bool = False):
+def run(config: str, verbose: bool = False, incremental: bool = False):
     if verbose:
         # Show progress for verbose mode
         console = Console()
@@ -89,9 +89,9 @@ def run(config: str, verbose: bool = False):
                 progress.update(task, advance=10, description="Finalizing output...")
                 return result
             
-            res = run_with_progress(config, verbose=verbose)
+            res = run_with_progress(config, verbose=verbose, incremental=incremental)
     else:
-        res = run_config(config, verbose=verbose)
+        res = run_config(config, verbose=verbose, incremental=incremental)
     
     typer.echo(f'Wrote {len(res)} files')
     if verbose:
@@ -111,6 +111,94 @@ def run(config: str, verbose: bool = False):
         typer.echo(f'💡 Use --help for more CLI options')
 
 
+@app.command()
+def batch(config: str, input_path: str = typer.Option(..., '--input', '-i', help='Records file (.jsonl or .csv)'),
+          workers: int = 4, mode: str = 'thread', id_field: str = 'id', report: Optional[str] = None,
+          verbose: bool = False,
+          offline: bool = typer.Option(False, help='Send provider requests as bulk batch jobs (slower, cheaper)'),
+          poll_interval: float = typer.Option(30.0, help='Seconds between batch job status polls (with --offline)')):
+    """Run the workflow once per input record, one output folder per record."""
+    import json
+    from ..runtime.batch import load_records, run_batch
+
+    records = load_records(input_path)
+    rep = run_batch(config, records, workers=workers, mode=mode, id_field=id_field, verbose=verbose,
+                    offline=offline, poll_interval_s=poll_interval)
+    summary = rep.summary()
+    table = Table('metric', 'value')
+    for k, v in summary.items():
+        table.add_row(k, str(v))
+    Console().print(table)
+    for r in rep.results:
+        if not r.ok:
+            typer.echo(f'FAILED {r.record_id}: {r.error}')
+    if report:
+        Path(report).parent.mkdir(parents=True, exist_ok=True)
+        Path(report).write_text(json.dumps(rep.to_dict(), indent=2), encoding='utf-8')
+        typer.echo(f'Report written to {report}')
+    if rep.failed:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def bench(config: Optional[str] = typer.Argument(None, help='Workflow to load-test (default: a synthetic one)'),
+          workflows: int = typer.Option(50, '--workflows', '-n', help='Workflow runs in total'),
+          concurrency: int = typer.Option(8, '--concurrency', '-c', help='Workflow runs at a time'),
+          mode: str = 'thread',
+          latency: str = typer.Option('normal', help='Simulated latency: none, fixed, normal or longtail'),
+          latency_s: float = typer.Option(0.5, help='Fixed latency, mean (normal) or median (longtail)'),
+          latency_jitter_s: float = typer.Option(0.1, help='Std dev of the normal latency'),
+          tail_sigma: float = typer.Option(1.0, help='Shape of the longtail latency'),
+          error_rate: float = 0.0, throttle_rate: float = 0.0,
+          max_concurrency: Optional[int] = typer.Option(None, help='Provider calls in flight before HTTP 429'),
+          output_chars: Optional[int] = None, image_px: Optional[int] = None, seed: Optional[int] = None,
+          work_dir: Optional[str] = None, report: Optional[str] = None):
+    """Drive concurrent workflow runs against the simulated mock provider and report capacity."""
+    import json
+    from ..runtime.bench import run_bench
+
+    mock = {'latency': latency, 'latency_s': latency_s, 'latency_jitter_s': latency_jitter_s, 'tail_sigma': tail_sigma,
+            'error_rate': error_rate, 'throttle_rate': throttle_rate, 'max_concurrency': max_concurrency,
+            'output_chars': output_chars, 'image_px': image_px, 'seed': seed}
+    rep = run_bench(config, workflows=workflows, concurrency=concurrency, mode=mode, mock=mock, work_dir=work_dir)
+    table = Table('metric', 'value')
+    for k, v in rep.summary().items():
+        table.add_row(k, str(v))
+    Console().print(table)
+    if report:
+        Path(report).parent.mkdir(parents=True, exist_ok=True)
+        Path(report).write_text(json.dumps({'summary': rep.summary(), 'mock': mock}, indent=2), encoding='utf-8')
+        typer.echo(f'Report written to {report}')
+
+
+@app.command()
+def cache_info(config: str):
+    """List the cached action results of a config."""
+    from datetime import datetime
+    from ..runtime.orchestrator import result_cache_for
+
+    cache = result_cache_for(load_config(config))
+    entries = cache.entries()
+    table = Table('action', 'key', 'created', 'size')
+    for e in entries:
+        created = datetime.fromtimestamp(e['created_at']).isoformat(timespec='seconds')
+        table.add_row(str(e['action_id']), e['key'][:12], created, f"{e['size']:,} bytes")
+    Console().print(table)
+    typer.echo(f"{len(entries)} entries, {sum(e['size'] for e in entries):,} bytes in {cache.root}")
+
+
+@app.command()
+def cache_purge(config: str, action: Optional[str] = None, older_than: Optional[str] = None):
+    """Delete cached action results (all, one action's, or older than e.g. '7d')."""
+    from ..core.cache import parse_cache_setting
+    from ..runtime.orchestrator import result_cache_for
+
+    cache = result_cache_for(load_config(config))
+    max_age = parse_cache_setting(older_than)[1] if older_than else None
+    removed = cache.purge(action_id=action, older_than=max_age)
+    typer.echo(f'Removed {removed} entries')
+
+
 @app.command()
 def init(name: str = 'docflow', provider: str = 'mock', with_kb: bool = False, prompt_mode: str = 'inline', adapters: List[str] = ['docx','pptx']):
     # create config file and example templates
@@ -13,14 +13,130 @@ class ProjectConfig(BaseModel):
     log_level: str = 'INFO'
 
 
-class AIConfig(BaseModel):
+class ResponseCacheConfig(BaseModel):
+    """On-disk cache of provider responses (repeated prompts are not re-billed)"""
+    enabled: bool = False
+    # LRU eviction above this size; entries older than ttl are ignored
+    max_mb: int = Field(default=512, ge=1)
+    ttl: Optional[Union[int, float, str]] = None
+
+
+class RetryConfig(BaseModel):
+    """Backoff and circuit breaker for provider calls (attempts come from ai.retries)"""
+    base_delay_s: float = Field(default=0.5, ge=0)
+    max_delay_s: float = Field(default=30.0, ge=0)
+    # Retry-After hints longer than this are capped
+    max_retry_after_s: float = Field(default=120.0, ge=0)
+    # consecutive failures that open a provider's breaker, and how long it stays open
+    breaker_threshold: int = Field(default=5, ge=1)
+    breaker_reset_s: float = Field(default=30.0, ge=0)
+
+
+class RateLimitConfig(BaseModel):
+    """Client-side budget shared by every docflow process on this host"""
+    # None = ai.provider; model None = every model of the provider
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    rpm: Optional[float] = Field(default=None, gt=0)
+    tpm: Optional[float] = Field(default=None, gt=0)
+
+
+class ConcurrencyConfig(BaseModel):
+    """Adaptive (AIMD) limit on in-flight provider calls of generative actions"""
+    enabled: bool = False
+    initial: int = Field(default=4, ge=1)
+    min_limit: int = Field(default=1, ge=1)
+    max_limit: int = Field(default=32, ge=1)
+    # multiplicative decrease on throttling/timeouts
+    backoff: float = Field(default=0.5, gt=0, lt=1)
+    # a call is healthy within tolerance x best recent latency, or under latency_target_s if set
+    latency_tolerance: float = Field(default=2.0, ge=1)
+    latency_target_s: Optional[float] = Field(default=None, gt=0)
+
+
+class HedgeFallbackConfig(BaseModel):
+    """Secondary provider that receives hedged requests"""
+    provider: Literal['mock', 'openai', 'gemini', 'azure-openai']
+    model: Optional[str] = None
+    api_key_envvar: Optional[str] = None
+
+
+class HedgeConfig(BaseModel):
+    """Duplicate generate_text calls slower than a live latency percentile"""
+    enabled: bool = False
+    percentile: float = Field(default=95.0, gt=0, le=100)
+    # latencies observed before hedging starts
+    min_samples: int = Field(default=20, ge=1)
+    # spend cap: hedges as a percentage of all calls
+    max_extra_pct: float = Field(default=10.0, ge=0, le=100)
+    min_delay_s: float = Field(default=0.0, ge=0)
+    # None = hedge on the primary provider
+    fallback: Optional[HedgeFallbackConfig] = None
+
+
+class MockConfig(BaseModel):
+    """Simulated provider behaviour of provider: mock (default: instant answers)"""
+    latency: Literal['none', 'fixed', 'normal', 'longtail'] = 'none'
+    # fixed value, mean (normal) or median (longtail)
+    latency_s: float = Field(default=0.0, ge=0)
+    latency_jitter_s: float = Field(default=0.0, ge=0)
+    # lognormal shape of longtail: higher = heavier tail
+    tail_sigma: float = Field(default=1.0, gt=0)
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    throttle_rate: float = Field(default=0.0, ge=0, le=1)
+    # calls beyond this many in flight are throttled (HTTP 429)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+    output_chars: Optional[int] = Field(default=None, ge=1)
+    image_px: Optional[int] = Field(default=None, ge=1)
+    seed: Optional[int] = None
+
+
+class CassetteConfig(BaseModel):
+    """Recorded provider traffic, used with provider: cassette"""
+    # relative to project.base_dir
+    path: Path = Path('cassettes/ai.jsonl')
+    mode: Literal['record', 'replay'] = 'replay'
+    # provider whose responses are recorded (with ai.model and ai.api_key_envvar)
     provider: Literal['mock', 'openai', 'gemini', 'azure-openai'] = 'mock'
+
+
+class AIConfig(BaseModel):
+    provider: Literal['mock', 'openai', 'gemini', 'azure-openai', 'cassette'] = 'mock'
     api_base: Optional[str] = None
     model: Optional[str] = None
     img_model: Optional[str] = None
     api_key_envvar: Optional[str] = None
+    # per request to the provider (SDK calls and image downloads)
     timeout_s: int = 30
+    # keep-alive connections kept per host by the shared HTTP pools
+    http_pool_size: int = Field(default=10, ge=1)
     retries: int = 1
+    retry: RetryConfig = Field(default_factory=RetryConfig)
+    response_cache: ResponseCacheConfig = Field(default_factory=ResponseCacheConfig)
+    concurrency: ConcurrencyConfig = Field(default_factory=ConcurrencyConfig)
+    hedge: HedgeConfig = Field(default_factory=HedgeConfig)
+    cassette: CassetteConfig = Field(default_factory=CassetteConfig)
+    mock: MockConfig = Field(default_factory=MockConfig)
+    # share one provider call among identical concurrent requests
+    coalesce: bool = True
+    # requests/tokens per minute; the most specific matching entry applies
+    rate_limits: List[RateLimitConfig] = Field(default_factory=list)
+    # where bucket state is shared (default: <system temp>/docflow-ratelimit)
+    rate_limit_dir: Optional[Path] = None
+
+    def rate_limit_for(self, provider: Optional[str] = None, model: Optional[str] = None) -> Optional[RateLimitConfig]:
+        if provider is None and model is None:
+            model = self.model
+        provider = provider or self.provider
+        best = None
+        for rl in self.rate_limits:
+            if rl.provider not in (None, provider):
+                continue
+            if rl.model is not None and rl.model != model:
+                continue
+            if best is None or (rl.model is not None, rl.provider is not None) > (best.model is not None, best.provider is not None):
+                best = rl
+        return best
 
 
 class KBConfig(BaseModel):
@@ -30,21 +146,44 @@ class KBConfig(BaseModel):
     include_glob: str = '**/*'
     
     # Processing strategy - UNIFIED
-    strategy: Literal['inline', 'upload', 'hybrid', 'summarize', 'retrieve'] = 'inline'
+    strategy: Literal['inline', 'upload', 'hybrid', 'summarize', 'retrieve', 'bm25', 'vector'] = 'inline'
     max_chars: int = 10000
+    # bm25/vector: Jinja query rendered with the workflow vars, and chunks returned
+    query: Optional[str] = None
+    top_k: int = Field(default=5, ge=1)
+    # vector: offline feature hashing, or the AI provider's embeddings
+    embedder: Literal['hashing', 'provider'] = 'hashing'
+    embedding_dim: int = Field(default=256, ge=8)
+    embedding_model: Optional[str] = None
     
     # Upload options (formerly attachments)
     upload: bool = False
     mime_type: Optional[str] = None
+    # files not found in the upload cache are sent this many at a time
+    upload_concurrency: int = Field(default=4, ge=1)
     
     # Text extraction options
     as_text: bool = True
+    # keep extracted text under <temp_dir>/kb/extract for later actions and runs
+    extract_cache: bool = True
+    extract_cache_mb: int = Field(default=1024, ge=1)
+    # processes parsing PDFs page by page (1 = serial, 0 = one per CPU)
+    extract_workers: int = Field(default=1, ge=0)
     
     # Advanced chunking
     chunk_size: int = 2000
     chunk_overlap: int = 200
 
 
+class CodeWorkersConfig(BaseModel):
+    """Warm worker pool for code actions (instead of one interpreter per action)"""
+    enabled: bool = False
+    size: int = Field(default=2, ge=1)
+    # recycle a worker after this many jobs or once a job's peak RSS exceeds this
+    max_jobs: int = Field(default=100, ge=1)
+    max_memory_mb: int = 1024
+
+
 class ExportRule(BaseModel):
     name: str
     source: Literal['result_text', 'result_meta'] = 'result_text'
@@ -63,7 +202,13 @@ class ActionConfig(BaseModel):
     kb: Optional[KBConfig] = None
     code: Optional[str] = None
     code_file: Optional[Path] = None
+    # deprecated: parse VARS_JSON=/MULTIPLE_OUTPUTS=/image-path lines printed by code
+    legacy_stdout: bool = False
     exports: List[ExportRule] = Field(default_factory=list)
+    # result cache: true (no expiry), false, TTL in seconds or e.g. '12h'
+    cache: Union[bool, int, float, str] = False
+    # generative text: consume the provider's token stream (ttft/tokens per second in meta)
+    stream: bool = False
     # attachments field removed - now unified in kb
 
 
@@ -76,6 +221,9 @@ class TemplateConfig(BaseModel):
 class WorkflowConfig(BaseModel):
     actions: List[ActionConfig]
     templates: List[TemplateConfig]
+    # number of actions allowed to run concurrently (1 = sequential)
+    max_workers: int = Field(default=1, ge=1)
+    code_workers: CodeWorkersConfig = Field(default_factory=CodeWorkersConfig)
 
 
 class AppConfig(BaseModel):
@@ -154,7 +302,7 @@ def load_config(path: str) -> AppConfig:
     final = {
         'project': project,
         'ai': data.get('ai', {}),
-        'workflow': {'actions': actions, 'templates': templates},
+        'workflow': {**workflow, 'actions': actions, 'templates': templates},
     }
 
     return AppConfig(**final)
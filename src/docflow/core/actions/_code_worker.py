@@ -0,0 +1,188 @@
+"""Long-lived sandbox worker for CodeAction (run as a script, stdlib only).
+
+The worker pre-imports the modules code actions are allowed to use, then
+serves jobs over length-prefixed JSON frames on stdin/stdout. Each job is
+the runner script CodeAction would otherwise hand to a fresh interpreter,
+plus the text to feed on its stdin. Where ``os.fork`` exists every job runs
+in a forked child, so user code starts from the warm interpreter but can't
+leak state into later jobs; elsewhere it runs in a fresh namespace inside
+the worker, which the pool then recycles more aggressively.
+
+Request:  {"script": str, "stdin": str, "timeout": float}
+Response: {"returncode": int, "stdout": str, "stderr": str, "timeout": bool, "rss_kb": int},
+          where ``rss_kb`` is the job's peak RSS (the forked child's, from its rusage),
+          followed by one raw frame with whatever the job wrote on its IPC channel
+          (``DOCFLOW_IPC_FD``/``DOCFLOW_IPC_PATH``, see ``ipc.py``; may be empty)
+"""
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import traceback
+from typing import Tuple
+
+_HEADER = struct.Struct('>I')
+
+IPC_FD_ENV = 'DOCFLOW_IPC_FD'
+IPC_PATH_ENV = 'DOCFLOW_IPC_PATH'
+
+PRELOAD = ('math', 'statistics', 'json', 'matplotlib', 'matplotlib.pyplot', 'numpy', 'pandas')
+
+
+def read_frame(fh):
+    head = fh.read(_HEADER.size)
+    if len(head) < _HEADER.size:
+        return None
+    (size,) = _HEADER.unpack(head)
+    return fh.read(size)
+
+
+def write_frame(fh, payload: bytes):
+    fh.write(_HEADER.pack(len(payload)) + payload)
+    fh.flush()
+
+
+def _rss_kb() -> int:
+    try:
+        with open('/proc/self/statm', 'r') as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except Exception:
+        try:
+            import resource
+            return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        except Exception:
+            return 0
+
+
+def _maxrss_kb(ru) -> int:
+    # ru_maxrss is in KiB on Linux, in bytes on macOS
+    rss = int(ru.ru_maxrss)
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _exec_script(script: str, stdin_text: str) -> int:
+    """Run ``script`` as ``__main__`` with ``stdin_text`` on stdin; return its exit code."""
+    sys.stdin = io.StringIO(stdin_text)
+    sys.argv = ['<docflow-code>']
+    code = 0
+    try:
+        exec(compile(script, '<docflow-code>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    return code
+
+
+def _run_forked(script: str, stdin_text: str, timeout: float) -> Tuple[dict, bytes]:
+    out = tempfile.TemporaryFile()
+    err = tempfile.TemporaryFile()
+    chan = tempfile.TemporaryFile()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:  # child
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        sys.stdout = io.TextIOWrapper(os.fdopen(1, 'wb', closefd=False), encoding='utf-8', line_buffering=True)
+        sys.stderr = io.TextIOWrapper(os.fdopen(2, 'wb', closefd=False), encoding='utf-8', line_buffering=True)
+        os.environ[IPC_FD_ENV] = str(chan.fileno())
+        code = _exec_script(script, stdin_text)
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code & 0xFF)
+    deadline = time.monotonic() + timeout
+    delay = 0.0005
+    timed_out = False
+    status = 0
+    while True:
+        # wait4 reports the child's own rusage: its peak RSS is what the job used
+        wpid, status, ru = os.wait4(pid, os.WNOHANG)
+        if wpid == pid:
+            break
+        if time.monotonic() >= deadline:
+            os.kill(pid, 9)
+            _, _, ru = os.wait4(pid, 0)
+            timed_out = True
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.01)
+    out.seek(0)
+    err.seek(0)
+    chan.seek(0)
+    resp = {
+        'returncode': -9 if timed_out else os.waitstatus_to_exitcode(status),
+        'stdout': out.read().decode('utf-8', errors='replace'),
+        'stderr': err.read().decode('utf-8', errors='replace'),
+        'timeout': timed_out,
+        'rss_kb': _maxrss_kb(ru),
+    }
+    ipc_data = b'' if timed_out else chan.read()
+    out.close()
+    err.close()
+    chan.close()
+    return resp, ipc_data
+
+
+def _run_inline(script: str, stdin_text: str) -> Tuple[dict, bytes]:
+    # no fork: the parent enforces the timeout by killing this worker
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    out, err = io.StringIO(), io.StringIO()
+    fd, chan_path = tempfile.mkstemp(suffix='.ipc')
+    os.close(fd)
+    sys.stdout, sys.stderr = out, err
+    os.environ[IPC_PATH_ENV] = chan_path
+    try:
+        code = _exec_script(script, stdin_text)
+    finally:
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+        sys.stdin = io.StringIO('')
+        os.environ.pop(IPC_PATH_ENV, None)
+    with open(chan_path, 'rb') as fh:
+        ipc_data = fh.read()
+    os.unlink(chan_path)
+    return {'returncode': code, 'stdout': out.getvalue(), 'stderr': err.getvalue(), 'timeout': False,
+            'rss_kb': _rss_kb()}, ipc_data
+
+
+def main():
+    # keep the protocol on a private fd; stray prints from preloaded modules go to stderr
+    proto_out = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    proto_in = sys.stdin.buffer
+    for name in PRELOAD:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+    write_frame(proto_out, json.dumps({'ready': True, 'fork': hasattr(os, 'fork'), 'pid': os.getpid()}).encode('utf-8'))
+    while True:
+        frame = read_frame(proto_in)
+        if frame is None:
+            break
+        req = json.loads(frame.decode('utf-8'))
+        if req.get('shutdown'):
+            break
+        if hasattr(os, 'fork'):
+            resp, ipc_data = _run_forked(req['script'], req.get('stdin', ''), float(req.get('timeout', 10)))
+        else:
+            resp, ipc_data = _run_inline(req['script'], req.get('stdin', ''))
+        write_frame(proto_out, json.dumps(resp).encode('utf-8'))
+        write_frame(proto_out, ipc_data)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import io
+import os
 import subprocess
 import sys
 import json
 import tempfile
+import threading
 from pathlib import Path
+from . import ipc
 from ..results import ActionResult
 from ..context import ExecutionContext
 from ...logging_lib import setup_logger
@@ -13,14 +17,22 @@ logger = setup_logger(__name__)
 
 ALLOWED_MODULES = {'math', 'statistics', 'json', 'matplotlib', 'pandas', 'numpy'}
 
+# embedded in every runner script so the child needs no docflow import
+_IPC_SOURCE = Path(ipc.__file__).read_text(encoding='utf-8')
+
 
 def _make_runner_script(code: str) -> str:
     # wrapper that reads stdin JSON (vars) and executes user code
     # The user code is expected to define a `run(vars)` function that returns a dict.
-    # We will call it and then print back any VARS_JSON=... lines and the image path
+    # We call it and send the result back over the framed IPC channel (see ipc.py);
+    # printed output is plain text (see _parse_legacy_stdout for the old protocol).
     header = """
 import sys, json, os
-vars = json.load(sys.stdin)
+_docflow_ipc = {'__name__': '_docflow_ipc'}
+exec(_DOCFLOW_IPC_SOURCE, _docflow_ipc)
+_docflow_in = json.load(sys.stdin)
+# declared input vars arrive inline; held-back keys are fetched from the parent on access
+vars = _docflow_ipc['LazyVars'](_docflow_in.get('vars') or {}, _docflow_in.get('fetch'))
 # expose some common modules to user code
 import math, statistics, json as _json
 from matplotlib import pyplot as plt
@@ -38,12 +50,18 @@ if 'run' in globals():
         sys.exit(1)
 elif 'main' in globals():
     try:
-        # Create a context-like object
+        # Create a context-like object; attributes are looked up in vars on
+        # access, so keys held back by the parent are fetched like vars[...]
         class Context:
             def __init__(self, vars_data):
-                for k, v in vars_data.items():
-                    setattr(self, k, v)
-        
+                self._docflow_vars = vars_data
+
+            def __getattr__(self, name):
+                try:
+                    return self._docflow_vars[name]
+                except KeyError:
+                    raise AttributeError(name) from None
+
         ctx = Context(vars)
         result = main(ctx)
     except Exception as e:
@@ -53,44 +71,165 @@ else:
     # if the user didn't define run or main, try to use a top-level result variable
     result = globals().get('result', None)
 
-# Handle different result types
+# Report the result on the IPC channel (raw bytes allowed, no stdout parsing)
+def _docflow_item(item):
+    if isinstance(item, dict):
+        return {'type': 'dict', 'data': item}
+    if isinstance(item, str):
+        return {'type': 'str', 'data': item}
+    if isinstance(item, (bytes, bytearray)):
+        return {'type': 'bytes', 'data': bytes(item)}
+    return {'type': 'other', 'data': str(item)}
+
 if isinstance(result, tuple):
-    # Multiple outputs case - encode as special JSON structure
-    print('MULTIPLE_OUTPUTS=' + json.dumps({
-        'is_tuple': True,
-        'items': [
-            {'type': 'dict', 'data': item} if isinstance(item, dict) 
-            else {'type': 'str', 'data': str(item)} if isinstance(item, str)
-            else {'type': 'other', 'data': str(item)}
-            for item in result
-        ]
-    }))
+    _docflow_msg = {'kind': 'tuple', 'items': [_docflow_item(item) for item in result]}
 elif isinstance(result, dict):
-    # emit vars as JSON on a predictable line
-    v = result.get('vars', {})
-    try:
-        print('VARS_JSON=' + json.dumps(v))
-    except Exception:
-        pass
-    # if an image path is present, print it as the last line
-    img = None
-    for k, val in result.items():
-        if k.startswith('image') and isinstance(val, str):
-            img = val
-            break
-    if img:
-        print(img)
-    elif any(k.startswith('image') and isinstance(v, (bytes, bytearray)) for k, v in result.items()):
-        # cannot transfer raw bytes via stdout here; rely on path
-        pass
-    # also, if there's a textual result
-    if 'result_text' in result and result.get('result_text'):
-        print(result.get('result_text'))
+    _docflow_msg = {
+        'kind': 'dict',
+        'vars': result.get('vars') or {},
+        'images': {k: v for k, v in result.items() if k.startswith('image') and isinstance(v, (str, bytes, bytearray))},
+        'result_text': result.get('result_text') or '',
+    }
 elif result is not None:
-    # Single value result
-    print(str(result))
+    _docflow_msg = {'kind': 'value', 'data': _docflow_item(result)['data']}
+else:
+    _docflow_msg = {'kind': 'none'}
+
+_docflow_fh = _docflow_ipc['open_channel']()
+if _docflow_fh is not None:
+    sys.stdout.flush()
+    _docflow_ipc['write_message'](_docflow_fh, _docflow_msg)
+    _docflow_fh.close()
 """
-    return header + code + footer
+    return header.replace('_DOCFLOW_IPC_SOURCE', repr(_IPC_SOURCE)) + code + footer
+
+
+def _run_subprocess(script: str, stdin_text: str, timeout: float):
+    """Run ``script`` in a fresh interpreter; return ``(CompletedProcess, ipc message)``.
+
+    On POSIX the child reports on an inherited pipe drained by a reader
+    thread; elsewhere it writes the message to a temporary file.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as f:
+        f.write(script)
+        script_path = f.name
+    try:
+        if os.name == 'posix':
+            return _run_with_pipe([sys.executable, script_path], stdin_text, timeout)
+        return _run_with_file([sys.executable, script_path], stdin_text, timeout)
+    finally:
+        try:
+            os.unlink(script_path)
+        except OSError:
+            pass
+
+
+def _run_with_pipe(cmd: List[str], stdin_text: str, timeout: float):
+    r, w = os.pipe()
+    env = {**os.environ, ipc.IPC_FD_ENV: str(w)}
+    try:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, pass_fds=(w,), env=env)
+    except BaseException:
+        os.close(r)
+        raise
+    finally:
+        os.close(w)
+    box: Dict[str, Any] = {}
+
+    def _drain():
+        with os.fdopen(r, 'rb') as fh:
+            try:
+                box['msg'] = ipc.read_message(fh)
+            except Exception as e:
+                box['error'] = e
+            fh.read()  # keep draining so the child never blocks on a full pipe
+
+    reader = threading.Thread(target=_drain, name='docflow-code-ipc', daemon=True)
+    reader.start()
+    try:
+        stdout, stderr = proc.communicate(stdin_text, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        reader.join()
+        raise
+    reader.join()
+    if 'error' in box:
+        logger.info({'event': 'code_action_ipc_error', 'error': str(box['error'])})
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr), box.get('msg')
+
+
+def _run_with_file(cmd: List[str], stdin_text: str, timeout: float):
+    with tempfile.NamedTemporaryFile(suffix='.ipc', delete=False) as f:
+        ipc_path = f.name
+    try:
+        proc = subprocess.run(cmd, input=stdin_text, text=True, capture_output=True, timeout=timeout,
+                              env={**os.environ, ipc.IPC_PATH_ENV: ipc_path})
+        with open(ipc_path, 'rb') as fh:
+            return proc, ipc.read_message(fh)
+    finally:
+        try:
+            os.unlink(ipc_path)
+        except OSError:
+            pass
+
+
+def _decode_pool_ipc(proc: subprocess.CompletedProcess) -> Optional[Dict[str, Any]]:
+    raw = getattr(proc, 'ipc', b'')
+    return ipc.read_message(io.BytesIO(raw)) if raw else None
+
+
+def _split_inputs(global_vars: Dict[str, Any], input_vars: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """Values sent inline on stdin, and the keys held back for lazy fetching.
+
+    With ``input_vars`` declared only those keys go inline; otherwise the
+    whole context does. Values that don't serialize to JSON (e.g. image
+    bytes) are always held back, so they reach the runner with their type.
+    """
+    keys = [k for k in input_vars if k in global_vars] if input_vars else list(global_vars)
+    inline = {k: global_vars[k] for k in keys}
+    try:
+        json.dumps(inline)
+    except (TypeError, ValueError):
+        for k in keys:
+            try:
+                json.dumps(inline[k])
+            except (TypeError, ValueError):
+                del inline[k]
+    return inline, [k for k in global_vars if k not in inline]
+
+
+def _parse_legacy_stdout(stdout: str) -> Tuple[Dict[str, Any], Optional[str], Any, List[str]]:
+    """Deprecated stdout protocol (``legacy_stdout: true``), removed in a future release.
+
+    ``VARS_JSON=`` and ``MULTIPLE_OUTPUTS=`` lines carry JSON results and a
+    bare ``.png``/``.jpg`` line is taken as the image path; the rest is text.
+    """
+    vars_out: Dict[str, Any] = {}
+    image_path: Optional[str] = None
+    multiple_outputs_result = None
+    text_lines: List[str] = []
+    for line in stdout.splitlines():
+        if line.startswith('VARS_JSON='):
+            try:
+                j = json.loads(line[len('VARS_JSON='):])
+                if isinstance(j, dict):
+                    vars_out.update(j)
+            except Exception:
+                pass
+        elif line.startswith('MULTIPLE_OUTPUTS='):
+            try:
+                multiple_outputs_result = json.loads(line[len('MULTIPLE_OUTPUTS='):])
+            except Exception:
+                pass
+        else:
+            candidate = line.strip()
+            if candidate and (candidate.endswith('.png') or candidate.endswith('.jpg') or candidate.endswith('.jpeg')):
+                image_path = candidate
+            else:
+                text_lines.append(candidate)
+    return vars_out, image_path, multiple_outputs_result, text_lines
 
 
 class CodeAction:
@@ -109,52 +248,76 @@ class CodeAction:
             return ActionResult(kind='text', data='', meta={'error': 'no_code'}, vars={})
 
         script = _make_runner_script(code)
-        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as f:
-            f.write(script)
-            script_path = f.name
+        pool = getattr(ctx, 'code_pool', None)
+        inline, held = _split_inputs(vars_in, self.cfg.get('input_vars') or [])
+        server = ipc.VarServer(vars_in, held) if held else None
+        payload = json.dumps({'vars': inline, 'fetch': server.descriptor() if server else None})
+        # json.dumps escapes non-ASCII, so characters == bytes on the wire
+        io_meta: Dict[str, Any] = {'payload_bytes': len(payload)}
         try:
-            logger.info({'event': 'code_action_start', 'id': self.cfg.get('id'), 'timeout': self.cfg.get('timeout', 10)})
-            proc = subprocess.run([sys.executable, script_path], input=json.dumps(vars_in), text=True, capture_output=True, timeout=self.cfg.get('timeout', 10))
+            logger.info({'event': 'code_action_start', 'id': self.cfg.get('id'), 'timeout': self.cfg.get('timeout', 10), 'pooled': pool is not None,
+                         'payload_bytes': io_meta['payload_bytes'], 'vars_sent': len(inline), 'vars_held': len(held)})
+            if pool is not None:
+                proc = pool.run(script, input=payload, timeout=self.cfg.get('timeout', 10))
+                message = _decode_pool_ipc(proc)
+            else:
+                proc, message = _run_subprocess(script, payload, self.cfg.get('timeout', 10))
         except subprocess.TimeoutExpired:
             logger.info({'event': 'code_action_timeout', 'id': self.cfg.get('id')})
             return ActionResult(kind='text', data='', meta={'error': 'timeout', 'timeout': True}, vars={})
+        finally:
+            if server is not None:
+                server.close()
+                if server.fetched:
+                    # keys read without being declared: worth adding to input_vars
+                    io_meta['vars_fetched'] = sorted(set(server.fetched))
+                    logger.info({'event': 'code_action_vars_fetched', 'id': self.cfg.get('id'), 'keys': io_meta['vars_fetched']})
 
         stdout = proc.stdout or ''
         stderr = proc.stderr or ''
         if proc.returncode != 0:
             logger.info({'event': 'code_action_nonzero', 'id': self.cfg.get('id'), 'returncode': proc.returncode})
-            return ActionResult(kind='text', data='', meta={'error': 'nonzero_exit', 'returncode': proc.returncode, 'stderr': stderr}, vars={})
+            return ActionResult(kind='text', data='', meta={'error': 'nonzero_exit', 'returncode': proc.returncode, 'stderr': stderr, **io_meta}, vars={})
 
         vars_out: Dict[str, Any] = {}
         image_path: str | None = None
-        text_lines: List[str] = []
         multiple_outputs_result = None
-        
-        for line in stdout.splitlines():
-            if line.startswith('VARS_JSON='):
-                try:
-                    j = json.loads(line[len('VARS_JSON='):])
-                    if isinstance(j, dict):
-                        vars_out.update(j)
-                except Exception:
-                    pass
-            elif line.startswith('MULTIPLE_OUTPUTS='):
-                try:
-                    multiple_outputs_result = json.loads(line[len('MULTIPLE_OUTPUTS='):])
-                except Exception:
-                    pass
-            else:
-                candidate = line.strip()
-                if candidate and (candidate.endswith('.png') or candidate.endswith('.jpg') or candidate.endswith('.jpeg')):
-                    image_path = candidate
+        # printed output is plain text; results travel on the IPC channel
+        text_lines = [line.strip() for line in stdout.splitlines()]
+        if self.cfg.get('legacy_stdout'):
+            logger.info({'event': 'code_action_legacy_stdout', 'id': self.cfg.get('id'),
+                         'deprecated': 'return vars/images from run() instead of printing them'})
+            vars_out, image_path, multiple_outputs_result, text_lines = _parse_legacy_stdout(stdout)
+
+        image_bytes: Optional[bytes] = None
+        returns = self.cfg.get('returns', 'text')
+        if message:
+            kind = message.get('kind')
+            if kind == 'tuple':
+                multiple_outputs_result = {'is_tuple': True, 'items': message.get('items', [])}
+            elif kind == 'dict':
+                if isinstance(message.get('vars'), dict):
+                    vars_out.update(message['vars'])
+                for val in (message.get('images') or {}).values():
+                    if isinstance(val, bytes):
+                        image_bytes = image_bytes or val
+                    elif val and not image_path:
+                        image_path = val
+                if message.get('result_text'):
+                    text_lines.append(str(message['result_text']))
+            elif kind == 'value':
+                value = message.get('data')
+                if isinstance(value, bytes):
+                    image_bytes = value
+                elif returns == 'image' and str(value).strip().lower().endswith(('.png', '.jpg', '.jpeg')):
+                    image_path = str(value).strip()
                 else:
-                    text_lines.append(candidate)
+                    text_lines.append(str(value))
 
         text = '\n'.join([line for line in text_lines if line])
         logger.info({'event': 'code_action_text_success', 'id': self.cfg.get('id'), 'chars': len(text)})
         
         # Check if we have multiple outputs from the code execution
-        returns = self.cfg.get('returns', 'text')
         if multiple_outputs_result and isinstance(returns, list) and len(returns) > 1:
             # Parse the multiple outputs result
             items = multiple_outputs_result.get('items', [])
@@ -181,8 +344,8 @@ class CodeAction:
             for return_type in returns:
                 if return_type == 'vars':
                     outputs.append(vars_out)
-                elif return_type == 'image' and image_path:
-                    outputs.append(image_path)
+                elif return_type == 'image' and (image_bytes or image_path):
+                    outputs.append(image_bytes or image_path)
                 elif return_type == 'text':
                     outputs.append(text)
                 else:
@@ -191,10 +354,13 @@ class CodeAction:
             return tuple(outputs)
         else:
             # Single output (existing behavior)
+            if self.cfg.get('returns') == 'image' and image_bytes:
+                logger.info({'event': 'code_action_image_success', 'id': self.cfg.get('id'), 'bytes': len(image_bytes)})
+                return ActionResult(kind='image', data=image_bytes, meta={'returncode': proc.returncode, **io_meta}, vars=vars_out)
             if self.cfg.get('returns') == 'image' and image_path:
                 p = Path(image_path)
                 if p.exists():
                     logger.info({'event': 'code_action_image_success', 'id': self.cfg.get('id'), 'image_path': str(p)})
-                    return ActionResult(kind='image', data=str(p), meta={'returncode': proc.returncode}, vars=vars_out)
+                    return ActionResult(kind='image', data=str(p), meta={'returncode': proc.returncode, **io_meta}, vars=vars_out)
             
-            return ActionResult(kind='text', data=text, meta={'returncode': proc.returncode}, vars=vars_out)
+            return ActionResult(kind='text', data=text, meta={'returncode': proc.returncode, **io_meta}, vars=vars_out)
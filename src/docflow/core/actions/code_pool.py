@@ -0,0 +1,240 @@
+"""Pool of warm sandbox worker processes for CodeAction.
+
+Spawning ``sys.executable`` per code action re-imports matplotlib (and
+friends) every time. The pool keeps a few ``_code_worker.py`` processes
+alive with those modules already imported and sends them runner scripts
+over a framed pipe. :meth:`CodeWorkerPool.run` mirrors ``subprocess.run``:
+it returns a ``CompletedProcess`` (plus the job's raw IPC bytes in
+``.ipc``) and raises ``TimeoutExpired``, so CodeAction handles both paths
+identically.
+"""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import atexit
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from ...logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+WORKER_SCRIPT = Path(__file__).with_name('_code_worker.py')
+
+# seconds granted to a worker on top of the job timeout before it is killed
+_GRACE_S = 5.0
+
+
+def _read_frame(fh) -> Optional[bytes]:
+    head = fh.read(4)
+    if len(head) < 4:
+        return None
+    size = int.from_bytes(head, 'big')
+    return fh.read(size)
+
+
+class _Worker:
+    def __init__(self):
+        kwargs: Dict[str, Any] = {}
+        if os.name == 'posix':
+            # own process group so a hung job (and its forked child) can be killed together
+            kwargs['start_new_session'] = True
+        self.proc = subprocess.Popen(
+            [sys.executable, '-u', str(WORKER_SCRIPT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **kwargs,
+        )
+        self.jobs = 0
+        # peak RSS of the last job (the forked child when the worker forks)
+        self.rss_kb = 0
+        self._responses: 'queue.Queue[Optional[bytes]]' = queue.Queue()
+        self._reader = threading.Thread(target=self._read_loop, name=f'docflow-code-worker-{self.proc.pid}', daemon=True)
+        self._reader.start()
+        hello = self._responses.get(timeout=60)
+        if hello is None:
+            raise RuntimeError('code worker failed to start')
+        info = json.loads(hello.decode('utf-8'))
+        self.forks = bool(info.get('fork'))
+
+    def _read_loop(self):
+        while True:
+            try:
+                frame = _read_frame(self.proc.stdout)
+            except Exception:
+                frame = None
+            self._responses.put(frame)
+            if frame is None:
+                return
+
+    def request(self, payload: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+        """Send one job; ``None`` means the worker died or missed its deadline."""
+        data = json.dumps(payload).encode('utf-8')
+        try:
+            self.proc.stdin.write(len(data).to_bytes(4, 'big') + data)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return None
+        try:
+            frame = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if frame is None:
+            return None
+        # the JSON response is always followed by the job's raw IPC frame
+        try:
+            ipc_frame = self._responses.get(timeout=_GRACE_S)
+        except queue.Empty:
+            return None
+        if ipc_frame is None:
+            return None
+        self.jobs += 1
+        resp = json.loads(frame.decode('utf-8'))
+        resp['ipc'] = ipc_frame
+        self.rss_kb = int(resp.get('rss_kb') or 0)
+        return resp
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self):
+        try:
+            if os.name == 'posix':
+                os.killpg(self.proc.pid, 9)
+            else:
+                self.proc.kill()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+    def close(self):
+        try:
+            data = b'{"shutdown": true}'
+            self.proc.stdin.write(len(data).to_bytes(4, 'big') + data)
+            self.proc.stdin.flush()
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.kill()
+
+
+class CodeWorkerPool:
+    """Bounded pool of warm code workers.
+
+    Workers are started lazily, reused across jobs and recycled after
+    ``max_jobs`` jobs or once a job's peak RSS exceeds ``max_memory_mb``. A worker
+    that can't fork (no ``os.fork``) runs jobs in-process and is recycled
+    after every job so user code never shares an interpreter.
+    """
+
+    def __init__(self, size: int = 2, max_jobs: int = 100, max_memory_mb: int = 1024):
+        self.size = max(1, int(size))
+        self.max_jobs = max(1, int(max_jobs))
+        self.max_memory_mb = max_memory_mb
+        self._idle: List[_Worker] = []
+        self._started = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {'jobs': 0, 'spawned': 0, 'recycled': 0, 'killed': 0}
+
+    def _acquire(self) -> _Worker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('code worker pool is closed')
+                while self._idle:
+                    w = self._idle.pop()
+                    if w.alive():
+                        return w
+                    self._started -= 1
+                if self._started < self.size:
+                    self._started += 1
+                    break
+                self._cond.wait()
+        try:
+            w = _Worker()
+        except Exception:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats['spawned'] += 1
+        logger.info({'event': 'code_worker_spawned', 'pid': w.proc.pid, 'forks': w.forks})
+        return w
+
+    def _release(self, w: _Worker, healthy: bool):
+        recycle = (
+            not healthy
+            or not w.alive()
+            or not w.forks
+            or w.jobs >= self.max_jobs
+            or (self.max_memory_mb and w.rss_kb > self.max_memory_mb * 1024)
+        )
+        if recycle:
+            if healthy:
+                w.close()
+            else:
+                w.kill()
+        with self._cond:
+            if recycle:
+                self._started -= 1
+                self.stats['recycled' if healthy else 'killed'] += 1
+            elif self._closed:
+                w.close()
+                self._started -= 1
+            else:
+                self._idle.append(w)
+            self._cond.notify()
+
+    def run(self, script: str, input: str, timeout: float) -> subprocess.CompletedProcess:
+        """Run a runner script with ``input`` on stdin, like ``subprocess.run(..., text=True)``."""
+        w = self._acquire()
+        resp = w.request({'script': script, 'stdin': input, 'timeout': timeout}, timeout + _GRACE_S)
+        with self._cond:
+            self.stats['jobs'] += 1
+        if resp is None or resp.get('timeout'):
+            # forked jobs time out inside the worker, which stays warm; anything else is killed
+            self._release(w, healthy=resp is not None)
+            raise subprocess.TimeoutExpired(cmd='docflow-code-worker', timeout=timeout)
+        self._release(w, healthy=True)
+        proc = subprocess.CompletedProcess(args='docflow-code-worker', returncode=resp['returncode'],
+                                           stdout=resp.get('stdout', ''), stderr=resp.get('stderr', ''))
+        # raw bytes the job wrote on its IPC channel (decoded by CodeAction)
+        proc.ipc = resp.get('ipc', b'')
+        return proc
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+            self._cond.notify_all()
+        for w in idle:
+            w.close()
+
+
+_pools: Dict[tuple, CodeWorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_code_pool(size: int = 2, max_jobs: int = 100, max_memory_mb: int = 1024) -> CodeWorkerPool:
+    """Process-wide pool for the given settings (shared by runs and batch records)."""
+    key = (size, max_jobs, max_memory_mb)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = CodeWorkerPool(size=size, max_jobs=max_jobs, max_memory_mb=max_memory_mb)
+        return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -1,7 +1,11 @@
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
+import asyncio
+import threading
 import time
 import json
 import io
+import re
+import uuid
 import matplotlib.pyplot as plt
 from pathlib import Path
 from ..results import ActionResult
@@ -9,6 +13,11 @@ from ..context import ExecutionContext
 from ...runtime.prompt_builder import build_prompt_for_action
 from ...kb.strategies import kb_strategy_processor
 from ...kb.loader import read_kb_texts
+from ...kb.extract_cache import extract_cache_for
+from ...ai.client import unwrap_client
+from ...ai.ratelimit import estimate_tokens
+from ...ai.retry import RetryPolicy
+from ...ai.upload_cache import upload_files
 from ...logging_lib import setup_logger
 
 logger = setup_logger(__name__)
@@ -19,14 +28,14 @@ class MockAIClient:
         self.provider = provider
         self.model = model
 
-    def generate_text(self, prompt: str) -> Dict[str, Any]:
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         start = time.time()
         # mock: if prompt starts with JSON block, return it in text
         text = f"Echo: {prompt[:200]}"
         latency = time.time() - start
         return {'text': text, 'meta': {'provider': self.provider, 'model': self.model, 'latency': latency}}
 
-    def generate_image(self, prompt: str) -> Dict[str, Any]:
+    def generate_image(self, prompt: str, **kwargs) -> Dict[str, Any]:
 
         start = time.time()
         fig, ax = plt.subplots(figsize=(4, 2))
@@ -40,6 +49,39 @@ class MockAIClient:
         return {'image_bytes': bio.getvalue(), 'meta': {'provider': self.provider, 'model': self.model, 'latency': latency}}
 
 
+def _kb_memo_key(kb_cfg: Dict[str, Any]):
+    """Key for sharing a KB result through ``ctx.action_cache``.
+
+    ``None`` when the result depends on the current vars (``retrieve``,
+    ``bm25``, ``vector`` or a templated ``max_chars``) and so must not be shared.
+    """
+    if kb_cfg.get('strategy') in ('retrieve', 'bm25', 'vector') or str(kb_cfg.get('max_chars', '')).startswith('{{'):
+        return None
+    return 'kb:' + json.dumps(kb_cfg, sort_keys=True, default=str)
+
+
+_kb_memo_locks: Dict[str, threading.Lock] = {}
+_kb_memo_locks_guard = threading.Lock()
+
+
+def _kb_memo_lock(memo_key: str) -> threading.Lock:
+    with _kb_memo_locks_guard:
+        return _kb_memo_locks.setdefault(memo_key, threading.Lock())
+
+
+async def _acall(client: Any, method: str, *args, **kwargs) -> Dict[str, Any]:
+    """Call ``client.a<method>`` if the client is async-aware, else run it on a thread."""
+    afn = getattr(client, 'a' + method, None)
+    if afn is not None:
+        return await afn(*args, **kwargs)
+    return await asyncio.to_thread(getattr(client, method), *args, **kwargs)
+
+
+def _limiter_meta(limiter: Any, queued: float) -> Dict[str, Any]:
+    stats = limiter.stats()
+    return {'concurrency_limit': stats['limit'], 'queue_depth': stats['queue_depth'], 'queue_wait_s': round(queued, 4)}
+
+
 class GenerativeAction:
     def __init__(self, cfg: Dict[str, Any]):
         self.cfg = cfg or {}
@@ -52,17 +94,28 @@ class GenerativeAction:
             return ctx.ai_client
         return MockAIClient(provider=self.cfg.get('provider', 'mock'), model=self.cfg.get('model', 'mock-1'))
 
-    def execute(self, ctx: ExecutionContext) -> ActionResult:
+    def _prepare(self, ctx: ExecutionContext):
+        """Process KB, resolve the prompt and upload attachments.
+
+        Returns ``(vars_in, prompt, client, provider_kwargs)``; shared by the
+        sync and async execution paths.
+        """
         # gather variables and build context using unified KB system
         vars_in = ctx.global_vars if ctx is not None else {}
         
         # Process KB using unified strategy (replaces both old KB and attachments)
         kb_result = {}
         if self.cfg.get('kb') and self.cfg.get('kb', {}).get('enabled'):
-            # Pass verbose flag to KB processing
-            kb_vars = vars_in.copy()
-            kb_vars['_verbose'] = getattr(ctx, 'verbose', False)
-            kb_result = kb_strategy_processor.process_kb(self.cfg.get('kb', {}), kb_vars)
+            memo = getattr(ctx, 'action_cache', None)
+            memo_key = _kb_memo_key(self.cfg.get('kb', {}))
+            if memo is None or memo_key is None:
+                kb_result = self._process_kb(ctx, vars_in)
+            else:
+                # one extraction per KB even when parallel actions/records ask at once
+                with _kb_memo_lock(memo_key):
+                    if memo_key not in memo:
+                        memo[memo_key] = self._process_kb(ctx, vars_in)
+                    kb_result = memo[memo_key]
         
         # Extract KB text for prompt building (backward compatibility)
         kb_text = kb_result.get('kb_text', '')
@@ -81,78 +134,209 @@ class GenerativeAction:
         provider_kwargs: Dict[str, Any] = {}
         remote_refs = kb_result.get('attachments', [])
         if remote_refs and client and hasattr(client, 'upload_file'):
-            uploaded_refs = []
-            for attachment in remote_refs:
-                try:
-                    uploaded_ref = client.upload_file(
-                        attachment['path'], 
-                        mime_type=attachment.get('mime_type')
-                    )
-                    uploaded_refs.append(uploaded_ref)
-                except Exception as e:
-                    logger.info({'event': 'kb_upload_error', 'path': attachment['path'], 'error': str(e)})
-            
+            kb_cfg = self.cfg.get('kb', {}) or {}
+            uploaded_refs, stats = upload_files(client, remote_refs, getattr(ctx, 'kb_cache_dir', None),
+                                                max_workers=kb_cfg.get('upload_concurrency', 4))
             if uploaded_refs:
                 provider_kwargs['attachments'] = uploaded_refs
-                logger.info({'event': 'kb_files_uploaded', 'count': len(uploaded_refs)})
+                logger.info({'event': 'kb_files_uploaded', 'count': len(uploaded_refs), **stats})
+        return vars_in, prompt, client, provider_kwargs
+
+    def _process_kb(self, ctx: ExecutionContext, vars_in: Dict[str, Any]) -> Dict[str, Any]:
+        # Pass verbose flag to KB processing
+        kb_vars = vars_in.copy()
+        kb_vars['_verbose'] = getattr(ctx, 'verbose', False)
+        kb_vars['_kb_cache_dir'] = getattr(ctx, 'kb_cache_dir', None)
+        kb_cfg = self.cfg.get('kb', {}) or {}
+        if kb_cfg.get('embedder') == 'provider':
+            kb_vars['_ai_client'] = self._get_client(ctx)
+            kb_vars['_retry_policy'] = getattr(ctx, 'retry_policy', None)
+        cache = None
+        if getattr(ctx, 'kb_cache_dir', None) and kb_cfg.get('extract_cache', True):
+            cache = extract_cache_for(ctx.kb_cache_dir, kb_cfg.get('extract_cache_mb', 1024) * 1024 * 1024)
+            before = cache.stats()
+            kb_vars['_extract_cache'] = cache
+        result = kb_strategy_processor.process_kb(kb_cfg, kb_vars)
+        if cache is not None:
+            after = cache.stats()
+            logger.info({'event': 'kb_extract_cache', 'id': self.cfg.get('id'),
+                         **{k: after[k] - before[k] for k in after}})
+        return result
+
+    def _mode(self) -> str:
+        return self.cfg.get('mode') or ('image' if self.cfg.get('returns') == 'image' else 'text')
 
-        retries = int(self.cfg.get('retries', 1) or 1)
-        last_exc: Exception | None = None
+    def _image_path(self, ctx: ExecutionContext, vars_in: Dict[str, Any]) -> Path:
+        assets_dir = Path(getattr(ctx, 'assets_dir', vars_in.get('_assets_dir', 'build/assets')))
+        assets_dir.mkdir(parents=True, exist_ok=True)
+        # parallel actions (and retries) must never share a file
+        action_id = re.sub(r'[^\w.-]', '_', str(self.cfg.get('id') or 'action'))
+        return assets_dir / f"gen_image_{action_id}_{int(time.time()*1000)}_{uuid.uuid4().hex[:8]}.png"
 
-        for attempt in range(1, retries + 1):
+    def _image_result(self, out: Dict[str, Any], start: float, attempt: int, out_path: Path) -> ActionResult:
+        if out.get('image_path'):
+            # the provider streamed the image to disk itself
+            out_path = Path(out['image_path'])
+            size = out_path.stat().st_size
+        else:
+            img_bytes = out.get('image_bytes')
+            if not img_bytes:
+                raise RuntimeError((out.get('meta') or {}).get('error') or 'Provider returned no image bytes')
+            out_path.write_bytes(img_bytes)
+            size = len(img_bytes)
+        latency = time.time() - start
+        vars_out = dict(self.cfg.get('vars', {}) or {})
+        if self.cfg.get('export_path_var'):
+            vars_out[self.cfg.get('export_path_var')] = str(out_path)
+        meta = out.get('meta', {})
+        meta.update({'latency': latency, 'out_bytes': size, 'attempts': attempt, 'vars_emitted': len(vars_out)})
+        return ActionResult(kind='image', data=str(out_path), meta=meta, vars=vars_out)
+
+    def _text_result(self, out: Dict[str, Any], start: float, attempt: int):
+        text = out.get('text') or ''
+        vars_out: Dict[str, Any] = {}
+        stripped = text.strip()
+        if stripped.startswith('{') or stripped.startswith('['):
             try:
-                start = time.time()
-                mode = self.cfg.get('mode') or ('image' if self.cfg.get('returns') == 'image' else 'text')
-                if mode == 'image':
-                    logger.info({'event': 'generative_image_start', 'attempt': attempt})
-                    out = client.generate_image(prompt, **provider_kwargs)
-                    img_bytes = out.get('image_bytes')
-                    if not img_bytes:
-                        raise RuntimeError('Provider returned no image bytes')
-                    latency = time.time() - start
-                    assets_dir = Path(getattr(ctx, 'assets_dir', vars_in.get('_assets_dir', 'build/assets')))
-                    assets_dir.mkdir(parents=True, exist_ok=True)
-                    out_path = assets_dir / f"gen_image_{int(time.time()*1000)}.png"
-                    out_path.write_bytes(img_bytes)
-                    vars_out = dict(self.cfg.get('vars', {}) or {})
-                    if self.cfg.get('export_path_var'):
-                        vars_out[self.cfg.get('export_path_var')] = str(out_path)
-                    meta = out.get('meta', {})
-                    meta.update({'latency': latency, 'out_bytes': len(img_bytes), 'attempts': attempt, 'vars_emitted': len(vars_out)})
-                    return ActionResult(kind='image', data=str(out_path), meta=meta, vars=vars_out)
-                else:
-                    logger.info({'event': 'generative_text_start', 'attempt': attempt})
-                    out = client.generate_text(prompt, **provider_kwargs)
-                    text = out.get('text') or ''
-                    vars_out: Dict[str, Any] = {}
-                    stripped = text.strip()
-                    if stripped.startswith('{') or stripped.startswith('['):
-                        try:
-                            parsed = json.loads(stripped)
-                            if isinstance(parsed, dict):
-                                vars_out.update(parsed)
-                        except Exception:
-                            pass
-                    vars_out.update(self.cfg.get('vars', {}) or {})
-                    latency = time.time() - start
-                    meta = out.get('meta', {})
-                    meta.update({'latency': latency, 'out_bytes': len(text.encode('utf-8')), 'attempts': attempt, 'vars_emitted': len(vars_out)})
-                    
-                    # Check if multiple outputs are requested
-                    returns = self.cfg.get('returns', 'text')
-                    if isinstance(returns, list) and len(returns) > 1:
-                        # Handle multiple outputs
-                        return self._handle_multiple_outputs(text, vars_out, returns, meta)
-                    else:
-                        # Single output (existing behavior)
-                        return ActionResult(kind='text', data=text, meta=meta, vars=vars_out)
-            except Exception as e:  # store and retry
-                last_exc = e
-                logger.info({'event': 'generative_attempt_error', 'attempt': attempt, 'error': str(e)})
-                if attempt < retries:
-                    time.sleep(0.5 * attempt)
-        # all attempts failed
-        raise last_exc or RuntimeError('generative action failed')
+                parsed = json.loads(stripped)
+                if isinstance(parsed, dict):
+                    vars_out.update(parsed)
+            except Exception:
+                pass
+        vars_out.update(self.cfg.get('vars', {}) or {})
+        latency = time.time() - start
+        meta = out.get('meta', {})
+        meta.update({'latency': latency, 'out_bytes': len(text.encode('utf-8')), 'attempts': attempt, 'vars_emitted': len(vars_out)})
+        
+        # Check if multiple outputs are requested
+        returns = self.cfg.get('returns', 'text')
+        if isinstance(returns, list) and len(returns) > 1:
+            # Handle multiple outputs
+            return self._handle_multiple_outputs(text, vars_out, returns, meta)
+        else:
+            # Single output (existing behavior)
+            return ActionResult(kind='text', data=text, meta=meta, vars=vars_out)
+
+    def _retry(self, ctx: ExecutionContext, client: Any):
+        """Retry policy, attempt count and breaker name for this action's provider calls."""
+        policy = getattr(ctx, 'retry_policy', None) or RetryPolicy()
+        attempts = int(self.cfg.get('retries') or policy.max_attempts)
+        return policy, attempts, type(unwrap_client(client)).__name__
+
+    def _streams(self, client: Any, method: str) -> bool:
+        return bool(self.cfg.get('stream')) and hasattr(client, method)
+
+    def _on_chunk(self, ctx: ExecutionContext, piece: str, first: bool):
+        if first:
+            logger.info({'event': 'generative_first_token', 'id': self.cfg.get('id')})
+        callback = getattr(ctx, 'on_stream', None)
+        if callback is not None:
+            callback(self.cfg.get('id'), piece)
+
+    def _streamed_out(self, client: Any, pieces: List[str], start: float, first_at: Optional[float]) -> Dict[str, Any]:
+        text = ''.join(pieces)
+        end = time.time()
+        tokens = estimate_tokens(text) if text else 0
+        gen_s = end - first_at if first_at is not None else 0.0
+        meta = {'model': getattr(client, 'model', None), 'streamed': True, 'stream_chunks': len(pieces),
+                'ttft_s': round(first_at - start, 4) if first_at is not None else None,
+                'tokens_per_s': round(tokens / gen_s, 1) if gen_s > 0 else None}
+        return {'text': text, 'meta': meta}
+
+    def _consume_stream(self, client: Any, prompt: str, provider_kwargs: Dict[str, Any], ctx: ExecutionContext) -> Dict[str, Any]:
+        """Read ``client.stream_text`` to the end, surfacing each chunk through ``ctx.on_stream``."""
+        start = time.time()
+        first_at = None
+        pieces: List[str] = []
+        for piece in client.stream_text(prompt, **provider_kwargs):
+            if first_at is None:
+                first_at = time.time()
+            pieces.append(piece)
+            self._on_chunk(ctx, piece, len(pieces) == 1)
+        return self._streamed_out(client, pieces, start, first_at)
+
+    async def _aconsume_stream(self, client: Any, prompt: str, provider_kwargs: Dict[str, Any], ctx: ExecutionContext) -> Dict[str, Any]:
+        start = time.time()
+        first_at = None
+        pieces: List[str] = []
+        async for piece in client.astream_text(prompt, **provider_kwargs):
+            if first_at is None:
+                first_at = time.time()
+            pieces.append(piece)
+            self._on_chunk(ctx, piece, len(pieces) == 1)
+        return self._streamed_out(client, pieces, start, first_at)
+
+    def execute(self, ctx: ExecutionContext) -> ActionResult:
+        vars_in, prompt, client, provider_kwargs = self._prepare(ctx)
+        policy, attempts, provider = self._retry(ctx, client)
+        attempt = 0
+
+        limiter = getattr(ctx, 'concurrency_limiter', None)
+
+        def _once():
+            nonlocal attempt
+            attempt += 1
+            start = time.time()
+            image = self._mode() == 'image'
+            logger.info({'event': 'generative_image_start' if image else 'generative_text_start', 'attempt': attempt})
+            if image:
+                out_path = self._image_path(ctx, vars_in)
+                call = lambda: client.generate_image(prompt, out_path=str(out_path), **provider_kwargs)
+            elif self._streams(client, 'stream_text'):
+                call = lambda: self._consume_stream(client, prompt, provider_kwargs, ctx)
+            else:
+                call = lambda: client.generate_text(prompt, **provider_kwargs)
+            if limiter is None:
+                out = call()
+            else:
+                with limiter.slot():
+                    queued = time.time() - start
+                    out = call()
+                out.setdefault('meta', {}).update(_limiter_meta(limiter, queued))
+            if image:
+                return self._image_result(out, start, attempt, out_path)
+            return self._text_result(out, start, attempt)
+
+        return policy.call(_once, provider, attempts=attempts)
+
+    async def aexecute(self, ctx: ExecutionContext) -> ActionResult:
+        """Async counterpart of :meth:`execute`.
+
+        KB processing and uploads run on a worker thread; the provider call
+        itself uses the client's native ``agenerate_*`` methods when present.
+        """
+        vars_in, prompt, client, provider_kwargs = await asyncio.to_thread(self._prepare, ctx)
+        policy, attempts, provider = self._retry(ctx, client)
+        attempt = 0
+
+        limiter = getattr(ctx, 'concurrency_limiter', None)
+
+        async def _once():
+            nonlocal attempt
+            attempt += 1
+            start = time.time()
+            image = self._mode() == 'image'
+            logger.info({'event': 'generative_image_start' if image else 'generative_text_start',
+                         'attempt': attempt, 'async': True})
+            if image:
+                out_path = await asyncio.to_thread(self._image_path, ctx, vars_in)
+                call = lambda: _acall(client, 'generate_image', prompt, out_path=str(out_path), **provider_kwargs)
+            elif self._streams(client, 'astream_text'):
+                call = lambda: self._aconsume_stream(client, prompt, provider_kwargs, ctx)
+            else:
+                call = lambda: _acall(client, 'generate_text', prompt, **provider_kwargs)
+            if limiter is None:
+                out = await call()
+            else:
+                async with limiter.aslot():
+                    queued = time.time() - start
+                    out = await call()
+                out.setdefault('meta', {}).update(_limiter_meta(limiter, queued))
+            if image:
+                return await asyncio.to_thread(self._image_result, out, start, attempt, out_path)
+            return self._text_result(out, start, attempt)
+
+        return await policy.acall(_once, provider, attempts=attempts)
     
     def _handle_multiple_outputs(self, text: str, vars_out: dict, returns: list, meta: dict):
         """Handle multiple output types from a single generative action"""
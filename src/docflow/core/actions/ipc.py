@@ -0,0 +1,271 @@
+"""Binary-safe framed IPC between CodeAction and its runner process.
+
+The runner reports its result on a dedicated channel (an inherited pipe fd,
+or a file where fds can't be passed) instead of stdout lines. A message is a
+sequence of frames, each ``<kind:u8><length:u32 big-endian><payload>``:
+
+- ``BLOB``: raw bytes, stored in the message's blob table
+- ``SHM``: JSON ``{"name", "size"}`` of a ``multiprocessing.shared_memory``
+  block holding a large blob; the reader copies it out once and unlinks it
+- ``JSON``: the result envelope; ``bytes`` values appear as ``{"__blob__": i}``
+- ``END``: end of message
+
+Inputs go the other way: the runner receives only the declared variables
+on stdin and fetches any other key on first access from a :class:`VarServer`
+run by the parent (see :class:`LazyVars`).
+
+This module is stdlib-only: CodeAction embeds its source in the runner
+script, so the child needs no access to the docflow package.
+"""
+import json
+import os
+import struct
+import threading
+
+FRAME_END = 0
+FRAME_JSON = 1
+FRAME_BLOB = 2
+FRAME_SHM = 3
+
+_HEADER = struct.Struct('>BI')
+
+# blobs at least this large travel through shared memory (POSIX only)
+SHM_THRESHOLD = 1 << 20
+SHM_THRESHOLD_ENV = 'DOCFLOW_IPC_SHM_MIN'
+IPC_FD_ENV = 'DOCFLOW_IPC_FD'
+IPC_PATH_ENV = 'DOCFLOW_IPC_PATH'
+
+
+def _write_frame(fh, kind, payload):
+    fh.write(_HEADER.pack(kind, len(payload)))
+    fh.write(payload)
+
+
+def _to_shm(data):
+    """Copy ``data`` into a new shared memory block the reader will own, or ``None``."""
+    if os.name != 'posix':
+        # on Windows the block dies with its last handle, i.e. before the reader attaches
+        return None
+    try:
+        from multiprocessing import shared_memory
+    except Exception:
+        return None
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=len(data), track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag: keep the block out of this process's
+        # resource tracker, which would otherwise unlink it when the runner exits
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            shm = shared_memory.SharedMemory(create=True, size=len(data))
+        finally:
+            resource_tracker.register = register
+    shm.buf[:len(data)] = data
+    name = shm.name
+    shm.close()
+    return name
+
+
+def write_message(fh, obj, shm_threshold=None):
+    """Encode ``obj`` (JSON-like, may contain bytes) as frames on binary file ``fh``."""
+    if shm_threshold is None:
+        shm_threshold = int(os.environ.get(SHM_THRESHOLD_ENV, SHM_THRESHOLD))
+    blob_count = [0]
+
+    def enc(o):
+        if isinstance(o, (bytes, bytearray, memoryview)):
+            data = o if isinstance(o, bytes) else bytes(o)
+            idx = blob_count[0]
+            blob_count[0] += 1
+            name = _to_shm(data) if len(data) >= shm_threshold else None
+            if name is not None:
+                _write_frame(fh, FRAME_SHM, json.dumps({'name': name, 'size': len(data)}).encode('utf-8'))
+            else:
+                _write_frame(fh, FRAME_BLOB, data)
+            return {'__blob__': idx}
+        if isinstance(o, dict):
+            return {str(k): enc(v) for k, v in o.items()}
+        if isinstance(o, (list, tuple)):
+            return [enc(v) for v in o]
+        if o is None or isinstance(o, (str, int, float, bool)):
+            return o
+        return str(o)
+
+    envelope = enc(obj)
+    _write_frame(fh, FRAME_JSON, json.dumps(envelope).encode('utf-8'))
+    _write_frame(fh, FRAME_END, b'')
+    fh.flush()
+
+
+def _read_exact(fh, n):
+    chunks = []
+    while n > 0:
+        chunk = fh.read(n)
+        if not chunk:
+            raise EOFError('truncated IPC frame')
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def _from_shm(name, size):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def read_message(fh):
+    """Decode one message from binary file ``fh``; ``None`` if the channel is empty.
+
+    Shared memory blocks referenced by the message are always released, even
+    when the message turns out to be incomplete.
+    """
+    blobs = []
+    envelope = None
+    while True:
+        head = fh.read(_HEADER.size)
+        if not head:
+            if envelope is None and not blobs:
+                return None
+            raise EOFError('IPC message not terminated')
+        if len(head) < _HEADER.size:
+            head += _read_exact(fh, _HEADER.size - len(head))
+        kind, size = _HEADER.unpack(head)
+        payload = _read_exact(fh, size) if size else b''
+        if kind == FRAME_BLOB:
+            blobs.append(payload)
+        elif kind == FRAME_SHM:
+            ref = json.loads(payload.decode('utf-8'))
+            blobs.append(_from_shm(ref['name'], ref['size']))
+        elif kind == FRAME_JSON:
+            envelope = json.loads(payload.decode('utf-8'))
+        elif kind == FRAME_END:
+            break
+        else:
+            raise ValueError(f'unknown IPC frame kind {kind}')
+
+    def dec(o):
+        if isinstance(o, dict):
+            if len(o) == 1 and '__blob__' in o:
+                return blobs[o['__blob__']]
+            return {k: dec(v) for k, v in o.items()}
+        if isinstance(o, list):
+            return [dec(v) for v in o]
+        return o
+
+    return dec(envelope)
+
+
+def open_channel():
+    """Binary writer for the runner side, selected from the environment (or ``None``)."""
+    fd = os.environ.get(IPC_FD_ENV)
+    if fd:
+        return os.fdopen(int(fd), 'wb', closefd=False)
+    path = os.environ.get(IPC_PATH_ENV)
+    if path:
+        return open(path, 'wb')
+    return None
+
+
+class VarServer:
+    """Serve values of ``source`` to a runner that asks for keys it wasn't sent.
+
+    Keys arrive as raw UTF-8 (nothing from the child is unpickled); values go
+    back pickled as ``(found, value)``. :attr:`fetched` lists the keys served.
+    """
+
+    def __init__(self, source, keys):
+        from multiprocessing.connection import Listener
+        self.source = source
+        self.keys = set(keys)
+        self.fetched = []
+        self._authkey = os.urandom(16)
+        self._listener = Listener(authkey=self._authkey)
+        self._closed = False
+        self._thread = threading.Thread(target=self._serve, name='docflow-code-vars', daemon=True)
+        self._thread.start()
+
+    def descriptor(self):
+        """JSON-able connection info for the runner's ``LazyVars``."""
+        return {'address': self._listener.address, 'authkey': self._authkey.hex(), 'keys': sorted(self.keys)}
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                continue
+            if self._closed:
+                conn.close()
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            while True:
+                key = conn.recv_bytes().decode('utf-8')
+                if key in self.keys and key in self.source:
+                    self.fetched.append(key)
+                    try:
+                        conn.send((True, self.source[key]))
+                    except Exception:
+                        conn.send((False, None))
+                else:
+                    conn.send((False, None))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        from multiprocessing.connection import Client
+        self._closed = True
+        try:
+            # wake the blocking accept() so the thread can exit
+            Client(self._listener.address, authkey=self._authkey).close()
+        except Exception:
+            pass
+        self._listener.close()
+        self._thread.join(timeout=1)
+
+
+class LazyVars(dict):
+    """Runner-side ``vars``: the keys sent inline, plus any key held back by
+    the parent, fetched from its :class:`VarServer` on first access."""
+
+    def __init__(self, data, fetch=None):
+        super().__init__(data)
+        self._fetch = fetch or {}
+        self._held = set(self._fetch.get('keys') or ()) - set(data)
+        self._conn = None
+
+    def __missing__(self, key):
+        if key not in self._held:
+            raise KeyError(key)
+        if self._conn is None:
+            from multiprocessing.connection import Client
+            address = self._fetch['address']
+            self._conn = Client(tuple(address) if isinstance(address, list) else address,
+                                authkey=bytes.fromhex(self._fetch['authkey']))
+        self._conn.send_bytes(str(key).encode('utf-8'))
+        found, value = self._conn.recv()
+        self._held.discard(key)
+        if not found:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._held
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
@@ -0,0 +1,247 @@
+"""Content-addressed, persistent cache of ``ActionResult`` objects.
+
+Entries live under ``<project.temp_dir>/cache/actions`` as one JSON file per
+key. The key hashes everything that can change an action's output: its
+config, the resolved prompt, the input vars it reads, the fingerprints of
+the files it depends on (KB, prompt_file, code_file) and the AI
+provider/model.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import base64
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from .results import ActionResult
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+_TTL_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$')
+_TTL_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_cache_setting(value: Any) -> Tuple[bool, Optional[float]]:
+    """Interpret an action's ``cache`` setting.
+
+    ``true`` caches without expiry, ``false``/missing disables the cache, a
+    number is a TTL in seconds and a string like ``'30m'``, ``'12h'`` or
+    ``'7d'`` is a TTL with a unit. Returns ``(enabled, ttl_seconds)``.
+    """
+    if value is None or value is False:
+        return False, None
+    if value is True:
+        return True, None
+    if isinstance(value, (int, float)):
+        return (value > 0), float(value)
+    m = _TTL_RE.match(str(value))
+    if not m:
+        raise ValueError(f"invalid cache setting {value!r}: expected true, false, seconds or e.g. '12h'")
+    ttl = float(m.group(1)) * _TTL_UNITS[m.group(2)]
+    return (ttl > 0), ttl
+
+
+def _json_default(o: Any):
+    if isinstance(o, (bytes, bytearray)):
+        return {'__sha256__': hashlib.sha256(o).hexdigest()}
+    if isinstance(o, Path):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return sorted(str(x) for x in o)
+    return repr(o)
+
+
+def stable_hash(obj: Any) -> str:
+    """sha256 of a canonical JSON rendering of ``obj`` (bytes are hashed, not embedded)."""
+    payload = json.dumps(obj, sort_keys=True, default=_json_default, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path: Any) -> Optional[List[Any]]:
+    """``[path, size, mtime_ns]`` for an existing file, ``None`` otherwise."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [str(path), st.st_size, st.st_mtime_ns]
+
+
+def kb_file_fingerprints(kb_cfg: Optional[Dict[str, Any]]) -> List[Any]:
+    """Fingerprints of every file a KB config expands to (same glob rules as the KB strategies)."""
+    if not kb_cfg or not kb_cfg.get('enabled'):
+        return []
+    out = []
+    for p in kb_cfg.get('paths', []) or []:
+        path_str = str(p)
+        if any(char in path_str for char in ['*', '?', '[']):
+            matches = sorted(glob.glob(path_str, recursive=True))
+        elif os.path.isdir(path_str):
+            matches = sorted(str(f) for f in Path(path_str).rglob('*') if f.is_file())
+        else:
+            matches = [path_str]
+        for m in matches:
+            fp = file_fingerprint(m)
+            if fp is not None:
+                out.append(fp)
+    return out
+
+
+# KB strategies whose text depends on the rendered ``kb.query``
+KB_QUERY_STRATEGIES = ('bm25', 'vector')
+
+
+def kb_query(kb_cfg: Optional[Dict[str, Any]], global_vars: Dict[str, Any]) -> Optional[str]:
+    """The rendered ``kb.query`` of a query-driven KB config, ``None`` for other strategies."""
+    if not kb_cfg or not kb_cfg.get('enabled') or kb_cfg.get('strategy') not in KB_QUERY_STRATEGIES:
+        return None
+    from jinja2 import Template
+
+    try:
+        return Template(kb_cfg.get('query') or '').render(**global_vars).strip()
+    except Exception:
+        return None
+
+
+def action_cache_key(ad: Dict[str, Any], ctx: Any) -> str:
+    """Compute the content address of an action run against ``ctx``."""
+    from ..ai.client import unwrap_client
+    from ..runtime.prompt_builder import build_prompt_for_action
+
+    global_vars = getattr(ctx, 'global_vars', {}) or {}
+    cfg = {k: v for k, v in ad.items() if k != 'cache'}
+    input_vars = ad.get('input_vars') or []
+    if ad.get('type') == 'code':
+        # the subprocess receives the whole context unless input_vars narrows it
+        # (results that lazily fetched undeclared keys are not stored, see workflow)
+        inputs = {k: global_vars.get(k) for k in input_vars} if input_vars else dict(global_vars)
+        prompt = None
+    else:
+        inputs = {k: global_vars.get(k) for k in input_vars}
+        # KB content is covered by the file fingerprints, so render without it
+        prompt = build_prompt_for_action(ad, global_vars, None)
+    files = kb_file_fingerprints(ad.get('kb'))
+    for key in ('prompt_file', 'code_file'):
+        if ad.get(key):
+            files.append(file_fingerprint(ad[key]))
+    # the provider underneath the caching/coalescing/rate-limiting wrappers
+    client = unwrap_client(getattr(ctx, 'ai_client', None))
+    provider = {
+        'provider': getattr(ctx, 'ai_provider', None),
+        'client': type(client).__name__ if client is not None else None,
+        'model': getattr(client, 'model', None),
+    }
+    return stable_hash({'cfg': cfg, 'prompt': prompt, 'inputs': inputs, 'files': files, 'provider': provider,
+                        'kb_query': kb_query(ad.get('kb'), global_vars)})
+
+
+def encode_value(o: Any) -> Any:
+    if isinstance(o, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(bytes(o)).decode('ascii')}
+    if isinstance(o, Path):
+        return str(o)
+    if isinstance(o, dict):
+        return {k: encode_value(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [encode_value(v) for v in o]
+    return o
+
+
+def decode_value(o: Any) -> Any:
+    if isinstance(o, dict):
+        if set(o) == {'__bytes__'}:
+            return base64.b64decode(o['__bytes__'])
+        return {k: decode_value(v) for k, v in o.items()}
+    if isinstance(o, list):
+        return [decode_value(v) for v in o]
+    return o
+
+
+def result_to_json(ar: ActionResult) -> Dict[str, Any]:
+    return {'kind': ar.kind, 'data': encode_value(ar.data), 'meta': encode_value(ar.meta), 'vars': encode_value(ar.vars)}
+
+
+def result_from_json(d: Dict[str, Any]) -> ActionResult:
+    return ActionResult(kind=d['kind'], data=decode_value(d['data']), meta=decode_value(d.get('meta', {})), vars=decode_value(d.get('vars', {})))
+
+
+class ActionCache:
+    """On-disk ``ActionResult`` store keyed by :func:`action_cache_key`."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f'{key}.json'
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[ActionResult]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+            ar = result_from_json(entry['result'])
+        except FileNotFoundError:
+            entry, ar = None, None
+        except Exception as e:
+            logger.info({'event': 'action_cache_corrupt', 'path': str(path), 'error': str(e)})
+            entry, ar = None, None
+        if ar is not None and ttl is not None and time.time() - entry.get('created_at', 0) > ttl:
+            ar = None
+        # image results point at files in assets_dir; a missing file is a miss
+        if ar is not None and ar.kind == 'image' and isinstance(ar.data, str) and not Path(ar.data).exists():
+            ar = None
+        with self._lock:
+            if ar is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return ar
+
+    def put(self, key: str, action_id: Optional[str], ar: ActionResult):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {'key': key, 'action_id': action_id, 'created_at': time.time(), 'result': result_to_json(ar)}
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(entry), encoding='utf-8')
+        os.replace(tmp, path)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Metadata for every stored entry (without the result payload)."""
+        out = []
+        if not self.root.exists():
+            return out
+        for path in sorted(self.root.glob('*/*.json')):
+            try:
+                entry = json.loads(path.read_text(encoding='utf-8'))
+            except Exception:
+                entry = {}
+            out.append({
+                'key': entry.get('key', path.stem),
+                'action_id': entry.get('action_id'),
+                'created_at': entry.get('created_at', 0),
+                'size': path.stat().st_size,
+                'path': path,
+            })
+        return out
+
+    def purge(self, action_id: Optional[str] = None, older_than: Optional[float] = None) -> int:
+        """Delete entries, optionally only for one action or older than ``older_than`` seconds."""
+        now = time.time()
+        removed = 0
+        for e in self.entries():
+            if action_id is not None and e['action_id'] != action_id:
+                continue
+            if older_than is not None and now - e['created_at'] <= older_than:
+                continue
+            try:
+                e['path'].unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        logger.info({'event': 'action_cache_purged', 'removed': removed, 'action_id': action_id})
+        return removed
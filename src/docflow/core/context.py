@@ -10,4 +10,22 @@ class ExecutionContext:
     assets_dir: Optional[Path] = None
     kb_cache_dir: Optional[Path] = None
     ai_client: Any = None
+    # configured ai.provider (part of the action cache key)
+    ai_provider: Optional[str] = None
     logger: Any = None
+    # thread pool size used by execute_workflow (1 = sequential)
+    max_workers: int = 1
+    # docflow.core.cache.ActionCache; None disables result caching
+    result_cache: Any = None
+    # docflow.core.incremental.DependencyGraph recorded on every run
+    dep_graph: Any = None
+    # reuse results of actions whose reads did not change since the last run
+    incremental: bool = False
+    # docflow.core.actions.code_pool.CodeWorkerPool; None spawns one process per code action
+    code_pool: Any = None
+    # docflow.ai.retry.RetryPolicy for provider calls; None = one attempt, default backoff
+    retry_policy: Any = None
+    # docflow.ai.concurrency.AdaptiveLimiter gating provider calls; None = unlimited
+    concurrency_limiter: Any = None
+    # called as on_stream(action_id, chunk) for each text chunk of streaming generative actions
+    on_stream: Any = None
@@ -0,0 +1,170 @@
+"""Variable-level dependency tracking for incremental workflow runs.
+
+Every executed action is recorded with the ``ctx.global_vars`` keys it reads
+(with a hash of each value), the keys it writes and its result. On an
+incremental run an action whose config, input files and read values are
+unchanged reuses its recorded result; since the reused result writes the
+same values, only the subgraph downstream of a real change re-executes.
+"""
+from typing import Any, Dict, List, Optional, Set
+from pathlib import Path
+import json
+import os
+import threading
+from jinja2 import Environment, meta
+from .cache import (KB_QUERY_STRATEGIES, stable_hash, kb_file_fingerprints, file_fingerprint, result_to_json,
+                    result_from_json)
+from .results import ActionResult
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+GRAPH_VERSION = 1
+
+_jinja_env = Environment()
+
+
+def _template_vars(source: str) -> Set[str]:
+    try:
+        return set(meta.find_undeclared_variables(_jinja_env.parse(source)))
+    except Exception:
+        return set()
+
+
+def _reads_all(ad: Dict[str, Any]) -> bool:
+    kb = ad.get('kb') or {}
+    return bool(
+        (ad.get('type') == 'code' and not ad.get('input_vars'))
+        or ad.get('prompt_fn')
+        or (kb.get('enabled') and kb.get('strategy') == 'retrieve')
+    )
+
+
+def action_reads(ad: Dict[str, Any], global_vars: Dict[str, Any]) -> List[str]:
+    """Keys of ``global_vars`` an action depends on.
+
+    Generative actions read their ``input_vars`` plus the names referenced by
+    the prompt template (inline or ``prompt_file``) and by the ``kb.query``
+    of query-driven KB strategies; actions whose reads can't be determined
+    statically (``prompt_fn``, ``retrieve`` KB, code actions
+    without ``input_vars``, whose subprocess receives the whole context) read
+    every key. Code actions with ``input_vars`` read those; keys they fetched
+    lazily are added by :meth:`DependencyGraph.record`.
+    """
+    reads = set(ad.get('input_vars') or [])
+    if _reads_all(ad):
+        reads |= set(global_vars)
+    else:
+        if ad.get('prompt'):
+            reads |= _template_vars(str(ad['prompt']))
+        if ad.get('prompt_file'):
+            try:
+                reads |= _template_vars(Path(ad['prompt_file']).read_text(encoding='utf-8'))
+            except Exception:
+                reads |= set(global_vars)
+        kb = ad.get('kb') or {}
+        if kb.get('enabled') and kb.get('strategy') in KB_QUERY_STRATEGIES and kb.get('query'):
+            reads |= _template_vars(str(kb['query']))
+    # 'kb' is injected by the prompt builder, not read from the context
+    reads.discard('kb')
+    return sorted(reads)
+
+
+def action_writes(ad: Dict[str, Any], ar: ActionResult) -> List[str]:
+    """Keys an action adds to ``ctx.global_vars`` (its vars plus export names)."""
+    writes = set((ar.vars or {}).keys())
+    for ex in ad.get('exports', []) or []:
+        writes.add(ex['name'] if isinstance(ex, dict) else ex.name)
+    return sorted(writes)
+
+
+def _input_files(ad: Dict[str, Any]) -> List[Any]:
+    files = kb_file_fingerprints(ad.get('kb'))
+    for key in ('prompt_file', 'code_file'):
+        if ad.get(key):
+            files.append(file_fingerprint(ad[key]))
+    return files
+
+
+def _cfg_hash(ad: Dict[str, Any]) -> str:
+    return stable_hash({k: v for k, v in ad.items() if k != 'cache'})
+
+
+class DependencyGraph:
+    """Persisted read/write graph of the last run, one JSON file per config."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.actions: Dict[str, Dict[str, Any]] = {}
+        self.reused = 0
+        self.executed = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.info({'event': 'dep_graph_corrupt', 'path': str(self.path), 'error': str(e)})
+            return
+        if data.get('version') == GRAPH_VERSION:
+            self.actions = data.get('actions', {})
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        with self._lock:
+            payload = json.dumps({'version': GRAPH_VERSION, 'actions': self.actions})
+        tmp.write_text(payload, encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def reusable(self, ad: Dict[str, Any], global_vars: Dict[str, Any]) -> Optional[ActionResult]:
+        """The recorded result of ``ad`` if nothing it depends on changed, else ``None``."""
+        with self._lock:
+            node = self.actions.get(ad.get('id'))
+        if node is None or node.get('cfg') != _cfg_hash(ad) or node.get('files') != _input_files(ad):
+            return None
+        reads = node.get('reads', {})
+        # a code action reads the whole context, so a new key also makes it dirty
+        if node.get('reads_all') and set(global_vars) != set(reads):
+            return None
+        for key, digest in reads.items():
+            if stable_hash(global_vars.get(key)) != digest:
+                return None
+        ar = result_from_json(node['result'])
+        if ar.kind == 'image' and isinstance(ar.data, str) and not Path(ar.data).exists():
+            return None
+        ar.meta = {**(ar.meta or {}), 'incremental': 'reused'}
+        with self._lock:
+            self.reused += 1
+        return ar
+
+    def record(self, ad: Dict[str, Any], global_vars: Dict[str, Any], ar: ActionResult):
+        """Store what ``ad`` read from ``global_vars`` and what it produced.
+
+        Failed results are dropped so the next incremental run retries them.
+        """
+        if (ar.meta or {}).get('error'):
+            with self._lock:
+                self.actions.pop(ad.get('id'), None)
+                self.executed += 1
+            return
+        reads = set(action_reads(ad, global_vars)) | set((ar.meta or {}).get('vars_fetched') or [])
+        node = {
+            'cfg': _cfg_hash(ad),
+            'files': _input_files(ad),
+            'reads': {k: stable_hash(global_vars.get(k)) for k in sorted(reads)},
+            'reads_all': _reads_all(ad),
+            'writes': action_writes(ad, ar),
+            'result': result_to_json(ar),
+        }
+        with self._lock:
+            self.actions[ad.get('id')] = node
+            self.executed += 1
+
+    def dependents(self, key: str) -> List[str]:
+        """Ids of recorded actions that read ``key``."""
+        with self._lock:
+            return sorted(aid for aid, node in self.actions.items() if key in node.get('reads', {}))
@@ -1,9 +1,13 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from .context import ExecutionContext
 from .results import ActionResult
 from .registry import make_action
+from .cache import action_cache_key, parse_cache_setting
 from jinja2 import Template
 from ..logging_lib import setup_logger
+import asyncio
+import copy
 import time
 
 logger = setup_logger(__name__)
@@ -55,119 +59,368 @@ def apply_exports(result: ActionResult, exports: List[Dict[str, Any]], ctx: Exec
             ctx.global_vars[name] = out
 
 
-def execute_workflow(actions: List[Dict[str, Any]], ctx: ExecutionContext) -> Dict[str, ActionResult]:
+def _log_action_start(ad: Dict[str, Any], ctx: ExecutionContext) -> float:
+    # Start timing
+    action_start_time = time.time()
+
+    logger.info({'event': 'action_start', 'id': ad.get('id'), 'type': ad.get('type')})
+
+    # Log current context variables if verbose
+    if getattr(ctx, 'verbose', False):
+        ctx_vars = {k: str(v)[:100] + '...' if len(str(v)) > 100 else str(v)
+                   for k, v in ctx.global_vars.items()}
+        logger.info({'event': 'action_context_vars', 'id': ad.get('id'), 'vars': ctx_vars})
+    return action_start_time
+
+
+def _log_action_end(ad: Dict[str, Any], ctx: ExecutionContext, res: Any, action_start_time: float):
+    # Calculate timing
+    action_duration = time.time() - action_start_time
+
+    # Log action result if verbose
+    if getattr(ctx, 'verbose', False) and res:
+        if isinstance(res, (list, tuple)):
+            # Multiple outputs
+            result_preview = f"Multiple outputs: {len(res)} items"
+        else:
+            # Single output
+            result_preview = str(res.data)[:200] + '...' if res.data and len(str(res.data)) > 200 else str(res.data)
+        logger.info({'event': 'action_result', 'id': ad.get('id'), 'result_type': type(res).__name__, 'preview': result_preview})
+
+    logger.info({'event': 'action_end', 'id': ad.get('id'), 'duration_s': round(action_duration, 3)})
+
+
+def _cache_lookup(ad: Dict[str, Any], ctx: ExecutionContext):
+    """Return ``(key, cached_result)`` for actions with caching enabled.
+
+    ``key`` is ``None`` when the action is not cacheable in this context.
+    """
+    cache = getattr(ctx, 'result_cache', None)
+    if cache is None:
+        return None, None
+    enabled, ttl = parse_cache_setting(ad.get('cache', False))
+    if not enabled:
+        return None, None
+    key = action_cache_key(ad, ctx)
+    hit = cache.get(key, ttl)
+    if hit is not None:
+        hit.meta = {**(hit.meta or {}), 'cache': 'hit'}
+        logger.info({'event': 'action_cache_hit', 'id': ad.get('id'), 'key': key[:12]})
+    return key, hit
+
+
+def _cache_store(ad: Dict[str, Any], ctx: ExecutionContext, key: Optional[str], ar: ActionResult):
+    # failed runs (error in meta) are never cached so the next run retries them;
+    # neither are code runs that read undeclared vars the key doesn't cover
+    if key is None or (ar.meta or {}).get('error') or (ar.meta or {}).get('vars_fetched'):
+        return
+    try:
+        ctx.result_cache.put(key, ad.get('id'), ar)
+    except Exception as e:
+        logger.info({'event': 'action_cache_store_error', 'id': ad.get('id'), 'error': str(e)})
+
+
+def _incremental_reuse(ad: Dict[str, Any], ctx: ExecutionContext) -> Optional[ActionResult]:
+    """Recorded result of a clean action when running with ``ctx.incremental``."""
+    graph = getattr(ctx, 'dep_graph', None)
+    if graph is None or not getattr(ctx, 'incremental', False):
+        return None
+    ar = graph.reusable(ad, ctx.global_vars)
+    if ar is not None:
+        logger.info({'event': 'action_reused', 'id': ad.get('id')})
+    return ar
+
+
+def _record_deps(ad: Dict[str, Any], ctx: ExecutionContext, ar: ActionResult):
+    graph = getattr(ctx, 'dep_graph', None)
+    if graph is not None:
+        graph.record(ad, ctx.global_vars, ar)
+
+
+def _run_action(a: Dict[str, Any], ctx: ExecutionContext) -> ActionResult:
+    """Execute a single action against ``ctx`` and normalize its output."""
+    ad = _as_dict(a)
+    reused = _incremental_reuse(ad, ctx)
+    if reused is not None:
+        return reused
+    key, hit = _cache_lookup(ad, ctx)
+    if hit is not None:
+        _record_deps(ad, ctx, hit)
+        return hit
+    act = make_action(ad, ctx)
+    start = _log_action_start(ad, ctx)
+    # call the standardized execute(ctx) method on actions
+    res = act.execute(ctx)
+    _log_action_end(ad, ctx, res, start)
+    ar = _to_action_result(res, ad)
+    _cache_store(ad, ctx, key, ar)
+    _record_deps(ad, ctx, ar)
+    return ar
+
+
+async def _arun_action(a: Dict[str, Any], ctx: ExecutionContext) -> ActionResult:
+    """Async variant of :func:`_run_action`.
+
+    Actions exposing ``aexecute`` run on the event loop; the others are
+    pushed to a worker thread so they never block it.
+    """
+    ad = _as_dict(a)
+    reused = await asyncio.to_thread(_incremental_reuse, ad, ctx)
+    if reused is not None:
+        return reused
+    key, hit = await asyncio.to_thread(_cache_lookup, ad, ctx)
+    if hit is not None:
+        _record_deps(ad, ctx, hit)
+        return hit
+    act = make_action(ad, ctx)
+    start = _log_action_start(ad, ctx)
+    aexecute = getattr(act, 'aexecute', None)
+    if aexecute is not None:
+        res = await aexecute(ctx)
+    else:
+        res = await asyncio.to_thread(act.execute, ctx)
+    _log_action_end(ad, ctx, res, start)
+    ar = _to_action_result(res, ad)
+    await asyncio.to_thread(_cache_store, ad, ctx, key, ar)
+    await asyncio.to_thread(_record_deps, ad, ctx, ar)
+    return ar
+
+
+def _to_action_result(res: Any, ad: Dict[str, Any]) -> ActionResult:
+    """Normalize whatever an action returned into a single ActionResult."""
+    # Handle multiple outputs or single output
+    ar = None
+    if isinstance(res, (list, tuple)) and len(res) > 1:
+        # Multiple outputs - handle each according to returns specification
+        returns_spec = ad.get('returns', 'text')
+        if isinstance(returns_spec, list):
+            # Process multiple outputs
+            results = []
+            vars_combined = {}
+
+            for i, (output, return_type) in enumerate(zip(res, returns_spec)):
+                if return_type == 'vars' and isinstance(output, dict):
+                    # Variables go into combined vars
+                    vars_combined.update(output)
+                    results.append(ActionResult(kind='vars', data=output, vars=output))
+                elif return_type in ['text', 'image', 'bytes']:
+                    results.append(ActionResult(kind=return_type, data=output))
+
+            # Create combined result with primary data from first non-vars result
+            primary_result = next((r for r in results if r.kind != 'vars'), results[0] if results else None)
+            if primary_result:
+                ar = ActionResult(
+                    kind=primary_result.kind,
+                    data=primary_result.data,
+                    vars=vars_combined,
+                    meta={'multiple_outputs': True, 'output_count': len(results)}
+                )
+            else:
+                ar = ActionResult(kind='vars', data={}, vars=vars_combined)
+        else:
+            # Single return type expected but got multiple - use first
+            ar = ActionResult(kind=returns_spec, data=res[0], vars={})
+
+    # Single output (existing logic)
+    elif isinstance(res, dict):
+        # prefer explicit keys
+        if 'result_text' in res:
+            kind = 'text'
+            data = res.get('result_text') or ''
+        elif 'image' in res:
+            kind = 'image'
+            data = res.get('image')
+        elif 'result' in res:
+            # ambiguous: if result is str -> text else bytes
+            r = res.get('result')
+            if isinstance(r, str):
+                kind = 'text'
+                data = r
+            else:
+                kind = 'bytes'
+                data = r
+        else:
+            declared = ad.get('returns') if isinstance(ad, dict) else None
+            raise ValueError(f"Action '{ad.get('id')}' returned unexpected structure and no explicit keys; declared returns={declared}")
+        ar = ActionResult(kind=kind, data=data, meta=res.get('meta', {}), vars=res.get('vars', {}))
+    elif isinstance(res, ActionResult):
+        ar = res
+    else:
+        ar = ActionResult(kind='text', data=str(res), meta={}, vars={})
+    return ar
+
+
+def _commit_result(a: Dict[str, Any], ar: ActionResult, ctx: ExecutionContext, mapping: Dict[str, ActionResult]):
+    """Merge an action result into the shared context (vars, exports, telemetry)."""
+    # update global vars
+    ctx.global_vars.update(ar.vars)
+    # apply exports
+    for ex in a.get('exports', []):
+        apply_exports(ar, [ex], ctx)
+    mapping[a['id']] = ar
+    # collect telemetry if present in meta
+    try:
+        meta = ar.meta or {}
+        ctx.telemetry[a['id']] = {
+            'latency': meta.get('latency') or meta.get('latency_ms') or meta.get('latency_s') or meta.get('latency', 0),
+            'out_bytes': len(str(ar.data)) if ar.data else 0,
+            'vars_emitted': len(ar.vars or {}),
+        }
+    except Exception:
+        ctx.telemetry[a['id']] = {}
+
+
+def _snapshot_ctx(ctx: ExecutionContext, global_vars: Optional[Dict[str, Any]] = None) -> ExecutionContext:
+    """Shallow copy of ``ctx`` with a private copy of ``global_vars``.
+
+    Actions running on worker threads read from the snapshot, so the
+    scheduler can merge finished results into the real context without
+    mutating a dict another action is iterating over.
+    """
+    snap = copy.copy(ctx)
+    snap.global_vars = dict(ctx.global_vars if global_vars is None else global_vars)
+    return snap
+
+
+class _DepScheduler:
+    """Bookkeeping shared by the thread-pool and asyncio schedulers.
+
+    An action becomes ready as soon as its deps have *finished*: it runs on
+    a snapshot of the starting vars plus the vars and exports of its
+    (transitive) deps, applied in toposort order. Finished results are merged
+    into ``ctx`` strictly in ``order``, so the final ``ctx.global_vars``,
+    exports and ``mapping`` match a sequential run, but a slow action no
+    longer holds back the independent chains behind it.
+    """
+
+    def __init__(self, order: List[Dict[str, Any]], ctx: ExecutionContext, mapping: Dict[str, ActionResult]):
+        self.ctx = ctx
+        self.mapping = mapping
+        self.ids = [a['id'] for a in order]
+        self.by_id = {a['id']: a for a in order}
+        self.deps = {a['id']: set(a.get('deps', [])) for a in order}
+        self.ancestors: Dict[str, set] = {}
+        for aid in self.ids:
+            self.ancestors[aid] = set(self.deps[aid]).union(*(self.ancestors[d] for d in self.deps[aid]))
+        self.base_vars = dict(ctx.global_vars)
+        self.dispatched: set = set()
+        self.snaps: Dict[str, ExecutionContext] = {}
+        self.emitted: Dict[str, Dict[str, Any]] = {}
+        self.finished: Dict[str, ActionResult] = {}
+        self.next_commit = 0
+
+    def ready(self) -> List[Any]:
+        """``(action, snapshot)`` for every action whose deps have all finished."""
+        out = []
+        for aid in self.ids:
+            if aid not in self.dispatched and self.deps[aid] <= self.emitted.keys():
+                self.dispatched.add(aid)
+                gv = dict(self.base_vars)
+                for dep in self.ids:
+                    if dep in self.ancestors[aid]:
+                        gv.update(self.emitted[dep])
+                self.snaps[aid] = _snapshot_ctx(self.ctx, gv)
+                out.append((self.by_id[aid], self.snaps[aid]))
+        return out
+
+    def finish(self, aid: str, ar: ActionResult):
+        # vars + exports as seen by dependents (exports render against the
+        # action's own snapshot, which holds every var it declared via deps)
+        a = self.by_id[aid]
+        scratch = _snapshot_ctx(self.snaps.pop(aid))
+        scratch.global_vars.update(ar.vars or {})
+        apply_exports(ar, a.get('exports', []), scratch)
+        names = list(ar.vars or {}) + [ex['name'] for ex in a.get('exports', [])]
+        self.emitted[aid] = {k: scratch.global_vars[k] for k in names if k in scratch.global_vars}
+        self.finished[aid] = ar
+        while self.next_commit < len(self.ids) and self.ids[self.next_commit] in self.finished:
+            cid = self.ids[self.next_commit]
+            _commit_result(self.by_id[cid], self.finished.pop(cid), self.ctx, self.mapping)
+            self.next_commit += 1
+
+
+def _execute_parallel(order: List[Dict[str, Any]], ctx: ExecutionContext, max_workers: int, mapping: Dict[str, ActionResult]):
+    """Dispatch each action as soon as its deps finish (see :class:`_DepScheduler`)."""
+    sched = _DepScheduler(order, ctx, mapping)
+    running: Dict[Any, str] = {}
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='docflow-action')
+    try:
+        def dispatch_ready():
+            for a, snap in sched.ready():
+                running[pool.submit(_run_action, a, snap)] = a['id']
+
+        dispatch_ready()
+        logger.info({'event': 'workflow_parallel_start', 'workers': max_workers, 'ready': len(running)})
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                sched.finish(running.pop(fut), fut.result())
+            dispatch_ready()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def execute_workflow(actions: List[Dict[str, Any]], ctx: ExecutionContext, max_workers: Optional[int] = None) -> Dict[str, ActionResult]:
+    """Run ``actions`` in dependency order and return results keyed by action id.
+
+    With ``max_workers`` > 1 independent actions run concurrently on a thread
+    pool; each sees the starting vars plus those of its deps, so actions
+    should list in ``deps`` every action whose vars they read.
+    ``max_workers`` defaults to ``ctx.max_workers`` (sequential when unset).
+    """
     order = toposort_actions(actions)
     mapping: Dict[str, ActionResult] = {}
     # telemetry per action
     if getattr(ctx, 'telemetry', None) is None:
         ctx.telemetry = {}
+    if max_workers is None:
+        max_workers = getattr(ctx, 'max_workers', 1) or 1
+    if max_workers > 1 and len(order) > 1:
+        _execute_parallel(order, ctx, max_workers, mapping)
+        return mapping
     for a in order:
-        ad = _as_dict(a)
-        act = make_action(ad, ctx)
-        
-        # Start timing
-        action_start_time = time.time()
-        
-        logger.info({'event': 'action_start', 'id': ad.get('id'), 'type': ad.get('type')})
-        
-        # Log current context variables if verbose
-        if getattr(ctx, 'verbose', False):
-            ctx_vars = {k: str(v)[:100] + '...' if len(str(v)) > 100 else str(v) 
-                       for k, v in ctx.global_vars.items()}
-            logger.info({'event': 'action_context_vars', 'id': ad.get('id'), 'vars': ctx_vars})
-        
-        # call the standardized execute(ctx) method on actions
-        res = act.execute(ctx)
-        
-        # Calculate timing
-        action_duration = time.time() - action_start_time
-        
-        # Log action result if verbose
-        if getattr(ctx, 'verbose', False) and res:
-            if isinstance(res, (list, tuple)):
-                # Multiple outputs
-                result_preview = f"Multiple outputs: {len(res)} items"
-            else:
-                # Single output
-                result_preview = str(res.data)[:200] + '...' if res.data and len(str(res.data)) > 200 else str(res.data)
-            logger.info({'event': 'action_result', 'id': ad.get('id'), 'result_type': type(res).__name__, 'preview': result_preview})
-        
-        logger.info({'event': 'action_end', 'id': ad.get('id'), 'duration_s': round(action_duration, 3)})
-        
-        # Handle multiple outputs or single output
-        ar = None
-        if isinstance(res, (list, tuple)) and len(res) > 1:
-            # Multiple outputs - handle each according to returns specification
-            returns_spec = ad.get('returns', 'text')
-            if isinstance(returns_spec, list):
-                # Process multiple outputs
-                results = []
-                vars_combined = {}
-                
-                for i, (output, return_type) in enumerate(zip(res, returns_spec)):
-                    if return_type == 'vars' and isinstance(output, dict):
-                        # Variables go into combined vars
-                        vars_combined.update(output)
-                        results.append(ActionResult(kind='vars', data=output, vars=output))
-                    elif return_type in ['text', 'image', 'bytes']:
-                        results.append(ActionResult(kind=return_type, data=output))
-                
-                # Create combined result with primary data from first non-vars result
-                primary_result = next((r for r in results if r.kind != 'vars'), results[0] if results else None)
-                if primary_result:
-                    ar = ActionResult(
-                        kind=primary_result.kind,
-                        data=primary_result.data,
-                        vars=vars_combined,
-                        meta={'multiple_outputs': True, 'output_count': len(results)}
-                    )
-                else:
-                    ar = ActionResult(kind='vars', data={}, vars=vars_combined)
-            else:
-                # Single return type expected but got multiple - use first
-                ar = ActionResult(kind=returns_spec, data=res[0], vars={})
-        
-        # Single output (existing logic)
-        elif isinstance(res, dict):
-            # prefer explicit keys
-            if 'result_text' in res:
-                kind = 'text'
-                data = res.get('result_text') or ''
-            elif 'image' in res:
-                kind = 'image'
-                data = res.get('image')
-            elif 'result' in res:
-                # ambiguous: if result is str -> text else bytes
-                r = res.get('result')
-                if isinstance(r, str):
-                    kind = 'text'
-                    data = r
-                else:
-                    kind = 'bytes'
-                    data = r
-            else:
-                declared = ad.get('returns') if isinstance(ad, dict) else None
-                raise ValueError(f"Action '{ad.get('id')}' returned unexpected structure and no explicit keys; declared returns={declared}")
-            ar = ActionResult(kind=kind, data=data, meta=res.get('meta', {}), vars=res.get('vars', {}))
-        elif isinstance(res, ActionResult):
-            ar = res
-        else:
-            ar = ActionResult(kind='text', data=str(res), meta={}, vars={})
-            
-        # update global vars
-        ctx.global_vars.update(ar.vars)
-        # apply exports
-        for ex in a.get('exports', []):
-            apply_exports(ar, [ex], ctx)
-        mapping[a['id']] = ar
-        # collect telemetry if present in meta
-        try:
-            meta = ar.meta or {}
-            ctx.telemetry[a['id']] = {
-                'latency': meta.get('latency') or meta.get('latency_ms') or meta.get('latency_s') or meta.get('latency', 0),
-                'out_bytes': len(str(ar.data)) if ar.data else 0,
-                'vars_emitted': len(ar.vars or {}),
-            }
-        except Exception:
-            ctx.telemetry[a['id']] = {}
+        ar = _run_action(a, ctx)
+        _commit_result(a, ar, ctx, mapping)
+    return mapping
+
+
+async def aexecute_workflow(actions: List[Dict[str, Any]], ctx: ExecutionContext, max_concurrency: Optional[int] = None) -> Dict[str, ActionResult]:
+    """Asyncio counterpart of :func:`execute_workflow`.
+
+    Every action is started as soon as its deps finish; at most
+    ``max_concurrency`` run at once (unbounded when ``None``). Scheduling and
+    merge semantics match the thread-pool mode of ``execute_workflow``.
+    """
+    order = toposort_actions(actions)
+    mapping: Dict[str, ActionResult] = {}
+    if getattr(ctx, 'telemetry', None) is None:
+        ctx.telemetry = {}
+    sched = _DepScheduler(order, ctx, mapping)
+    running: Dict[asyncio.Task, str] = {}
+    sem = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run_one(a: Dict[str, Any], snap: ExecutionContext) -> ActionResult:
+        if sem is None:
+            return await _arun_action(a, snap)
+        async with sem:
+            return await _arun_action(a, snap)
+
+    def dispatch_ready():
+        for a, snap in sched.ready():
+            task = asyncio.create_task(run_one(a, snap), name=f"docflow-action-{a['id']}")
+            running[task] = a['id']
+
+    try:
+        dispatch_ready()
+        while running:
+            done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                sched.finish(running.pop(task), task.result())
+            dispatch_ready()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
     return mapping
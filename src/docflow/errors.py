@@ -8,3 +8,18 @@ class ActionError(Exception):
 
 class TemplateError(Exception):
     pass
+
+
+class ProviderUnavailableError(ActionError):
+    """An AI provider's circuit breaker is open: calls fail fast instead of waiting."""
+    pass
+
+
+class RequestDeferred(ActionError):
+    """A provider request was queued for an offline batch job instead of being sent now."""
+    pass
+
+
+class CassetteMiss(ActionError):
+    """A replayed provider request has no recorded response in the cassette."""
+    pass
@@ -1,9 +1,11 @@
-from .loader import collect_files, read_kb_texts, concat_and_truncate, chunk_text
+from .loader import collect_files, extract_text, read_kb_texts, assemble_kb_text, concat_and_truncate, chunk_text
 from .strategies import prepare_kb_for_action
 
 __all__ = [
     'collect_files',
+    'extract_text',
     'read_kb_texts',
+    'assemble_kb_text',
     'concat_and_truncate',
     'chunk_text',
     'prepare_kb_for_action',
@@ -0,0 +1,184 @@
+"""Persistent cache of text extracted from KB files.
+
+Parsing a long PDF takes seconds, and the same KB is read by several
+actions of a run and by every later run. :class:`ExtractCache` keeps the
+extracted text under ``<kb_cache_dir>/extract/``:
+
+- ``index/`` maps a file path to its last seen ``size``, ``mtime_ns`` and
+  content ``sha256``, so an unchanged file is not even hashed again;
+- ``text/`` holds one UTF-8 file per content hash and file type, read back
+  through ``mmap``. Copies of a file under other paths share the entry.
+
+Each hit refreshes the text file's mtime, which is what the size-capped LRU
+eviction orders by. Writes are atomic, so concurrent runs can share the
+store.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import mmap
+import os
+import threading
+from ..ai.upload_cache import file_digest
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+# bump when extraction output changes, so stale text is not served
+EXTRACTOR_VERSION = 1
+
+# after eviction the store is trimmed to this fraction of max_bytes
+_LOW_WATER = 0.9
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _read_mapped(path: Path) -> str:
+    with open(path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, 'utf-8')
+
+
+class ExtractCache:
+    """Size-bounded store of extracted KB text keyed by path, size, mtime and content hash."""
+
+    def __init__(self, root: Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        # bytes written since the last scan (approximate across processes)
+        self._size: Optional[int] = None
+
+    def _index_path(self, path: Path) -> Path:
+        return self.root / 'index' / f"{hashlib.sha256(str(path).encode('utf-8')).hexdigest()}.json"
+
+    def _text_path(self, digest: str, suffix: str) -> Path:
+        return self.root / 'text' / digest[:2] / f'{digest}{suffix}.v{EXTRACTOR_VERSION}.txt'
+
+    def digest(self, path: Path) -> str:
+        """Content hash of ``path``, from the index when its size and mtime are unchanged."""
+        path = Path(path).resolve()
+        st = os.stat(path)
+        index_path = self._index_path(path)
+        try:
+            entry = json.loads(index_path.read_text(encoding='utf-8'))
+            if entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                return entry['digest']
+        except (OSError, ValueError, KeyError):
+            pass
+        digest = file_digest(path)
+        entry = {'path': str(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'digest': digest}
+        _write_atomic(index_path, json.dumps(entry).encode('utf-8'))
+        return digest
+
+    def lookup(self, path: Path) -> Tuple[Optional[str], Optional[Path]]:
+        """``(text, entry)``: the cached text of ``path`` or ``None``, and where to :meth:`store` it."""
+        try:
+            text_path = self._text_path(self.digest(path), Path(path).suffix.lower())
+        except OSError:
+            return None, None
+        try:
+            text = _read_mapped(text_path)
+            os.utime(text_path)
+        except FileNotFoundError:
+            text = None
+        except (OSError, UnicodeDecodeError) as e:
+            logger.info({'event': 'kb_extract_cache_corrupt', 'path': str(path), 'error': str(e)})
+            text = None
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return text, text_path
+
+    def store(self, entry: Optional[Path], text: Optional[str]):
+        """Keep ``text`` at the ``entry`` returned by :meth:`lookup` (``None`` text is not cached)."""
+        if entry is None or text is None:
+            return
+        try:
+            self._put(entry, text)
+        except Exception as e:
+            logger.info({'event': 'kb_extract_cache_store_error', 'path': str(entry), 'error': str(e)})
+
+    def get_or_extract(self, path: Path, extract: Callable[[Path], Optional[str]]) -> Optional[str]:
+        """Cached text of ``path``, else ``extract(path)`` stored for next time.
+
+        ``None`` from ``extract`` (unsupported file type) is not cached.
+        """
+        text, entry = self.lookup(path)
+        if text is None:
+            text = extract(Path(path))
+            self.store(entry, text)
+        return text
+
+    def _put(self, text_path: Path, text: str):
+        data = text.encode('utf-8')
+        _write_atomic(text_path, data)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            over = self._size is None or self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self) -> List[Tuple[Path, os.stat_result]]:
+        files = []
+        for path in self.root.glob('text/*/*.txt'):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                pass  # evicted by another process meanwhile
+        return files
+
+    def evict(self) -> int:
+        """Drop least recently used texts until the store is under ``max_bytes``."""
+        files = self._scan()
+        total = sum(st.st_size for _, st in files)
+        removed = 0
+        if total > self.max_bytes:
+            for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+                if total <= self.max_bytes * _LOW_WATER:
+                    break
+                try:
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                total -= st.st_size
+        with self._lock:
+            self._size = total
+            self.evicted += removed
+        if removed:
+            logger.info({'event': 'kb_extract_cache_evicted', 'removed': removed, 'bytes': total})
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evicted': self.evicted}
+
+
+_caches: Dict[str, ExtractCache] = {}
+_caches_lock = threading.Lock()
+
+
+def extract_cache_for(kb_cache_dir: Any, max_bytes: int = 1024 * 1024 * 1024) -> ExtractCache:
+    """Process-wide extraction cache under ``<kb_cache_dir>/extract`` (the latest ``max_bytes`` applies)."""
+    root = Path(kb_cache_dir) / 'extract'
+    with _caches_lock:
+        cache = _caches.get(str(root))
+        if cache is None:
+            cache = _caches[str(root)] = ExtractCache(root, max_bytes=max_bytes)
+        cache.max_bytes = int(max_bytes)
+        return cache
@@ -0,0 +1,112 @@
+"""Multi-core text extraction for large KBs.
+
+PDF parsing with ``pypdf`` is CPU-bound; extracting a folder of long PDFs
+one page after another leaves every other core idle. :func:`extract_parallel`
+spreads the work over a process pool in two passes: every file is first
+opened once (non-PDF files are extracted right away, PDFs report their page
+count), then each PDF page is a separate work unit. Workers keep their
+recently opened readers, so consecutive pages of one file are not parsed
+again. Results are reassembled in file and page order, exactly as the
+serial :func:`docflow.kb.loader.extract_text` would return them.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import multiprocessing
+import os
+import threading
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+# per-worker readers of recently seen PDFs: path -> (mtime_ns, reader)
+_READERS: 'OrderedDict[str, Tuple[int, Any]]' = OrderedDict()
+_MAX_READERS = 8
+
+
+def _reader(path: str) -> Any:
+    from .loader import PdfReader
+
+    mtime = os.stat(path).st_mtime_ns
+    cached = _READERS.get(path)
+    if cached is not None and cached[0] == mtime:
+        _READERS.move_to_end(path)
+        return cached[1]
+    reader = PdfReader(path)
+    _READERS[path] = (mtime, reader)
+    while len(_READERS) > _MAX_READERS:
+        _READERS.popitem(last=False)
+    return reader
+
+
+def _open_file(path: str) -> Tuple[str, Any]:
+    """``('pages', n)`` for a PDF, else ``('text', extract_text(path))``."""
+    from .loader import PdfReader, extract_text
+
+    if Path(path).suffix.lower() == '.pdf' and PdfReader is not None:
+        try:
+            return 'pages', len(_reader(path).pages)
+        except Exception:
+            return 'text', ''
+    return 'text', extract_text(Path(path))
+
+
+def _extract_page(unit: Tuple[str, int]) -> str:
+    path, page = unit
+    try:
+        return _reader(path).pages[page].extract_text() or ''
+    except Exception:
+        return ''
+
+
+def _chunksize(units: int, workers: int) -> int:
+    # a few chunks per worker: cheap IPC, and consecutive pages stay together
+    return max(1, units // (workers * 4))
+
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def extract_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide extraction pool of ``workers`` processes (spawned, so safe from threads)."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """``0``/``None`` means one worker per CPU."""
+    return int(workers) if workers else (os.cpu_count() or 1)
+
+
+def extract_parallel(files: List[Path], workers: int) -> List[Optional[str]]:
+    """``extract_text`` of every file, in order, using ``workers`` processes."""
+    paths = [str(f) for f in files]
+    pool = extract_pool(workers)
+    opened = list(pool.map(_open_file, paths, chunksize=_chunksize(len(paths), workers)))
+    units = [(path, page) for path, (kind, value) in zip(paths, opened) if kind == 'pages' for page in range(value)]
+    pages = iter(pool.map(_extract_page, units, chunksize=_chunksize(len(units), workers)))
+    texts: List[Optional[str]] = []
+    for kind, value in opened:
+        if kind == 'pages':
+            file_pages = [next(pages) for _ in range(value)]
+            texts.append('\n'.join(p for p in file_pages if p))
+        else:
+            texts.append(value)
+    logger.info({'event': 'kb_extract_parallel', 'files': len(paths), 'pdf_pages': len(units), 'workers': workers})
+    return texts
@@ -1,8 +1,11 @@
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import fnmatch
 import csv
+import io
 import json
+import os
+from .extract_pool import extract_parallel, resolve_workers
 
 try:
     from docx import Document as DocxDocument
@@ -49,44 +52,228 @@ def collect_files(paths: List[Path], include_glob: str = '**/*.md') -> List[Path
     return results
 
 
-def read_kb_texts(files: List[Path]) -> List[str]:
-    texts: List[str] = []
-    for f in files:
-        if not f.exists():
-            continue
-        suf = f.suffix.lower()
-        if suf in ('.md', '.txt'):
-            texts.append(_read_text_file(f))
-        elif suf in ('.docx',) and DocxDocument is not None:
-            texts.append(_read_docx(f))
-        elif suf in ('.pdf',) and PdfReader is not None:
+def extract_text(f: Path) -> Optional[str]:
+    """Text of one KB file; ``''`` if it cannot be parsed, ``None`` for unsupported types."""
+    suf = f.suffix.lower()
+    if suf in ('.md', '.txt'):
+        return _read_text_file(f)
+    elif suf in ('.docx',) and DocxDocument is not None:
+        return _read_docx(f)
+    elif suf in ('.pdf',) and PdfReader is not None:
+        try:
+            reader = PdfReader(str(f))
+            # concatenate all page text
+            pages = []
+            for p in getattr(reader, 'pages', []) or []:
+                try:
+                    pages.append(p.extract_text() or '')
+                except Exception:
+                    pass
+            return '\n'.join(p for p in pages if p)
+        except Exception:
+            return ''
+    elif suf in ('.csv',):
+        try:
+            with f.open('r', encoding='utf-8', errors='ignore') as fh:
+                rdr = csv.reader(fh)
+                rows = [' , '.join(r) for r in rdr]
+                return '\n'.join(rows)
+        except Exception:
+            return ''
+    elif suf in ('.json',):
+        try:
+            j = json.loads(f.read_text(encoding='utf-8'))
+            return json.dumps(j, ensure_ascii=False, indent=2)
+        except Exception:
+            return ''
+    return None
+
+
+def read_kb_texts(files: List[Path], cache: Any = None, workers: int = 1) -> List[str]:
+    """Extracted text of every supported file, in order.
+
+    ``cache`` is an optional :class:`docflow.kb.extract_cache.ExtractCache`
+    that serves files extracted by earlier actions or runs. With ``workers``
+    > 1 (``0`` = one per CPU) PDFs left to extract are split into pages and
+    parsed on a process pool.
+    """
+    return [t for t in extract_texts([f for f in files if f.exists()], cache, workers) if t is not None]
+
+
+def extract_texts(files: List[Path], cache: Any = None, workers: int = 1,
+                  stats: Optional[Dict[str, int]] = None) -> List[Optional[str]]:
+    """Like :func:`read_kb_texts`, aligned with ``files`` (``None`` for unsupported types).
+
+    ``stats['bytes_read']``, if given, grows by the size of each file read from disk.
+    """
+    slots: List[Optional[str]] = [None] * len(files)
+    pending = []
+    for i, f in enumerate(files):
+        text, entry = cache.lookup(f) if cache is not None else (None, None)
+        if text is not None:
+            slots[i] = text
+        else:
+            pending.append((i, f, entry))
+    workers = resolve_workers(workers)
+    if workers > 1 and PdfReader is not None and any(f.suffix.lower() == '.pdf' for _, f, _ in pending):
+        extracted = extract_parallel([f for _, f, _ in pending], workers)
+    else:
+        extracted = [extract_text(f) for _, f, _ in pending]
+    for (i, f, entry), text in zip(pending, extracted):
+        slots[i] = text
+        if stats is not None and text is not None:
+            stats['bytes_read'] += f.stat().st_size
+        if cache is not None:
+            cache.store(entry, text)
+    return slots
+
+
+class _CountingFile(io.FileIO):
+    """Binary file that tracks which of its blocks were read.
+
+    Parsers seek back and forth (a PDF's cross-reference table is read from
+    the end), so distinct blocks are counted rather than every read.
+    """
+    _BLOCK = 4096
+
+    def __init__(self, path: Path):
+        super().__init__(str(path), 'r')
+        self._blocks: set = set()
+
+    def _touch(self, start: int, n: int):
+        if n:
+            self._blocks.update(range(start // self._BLOCK, (start + n - 1) // self._BLOCK + 1))
+
+    def read(self, size: int = -1) -> bytes:
+        start = self.tell()
+        data = super().read(size)
+        self._touch(start, len(data or b''))
+        return data
+
+    def readall(self) -> bytes:
+        start = self.tell()
+        data = super().readall()
+        self._touch(start, len(data))
+        return data
+
+    def readinto(self, buffer: Any) -> Optional[int]:
+        start = self.tell()
+        n = super().readinto(buffer)
+        self._touch(start, n or 0)
+        return n
+
+    @property
+    def bytes_read(self) -> int:
+        return min(len(self._blocks) * self._BLOCK, os.fstat(self.fileno()).st_size)
+
+
+def _iter_pdf_pages(f: Path, stats: Dict[str, int]) -> Iterator[str]:
+    """Text of each page of ``f``, parsed only as far as the caller iterates."""
+    with _CountingFile(f) as fh:
+        try:
             try:
-                reader = PdfReader(str(f))
-                # concatenate all page text
-                pages = []
-                for p in getattr(reader, 'pages', []) or []:
+                pages = PdfReader(fh).pages
+                for i in range(len(pages)):
                     try:
-                        pages.append(p.extract_text() or '')
+                        text = pages[i].extract_text() or ''
                     except Exception:
-                        pass
-                texts.append('\n'.join(p for p in pages if p))
-            except Exception:
-                texts.append('')
-        elif suf in ('.csv',):
-            try:
-                with f.open('r', encoding='utf-8', errors='ignore') as fh:
-                    rdr = csv.reader(fh)
-                    rows = [' , '.join(r) for r in rdr]
-                    texts.append('\n'.join(rows))
+                        text = ''
+                    stats['pages_read'] += 1
+                    yield text
             except Exception:
-                texts.append('')
-        elif suf in ('.json',):
-            try:
-                j = json.loads(f.read_text(encoding='utf-8'))
-                texts.append(json.dumps(j, ensure_ascii=False, indent=2))
-            except Exception:
-                texts.append('')
-    return texts
+                return
+        finally:
+            stats['bytes_read'] += fh.bytes_read
+
+
+def _iter_file_pieces(f: Path, cache: Any, stats: Dict[str, int]) -> Iterator[str]:
+    """Text of ``f`` in pieces (one per PDF page, else the whole text), filling ``cache`` once complete."""
+    text, entry = cache.lookup(f) if cache is not None else (None, None)
+    if text is not None:
+        yield text
+        return
+    if f.suffix.lower() == '.pdf' and PdfReader is not None:
+        pages = []
+        reader = _iter_pdf_pages(f, stats)
+        try:
+            for page in reader:
+                pages.append(page)
+                yield page
+        finally:
+            reader.close()
+        # only a fully read PDF is cached
+        text = '\n'.join(p for p in pages if p)
+    else:
+        text = extract_text(f)
+        if text is not None:
+            stats['bytes_read'] += f.stat().st_size
+            yield text
+    if cache is not None:
+        cache.store(entry, text)
+
+
+def iter_kb_pieces(files: List[Path], cache: Any = None, workers: int = 1,
+                   stats: Optional[Dict[str, int]] = None) -> Iterator[Tuple[int, str]]:
+    """Lazily extracted ``(file index, text)`` pieces of ``files``, in order.
+
+    PDFs are parsed page by page (one piece per page), other files are one
+    piece; nothing is read beyond what the caller consumes. With ``workers``
+    > 1 files are extracted on the process pool ``workers`` at a time
+    instead. ``stats`` receives ``files_read``, ``pages_read`` and
+    ``bytes_read`` (from disk; nothing for cache hits).
+    """
+    stats = stats if stats is not None else {}
+    for key in ('files_read', 'pages_read', 'bytes_read'):
+        stats.setdefault(key, 0)
+    workers = resolve_workers(workers)
+    if workers > 1 and PdfReader is not None:
+        for start in range(0, len(files), workers):
+            batch = files[start:start + workers]
+            stats['files_read'] += len(batch)
+            for fi, text in enumerate(extract_texts(batch, cache, workers, stats), start):
+                if text is not None:
+                    yield fi, text
+        return
+    for fi, f in enumerate(files):
+        stats['files_read'] += 1
+        pieces = _iter_file_pieces(f, cache, stats)
+        try:
+            for piece in pieces:
+                yield fi, piece
+        finally:
+            pieces.close()
+
+
+def assemble_kb_text(files: List[Path], max_chars: int, cache: Any = None,
+                     workers: int = 1) -> Tuple[str, Dict[str, Any]]:
+    """``concat_and_truncate(read_kb_texts(files), max_chars)``, extracting no more than needed.
+
+    Returns the text and its telemetry: how much was read (``files_read``,
+    ``pages_read``, ``bytes_read``) against ``bytes_used``.
+    """
+    files = [f for f in files if f.exists()]
+    stats: Dict[str, Any] = {'files': len(files), 'budget_reached': False}
+    parts: List[str] = []
+    used = 0
+    last = None
+    pieces = iter_kb_pieces(files, cache, workers, stats)
+    try:
+        for fi, piece in pieces:
+            if not piece:
+                continue
+            # pages of a file are joined by one newline, files by a blank line
+            sep = '' if not parts else '\n' if fi == last else '\n\n'
+            parts.append(sep + piece)
+            used += len(sep) + len(piece)
+            last = fi
+            if used >= max_chars:
+                stats['budget_reached'] = True
+                break
+    finally:
+        pieces.close()
+    text = ''.join(parts)[:max_chars]
+    stats['bytes_used'] = len(text.encode('utf-8'))
+    return text, stats
 
 
 def concat_and_truncate(texts: List[str], max_chars: int) -> str:
@@ -1,7 +1,9 @@
 from typing import Optional, Dict, Any, List
 from pathlib import Path
-from .loader import collect_files, read_kb_texts, concat_and_truncate
+from .loader import assemble_kb_text, collect_files, read_kb_texts
+from ..core.cache import stable_hash
 from ..logging_lib import setup_logger
+import time
 
 logger = setup_logger(__name__)
 
@@ -10,7 +12,14 @@ class UnifiedKBStrategy:
     """Unified KB strategy handling both text extraction and file uploads"""
     
     def process_kb(self, cfg: Dict[str, Any], vars: Dict[str, Any]) -> Dict[str, Any]:
-        """Process KB according to strategy, returns context updates"""
+        """Process KB according to strategy, returns context updates
+
+        ``vars['_extract_cache']`` (a :class:`docflow.kb.extract_cache.ExtractCache`)
+        serves text already extracted by earlier actions or runs.
+        ``vars['_kb_cache_dir']`` is where the ``bm25``/``vector`` indexes
+        persist, and ``vars['_ai_client']`` embeds for ``embedder: provider``
+        (under ``vars['_retry_policy']`` when given).
+        """
         if not cfg.get('enabled', False):
             return {}
             
@@ -32,19 +41,24 @@ class UnifiedKBStrategy:
         
         # Log KB processing if verbose available in vars context
         verbose_mode = vars.get('_verbose', False) if isinstance(vars, dict) else False
+        cache = vars.get('_extract_cache') if isinstance(vars, dict) else None
         if verbose_mode:
             logger.info({'event': 'kb_processing_start', 'strategy': strategy, 'files_found': len(files), 'paths': [str(f) for f in files[:10]]})  # Limit to first 10 for readability
         
         if strategy == "inline":
-            result = self._strategy_inline(files, cfg)
+            result = self._strategy_inline(files, cfg, cache, vars)
         elif strategy == "upload":
             result = self._strategy_upload(files, cfg)
         elif strategy == "hybrid":
-            result = self._strategy_hybrid(files, cfg)
+            result = self._strategy_hybrid(files, cfg, cache, vars)
         elif strategy == "summarize":
-            result = self._strategy_summarize(files, cfg)
+            result = self._strategy_summarize(files, cfg, cache)
         elif strategy == "retrieve":
-            result = self._strategy_retrieve(files, cfg, vars)
+            result = self._strategy_retrieve(files, cfg, vars, cache)
+        elif strategy == "bm25":
+            result = self._strategy_bm25(files, cfg, vars, cache)
+        elif strategy == "vector":
+            result = self._strategy_vector(files, cfg, vars, cache)
         else:
             raise ValueError(f"Unknown KB strategy: {strategy}")
             
@@ -56,20 +70,21 @@ class UnifiedKBStrategy:
         
         return result
     
-    def _strategy_inline(self, files: List[Path], cfg: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract text and return as knowledge_base"""
+    def _strategy_inline(self, files: List[Path], cfg: Dict[str, Any], cache: Any = None,
+                         vars: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Extract text and return as knowledge_base (stops extracting once ``max_chars`` is filled)"""
         if not cfg.get('as_text', True):
             return {}
-        texts = read_kb_texts(files)
         max_chars = cfg.get('max_chars', 10000)
         # Support dynamic max_chars from variables
         if isinstance(max_chars, str) and max_chars.startswith('{{'):
             from jinja2 import Template
             try:
-                max_chars = int(Template(max_chars).render(**vars))
+                max_chars = int(Template(max_chars).render(**(vars or {})))
             except:
                 max_chars = 10000
-        kb_text = concat_and_truncate(texts, max_chars)
+        kb_text, stats = assemble_kb_text(files, int(max_chars), cache, workers=cfg.get('extract_workers', 1))
+        logger.info({'event': 'kb_inline_assembled', 'max_chars': int(max_chars), **stats})
         return {'kb_text': kb_text} if kb_text else {}
     
     def _strategy_upload(self, files: List[Path], cfg: Dict[str, Any]) -> Dict[str, Any]:
@@ -83,13 +98,14 @@ class UnifiedKBStrategy:
             })
         return {'attachments': attachments}
     
-    def _strategy_hybrid(self, files: List[Path], cfg: Dict[str, Any]) -> Dict[str, Any]:
+    def _strategy_hybrid(self, files: List[Path], cfg: Dict[str, Any], cache: Any = None,
+                         vars: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Both text extraction AND file upload"""
         result = {}
         
         # Add text if enabled
         if cfg.get('as_text', True):
-            inline_result = self._strategy_inline(files, cfg)
+            inline_result = self._strategy_inline(files, cfg, cache, vars)
             result.update(inline_result)
         
         # Add attachments for upload
@@ -98,16 +114,16 @@ class UnifiedKBStrategy:
         
         return result
     
-    def _strategy_summarize(self, files: List[Path], cfg: Dict[str, Any]) -> Dict[str, Any]:
+    def _strategy_summarize(self, files: List[Path], cfg: Dict[str, Any], cache: Any = None) -> Dict[str, Any]:
         """Summarize files (first N chars of each)"""
-        texts = read_kb_texts(files)
+        texts = read_kb_texts(files, cache, workers=cfg.get('extract_workers', 1))
         snippets = [t[:min(300, len(t))] for t in texts if t]
         summary = '\n\n'.join(snippets)
         return {'kb_text': summary} if summary else {}
     
-    def _strategy_retrieve(self, files: List[Path], cfg: Dict[str, Any], vars: Dict[str, Any]) -> Dict[str, Any]:
+    def _strategy_retrieve(self, files: List[Path], cfg: Dict[str, Any], vars: Dict[str, Any], cache: Any = None) -> Dict[str, Any]:
         """Retrieve relevant snippets based on input vars"""
-        texts = read_kb_texts(files)
+        texts = read_kb_texts(files, cache, workers=cfg.get('extract_workers', 1))
         queries = vars.keys()
         matches = []
         for t in texts:
@@ -120,6 +136,68 @@ class UnifiedKBStrategy:
         kb_text = '\n\n'.join(matches)
         return {'kb_text': kb_text} if kb_text else {}
     
+    def _strategy_bm25(self, files: List[Path], cfg: Dict[str, Any], vars: Dict[str, Any], cache: Any = None) -> Dict[str, Any]:
+        """Top-k chunks for the rendered ``query`` from a persisted BM25 index"""
+        from .bm25 import bm25_index
+
+        query = self._render_query(cfg, vars)
+        if not query:
+            return {}
+        index = bm25_index(files, self._index_dir('bm25', cfg, vars), chunk_size=cfg.get('chunk_size', 2000),
+                           overlap=cfg.get('chunk_overlap', 200), cache=cache, workers=cfg.get('extract_workers', 1))
+        t0 = time.perf_counter()
+        hits = index.search(query, cfg.get('top_k', 5))
+        return self._pack_hits('kb_bm25_query', query, index, hits, cfg, t0)
+
+    def _strategy_vector(self, files: List[Path], cfg: Dict[str, Any], vars: Dict[str, Any], cache: Any = None) -> Dict[str, Any]:
+        """Top-k chunks closest to the rendered ``query`` in a persisted embedding index"""
+        from .vector import make_embedder, vector_index
+
+        query = self._render_query(cfg, vars)
+        if not query:
+            return {}
+        embedder = make_embedder(cfg, vars.get('_ai_client'), vars.get('_retry_policy'))
+        index = vector_index(files, embedder, self._index_dir('vector', cfg, vars), chunk_size=cfg.get('chunk_size', 2000),
+                             overlap=cfg.get('chunk_overlap', 200), cache=cache, workers=cfg.get('extract_workers', 1))
+        t0 = time.perf_counter()
+        hits = index.search(embedder.embed([query])[0], cfg.get('top_k', 5))
+        return self._pack_hits('kb_vector_query', query, index, hits, cfg, t0)
+
+    def _render_query(self, cfg: Dict[str, Any], vars: Dict[str, Any]) -> str:
+        from jinja2 import Template
+
+        query = Template(cfg.get('query') or '').render(**vars).strip()
+        if not query:
+            logger.info({'event': 'kb_no_query', 'strategy': cfg.get('strategy'), 'paths': [str(p) for p in cfg.get('paths', [])]})
+        return query
+
+    def _index_dir(self, kind: str, cfg: Dict[str, Any], vars: Dict[str, Any]) -> Optional[Path]:
+        """``<kb_cache_dir>/<kind>/<hash of the KB paths>``, None without a cache dir (in-memory index)"""
+        if not vars.get('_kb_cache_dir'):
+            return None
+        key = stable_hash({'paths': [str(p) for p in cfg.get('paths', [])], 'include_glob': cfg.get('include_glob')})
+        return Path(vars['_kb_cache_dir']) / kind / key[:16]
+
+    def _pack_hits(self, event: str, query: str, index: Any, hits: List[Any], cfg: Dict[str, Any], t0: float) -> Dict[str, Any]:
+        """Join the hit chunks, best first, within ``max_chars``"""
+        max_chars = int(cfg.get('max_chars', 10000))
+        pieces: List[str] = []
+        used = 0
+        for _, i in hits:
+            text = index.chunk(i)
+            sep = 2 if pieces else 0
+            if used + sep + len(text) > max_chars:
+                if not pieces:
+                    pieces.append(text[:max_chars])
+                break
+            pieces.append(text)
+            used += sep + len(text)
+        logger.info({'event': event, 'query': query[:200], 'chunks': len(index), 'hits': len(hits),
+                     'used': len(pieces), 'sources': sorted({index.source(i) for _, i in hits[:len(pieces)]}),
+                     'lookup_ms': round((time.perf_counter() - t0) * 1000, 2)})
+        kb_text = '\n\n'.join(pieces)
+        return {'kb_text': kb_text} if kb_text else {}
+
     def _detect_mime(self, file: Path) -> str:
         """Detect MIME type based on file extension"""
         suffix = file.suffix.lower()
@@ -155,9 +233,8 @@ def strategy_inline(cfg: Dict[str, Any], vars: Dict[str, Any]) -> Optional[str]:
         # Use legacy collect_files approach
         path_objs = [Path(p) for p in paths]
         files = collect_files(path_objs, cfg_copy.get('include_glob', '**/*.md'))
-        texts = read_kb_texts(files)
-        max_chars = cfg_copy.get('max_chars', 10000)
-        return concat_and_truncate(texts, max_chars) or None
+        kb_text, _ = assemble_kb_text(files, cfg_copy.get('max_chars', 10000))
+        return kb_text or None
     
     # Use new unified system for glob patterns
     result = kb_strategy_processor.process_kb(cfg_copy, vars)
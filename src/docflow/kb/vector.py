@@ -0,0 +1,299 @@
+"""Dense vector retrieval over KB chunks.
+
+Chunks (:func:`docflow.kb.loader.chunk_text`) are embedded into one
+contiguous, L2-normalized ``float32`` matrix, so a query is a single
+matrix-vector product followed by an ``argpartition`` top-k.
+
+The embedder is pluggable: :class:`HashingEmbedder` (the default) hashes
+words and word pairs into a fixed number of dimensions and needs no model
+or network; :class:`ProviderEmbedder` asks the AI provider
+(``embed_texts``) for real embeddings.
+
+With an index directory (``<kb_cache_dir>/vector/<kb config hash>/``) the
+index persists across runs as ``vectors-<build>.npy`` (opened
+memory-mapped), the chunk texts ``chunks-<build>.bin`` and the chunk
+offset table ``table-<build>.npz`` (text offsets, source file and content
+hash of each chunk). On rebuild, chunks of unchanged files are taken from
+the previous build and embeddings are reused by chunk hash, so only the
+chunks of new or changed files are embedded. ``manifest.json`` names the
+current build and is replaced last.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import mmap
+import os
+import threading
+import time
+import uuid
+import zlib
+import numpy as np
+from .bm25 import tokenize, _write_atomic
+from .loader import chunk_text, extract_texts
+from ..ai.client import unwrap_client
+from ..ai.upload_cache import file_digest
+from ..logging_lib import setup_logger
+
+logger = setup_logger(__name__)
+
+# bump when the on-disk layout changes
+INDEX_VERSION = 1
+
+_PAIR_WEIGHT = 0.5
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Offline, deterministic embedder: signed feature hashing of words and word pairs.
+
+    Weights are ``1 + log(tf)`` (halved for word pairs, which refine rather
+    than decide a match); rows are L2-normalized, so the dot product is the
+    cosine similarity.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = int(dim)
+        self.key = f'hashing-{self.dim}-v1'
+        # feature -> (column, sign); crc32 is stable across processes, unlike hash()
+        self._slots: Dict[str, Tuple[int, float]] = {}
+
+    def _slot(self, feature: str) -> Tuple[int, float]:
+        slot = self._slots.get(feature)
+        if slot is None:
+            h = zlib.crc32(feature.encode('utf-8'))
+            slot = self._slots[feature] = (h % self.dim, -1.0 if h & 0x80000000 else 1.0)
+        return slot
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            for features, weight in ((words, 1.0), ([f'{a} {b}' for a, b in zip(words, words[1:])], _PAIR_WEIGHT)):
+                for feature, n in Counter(features).items():
+                    col, sign = self._slot(feature)
+                    out[row, col] += sign * weight * (1.0 + math.log(n))
+        return _normalize(out)
+
+
+class ProviderEmbedder:
+    """Embeddings from the AI provider's ``embed_texts``, sent in batches.
+
+    Calls go through ``client`` as configured (rate limits included) and,
+    with a ``retry_policy``, under its backoff and the provider's breaker.
+    """
+
+    def __init__(self, client: Any, model: Optional[str] = None, batch_size: int = 64, retry_policy: Any = None):
+        provider = unwrap_client(client)
+        if not callable(getattr(provider, 'embed_texts', None)):
+            raise ValueError(f'{type(provider).__name__} does not provide embeddings')
+        self.client = client
+        self.provider = type(provider).__name__
+        self.model = model
+        self.batch_size = batch_size
+        self.retry_policy = retry_policy
+        self.key = f"provider-{self.provider}-{model or getattr(provider, 'model', 'default')}"
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self.retry_policy is None:
+            return self.client.embed_texts(texts, model=self.model)
+        return self.retry_policy.call(lambda: self.client.embed_texts(texts, model=self.model), self.provider)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            rows.extend(self._embed_batch(texts[start:start + self.batch_size]))
+        return _normalize(np.asarray(rows, dtype=np.float32).reshape(len(texts), -1))
+
+
+def make_embedder(cfg: Dict[str, Any], client: Any = None, retry_policy: Any = None) -> Any:
+    """Embedder for a KB config: ``embedder: hashing`` (default) or ``provider`` (needs ``client``)."""
+    kind = cfg.get('embedder', 'hashing')
+    if kind == 'hashing':
+        return HashingEmbedder(cfg.get('embedding_dim', 256))
+    if kind == 'provider':
+        if client is None:
+            raise ValueError("KB embedder 'provider' needs an AI client")
+        return ProviderEmbedder(client, cfg.get('embedding_model'), retry_policy=retry_policy)
+    raise ValueError(f'Unknown KB embedder: {kind}')
+
+
+class VectorIndex:
+    """Chunk embeddings (``vectors``, one normalized row per chunk) with their texts and sources."""
+
+    def __init__(self, vectors: np.ndarray, table: Dict[str, np.ndarray], text: Any, files: List[str]):
+        self.vectors = vectors
+        self.text_offsets = table['text_offsets']
+        self.chunk_file = table['chunk_file']
+        self.chunk_hash = table['chunk_hash']
+        self.text = text
+        self.files = files
+
+    def __len__(self) -> int:
+        return len(self.chunk_file)
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5) -> List[Tuple[float, int]]:
+        """``(cosine, chunk id)`` of the ``top_k`` chunks closest to ``query_vector``, best first."""
+        if not len(self):
+            return []
+        scores = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+        best = np.arange(len(scores))
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(float(scores[i]), int(i)) for i in best if scores[i] > 0]
+
+    def chunk(self, i: int) -> str:
+        return bytes(self.text[self.text_offsets[i]:self.text_offsets[i + 1]]).decode('utf-8')
+
+    def source(self, i: int) -> str:
+        return self.files[self.chunk_file[i]]
+
+
+def _build_arrays(chunks: List[List[str]]) -> Tuple[Dict[str, np.ndarray], bytes]:
+    encoded = [c.encode('utf-8') for file_chunks in chunks for c in file_chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    table = {
+        'text_offsets': offsets,
+        'chunk_file': np.repeat(np.arange(len(chunks), dtype=np.int32), [len(c) for c in chunks]),
+        'chunk_hash': np.array([hashlib.sha256(e).digest()[:16] for e in encoded], dtype='S16'),
+    }
+    return table, b''.join(encoded)
+
+
+# index_dir -> (build id, index) of indexes loaded by this process
+_loaded: Dict[str, Tuple[str, VectorIndex]] = {}
+_loaded_lock = threading.Lock()
+_build_locks: Dict[str, threading.Lock] = {}
+
+
+def _load_build(index_dir: Path, manifest: Dict[str, Any]) -> VectorIndex:
+    build = manifest['build']
+    vectors = np.load(index_dir / f'vectors-{build}.npy', mmap_mode='r', allow_pickle=False)
+    with np.load(index_dir / f'table-{build}.npz', allow_pickle=False) as data:
+        table = {k: data[k] for k in data.files}
+    with open(index_dir / f'chunks-{build}.bin', 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        text = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+    return VectorIndex(vectors, table, text, [f for f, _ in manifest['files']])
+
+
+def vector_index(files: List[Path], embedder: Any, index_dir: Optional[Path] = None, chunk_size: int = 2000,
+                 overlap: int = 200, cache: Any = None, workers: int = 1) -> VectorIndex:
+    """The vector index of ``files``, loaded or incrementally rebuilt under ``index_dir``.
+
+    Without ``index_dir`` the index is built in memory. ``cache`` and
+    ``workers`` are passed to the text extraction of new or changed files.
+    """
+    files = [Path(f) for f in files if Path(f).exists()]
+    digest = cache.digest if cache is not None else file_digest
+    current = [[str(f), digest(f)] for f in files]
+    params = {'version': INDEX_VERSION, 'chunk_size': chunk_size, 'overlap': overlap, 'embedder': embedder.key}
+    if index_dir is None:
+        texts = extract_texts(files, cache, workers)
+        table, text = _build_arrays([chunk_text(t or '', chunk_size, overlap) for t in texts])
+        vectors = embedder.embed([bytes(text[a:b]).decode('utf-8') for a, b in
+                                  zip(table['text_offsets'][:-1], table['text_offsets'][1:])])
+        return VectorIndex(vectors, table, text, [f for f, _ in current])
+
+    index_dir = Path(index_dir)
+    key = str(index_dir)
+    with _loaded_lock:
+        lock = _build_locks.setdefault(key, threading.Lock())
+    with lock:
+        try:
+            manifest = json.loads((index_dir / 'manifest.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            manifest = None
+        previous = None
+        if manifest is not None:
+            with _loaded_lock:
+                loaded = _loaded.get(key)
+            try:
+                previous = loaded[1] if loaded is not None and loaded[0] == manifest['build'] else _load_build(index_dir, manifest)
+            except (OSError, ValueError, KeyError) as e:
+                logger.info({'event': 'kb_vector_corrupt', 'dir': key, 'error': str(e)})
+                manifest = None
+        if manifest is not None and manifest.get('files') == current and manifest.get('params') == params:
+            with _loaded_lock:
+                _loaded[key] = (manifest['build'], previous)
+            return previous
+        return _rebuild(index_dir, files, current, params, embedder, cache, workers, manifest, previous)
+
+
+def _rebuild(index_dir: Path, files: List[Path], current: List[List[str]], params: Dict[str, Any], embedder: Any,
+             cache: Any, workers: int, manifest: Optional[Dict[str, Any]], previous: Optional[VectorIndex]) -> VectorIndex:
+    t0 = time.time()
+    index_dir.mkdir(parents=True, exist_ok=True)
+    prev_params = (manifest or {}).get('params') or {}
+    same_chunking = previous is not None and all(prev_params.get(k) == params[k] for k in ('version', 'chunk_size', 'overlap'))
+    same_embedder = previous is not None and prev_params.get('embedder') == embedder.key
+
+    # chunks of unchanged files come from the previous build
+    prev_rows: Dict[str, range] = {}
+    if same_chunking:
+        # chunk_file is sorted: each previous file owns one contiguous row range
+        bounds = np.searchsorted(previous.chunk_file, np.arange(len(manifest['files']) + 1))
+        for fi, (_, digest) in enumerate(manifest['files']):
+            prev_rows[digest] = range(int(bounds[fi]), int(bounds[fi + 1]))
+    chunks: List[Optional[List[str]]] = []
+    missing = []
+    for i, (_, digest) in enumerate(current):
+        if digest in prev_rows:
+            chunks.append([previous.chunk(j) for j in prev_rows[digest]])
+        else:
+            chunks.append(None)
+            missing.append(i)
+    texts = extract_texts([files[i] for i in missing], cache, workers) if missing else []
+    for i, text in zip(missing, texts):
+        chunks[i] = chunk_text(text or '', params['chunk_size'], params['overlap'])
+    table, text = _build_arrays(chunks)  # type: ignore[arg-type]
+
+    # embeddings are reused by chunk hash
+    prev_by_hash = {h: j for j, h in enumerate(previous.chunk_hash.tolist())} if same_embedder else {}
+    reuse = [(i, prev_by_hash[h]) for i, h in enumerate(table['chunk_hash'].tolist()) if h in prev_by_hash]
+    todo = sorted(set(range(len(table['chunk_file']))) - {i for i, _ in reuse})
+    offsets = table['text_offsets']
+    fresh = embedder.embed([text[offsets[i]:offsets[i + 1]].decode('utf-8') for i in todo]) if todo else None
+    dim = fresh.shape[1] if fresh is not None else previous.vectors.shape[1] if reuse else getattr(embedder, 'dim', 1)
+
+    build = uuid.uuid4().hex[:12]
+    vectors_path = index_dir / f'vectors-{build}.npy'
+    tmp = index_dir / f'.vectors-{build}.{os.getpid()}.tmp.npy'
+    vectors = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(len(table['chunk_file']), dim))
+    if reuse:
+        dst, src = (np.array(x, dtype=np.int64) for x in zip(*reuse))
+        vectors[dst] = previous.vectors[src]
+    if todo:
+        vectors[np.array(todo, dtype=np.int64)] = fresh
+    vectors.flush()
+    del vectors
+    os.replace(tmp, vectors_path)
+    table_tmp = index_dir / f'.table-{build}.{os.getpid()}.tmp.npz'
+    np.savez(table_tmp, **table)
+    os.replace(table_tmp, index_dir / f'table-{build}.npz')
+    _write_atomic(index_dir / f'chunks-{build}.bin', text)
+    new_manifest = {'build': build, 'params': params, 'files': current, 'built_at': time.time()}
+    _write_atomic(index_dir / 'manifest.json', json.dumps(new_manifest).encode('utf-8'))
+    if manifest and manifest.get('build'):
+        old = manifest['build']
+        for name in (f'vectors-{old}.npy', f'table-{old}.npz', f'chunks-{old}.bin'):
+            try:
+                (index_dir / name).unlink()
+            except OSError:
+                pass
+    index = _load_build(index_dir, new_manifest)
+    with _loaded_lock:
+        _loaded[str(index_dir)] = (build, index)
+    logger.info({'event': 'kb_vector_built', 'dir': str(index_dir), 'files': len(current), 'changed': len(missing),
+                 'chunks': len(index), 'embedded': len(todo), 'reused': len(reuse), 'embedder': embedder.key,
+                 'elapsed_s': round(time.time() - t0, 3)})
+    return index
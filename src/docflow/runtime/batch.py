@@ -0,0 +1,271 @@
+"""Run one workflow over many input records.
+
+The config, AI client, action list, template bytes and KB extraction are
+loaded once and shared; each record becomes the initial ``ctx.global_vars``
+of its own workflow run and gets its own output folder
+(``<output_dir>/<record_id>/``).
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import csv
+import json
+import math
+import re
+import time
+from ..ai.batch_jobs import COMPLETED, IN_PROGRESS, DeferringAIClient
+from ..ai.client import unwrap_client
+from ..config import load_config
+from ..errors import RequestDeferred
+from ..core.workflow import execute_workflow
+from ..logging_lib import setup_logger
+from .orchestrator import (
+    build_context,
+    client_stats,
+    concurrency_limiter_for,
+    dump_actions,
+    make_client_for,
+    render_templates,
+    resolve_output_dir,
+    resolve_temp_dir,
+    template_path_for,
+)
+
+logger = setup_logger(__name__)
+
+_SAFE_ID_RE = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Read records from a ``.jsonl`` (one JSON object per line) or ``.csv`` file."""
+    p = Path(path)
+    suffix = p.suffix.lower()
+    if suffix in ('.jsonl', '.ndjson'):
+        records = []
+        with p.open('r', encoding='utf-8') as fh:
+            for lineno, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if not isinstance(rec, dict):
+                    raise ValueError(f'{path}:{lineno}: expected a JSON object per line')
+                records.append(rec)
+        return records
+    if suffix == '.csv':
+        with p.open('r', encoding='utf-8', newline='') as fh:
+            return [dict(row) for row in csv.DictReader(fh)]
+    raise ValueError(f"Unsupported batch input '{path}': use .jsonl or .csv")
+
+
+def _record_id(record: Dict[str, Any], index: int, id_field: Optional[str]) -> str:
+    raw = record.get(id_field) if id_field else None
+    if raw is None or str(raw).strip() == '':
+        return f'{index:06d}'
+    return _SAFE_ID_RE.sub('_', str(raw)).strip('._') or f'{index:06d}'
+
+
+@dataclass
+class BatchRecordResult:
+    index: int
+    record_id: str
+    ok: bool
+    latency_s: float
+    files: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchReport:
+    total: int
+    succeeded: int
+    failed: int
+    elapsed_s: float
+    results: List[BatchRecordResult] = field(default_factory=list)
+    # client_stats of the shared AI client (thread mode only)
+    ai_stats: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """Records per second over the whole batch."""
+        return self.total / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def latency_percentile(self, pct: float) -> float:
+        lat = sorted(r.latency_s for r in self.results)
+        if not lat:
+            return 0.0
+        # nearest-rank percentile
+        idx = min(len(lat) - 1, max(0, math.ceil(pct / 100.0 * len(lat)) - 1))
+        return lat[idx]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'elapsed_s': round(self.elapsed_s, 3),
+            'throughput_rps': round(self.throughput, 3),
+            'latency_p50_s': round(self.latency_percentile(50), 3),
+            'latency_p95_s': round(self.latency_percentile(95), 3),
+            'latency_max_s': round(max((r.latency_s for r in self.results), default=0.0), 3),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'summary': self.summary(), 'records': [asdict(r) for r in self.results]}
+
+
+class BatchRunner:
+    """Shared, load-once state for running a config over many records."""
+
+    def __init__(self, config_path: str, id_field: Optional[str] = 'id', verbose: bool = False):
+        self.config_path = config_path
+        self.cfg = load_config(config_path)
+        self.id_field = id_field
+        self.verbose = verbose
+        self.ai = make_client_for(self.cfg)
+        self.actions = dump_actions(self.cfg)
+        self.output_dir = resolve_output_dir(self.cfg)
+        self.template_data = {}
+        for t in self.cfg.workflow.templates:
+            tp = template_path_for(self.cfg, t)
+            self.template_data[str(tp)] = tp.read_bytes()
+        # shared across records: KB extraction results memoized by GenerativeAction
+        self.kb_memo: Dict[str, Any] = {}
+
+    def run_record(self, index: int, record: Dict[str, Any]) -> BatchRecordResult:
+        record_id = _record_id(record, index, self.id_field)
+        t0 = time.time()
+        try:
+            outdir = self.output_dir / record_id
+            ctx = build_context(self.cfg, self.ai, outdir)
+            ctx.action_cache = self.kb_memo
+            ctx.verbose = self.verbose
+            ctx.global_vars.update(record)
+            action_results = execute_workflow(self.actions, ctx)
+            files = render_templates(self.cfg, ctx, action_results, outdir, template_data=self.template_data)
+            latency = time.time() - t0
+            logger.info({'event': 'batch_record_end', 'record': record_id, 'latency_s': round(latency, 3)})
+            return BatchRecordResult(index=index, record_id=record_id, ok=True, latency_s=latency, files=list(files))
+        except RequestDeferred:
+            raise  # offline mode: run again once the batch job has answered
+        except Exception as e:
+            latency = time.time() - t0
+            logger.info({'event': 'batch_record_error', 'record': record_id, 'error': str(e)})
+            return BatchRecordResult(index=index, record_id=record_id, ok=False, latency_s=latency, error=f'{type(e).__name__}: {e}')
+
+
+# per-process runner for mode='process' (built once by the pool initializer)
+_WORKER_RUNNER: Optional[BatchRunner] = None
+
+
+def _init_worker(config_path: str, id_field: Optional[str], verbose: bool):
+    global _WORKER_RUNNER
+    _WORKER_RUNNER = BatchRunner(config_path, id_field=id_field, verbose=verbose)
+
+
+def _run_in_worker(index: int, record: Dict[str, Any]) -> BatchRecordResult:
+    assert _WORKER_RUNNER is not None, 'batch worker not initialized'
+    return _WORKER_RUNNER.run_record(index, record)
+
+
+def _run_offline(runner: BatchRunner, records: List[Dict[str, Any]], workers: int,
+                 poll_interval_s: float) -> List[BatchRecordResult]:
+    """Run ``records`` in rounds, answering their provider requests through batch jobs.
+
+    Each round runs the still-pending records; the requests they could not
+    get answered are submitted as one job, and once it completes the
+    deferred records run again with those answers (earlier answers are
+    kept, so every round gets one generative level further).
+    """
+    deferring = DeferringAIClient(runner.ai)
+    runner.ai = deferring
+    backend = unwrap_client(deferring).batch_backend(resolve_temp_dir(runner.cfg) / 'batch_jobs')
+    if backend is None:
+        raise ValueError(f"Provider '{runner.cfg.ai.provider}' has no batch API: offline mode is unavailable")
+    done: Dict[int, BatchRecordResult] = {}
+    pending = list(range(len(records)))
+    # prompts that change on every run (timestamps...) would never settle
+    max_rounds = len(runner.actions) + 1
+    rounds = 0
+
+    def attempt(i: int):
+        try:
+            return runner.run_record(i, records[i])
+        except RequestDeferred:
+            return None
+
+    while pending and rounds < max_rounds:
+        rounds += 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='docflow-batch') as pool:
+            outcomes = list(pool.map(attempt, pending))
+        deferred = [i for i, out in zip(pending, outcomes) if out is None]
+        done.update({out.index: out for out in outcomes if out is not None})
+        requests = deferring.take_pending()
+        if not deferred or not requests:
+            pending = deferred
+            break
+        job_id = backend.submit(requests)
+        logger.info({'event': 'batch_job_submitted', 'job_id': job_id, 'round': rounds,
+                     'requests': len(requests), 'records': len(deferred)})
+        status = backend.status(job_id)
+        while status == IN_PROGRESS:
+            time.sleep(poll_interval_s)
+            status = backend.status(job_id)
+        logger.info({'event': 'batch_job_finished', 'job_id': job_id, 'status': status})
+        if status != COMPLETED:
+            raise RuntimeError(f'batch job {job_id} ended with status {status!r}')
+        deferring.add_answers(backend.results(job_id))
+        pending = deferred
+    for i in pending:
+        done[i] = BatchRecordResult(index=i, record_id=_record_id(records[i], i, runner.id_field), ok=False,
+                                    latency_s=0.0, error=f'RequestDeferred: unanswered after {rounds} batch rounds')
+    return list(done.values())
+
+
+def run_batch(config_path: str, records: Iterable[Dict[str, Any]], workers: int = 4, mode: str = 'thread',
+              id_field: Optional[str] = 'id', verbose: bool = False, offline: bool = False,
+              poll_interval_s: float = 30.0) -> BatchReport:
+    """Run the workflow of ``config_path`` once per record and return a report.
+
+    ``mode='thread'`` shares one runner (and AI client) across a thread pool;
+    ``mode='process'`` builds one runner per worker process, which suits
+    CPU-heavy workflows (code actions, large KB extraction). ``offline``
+    (thread mode only) sends the provider requests as bulk batch jobs,
+    polled every ``poll_interval_s``, instead of one call at a time.
+    """
+    if mode not in ('thread', 'process'):
+        raise ValueError(f"Unknown batch mode '{mode}': use 'thread' or 'process'")
+    if offline and mode != 'thread':
+        raise ValueError("Offline batch submission requires mode='thread'")
+    records = list(records)
+    workers = max(1, int(workers))
+    t0 = time.time()
+    logger.info({'event': 'batch_start', 'records': len(records), 'workers': workers, 'mode': mode, 'offline': offline})
+    results: List[BatchRecordResult] = []
+    if offline:
+        runner = BatchRunner(config_path, id_field=id_field, verbose=verbose)
+        results = _run_offline(runner, records, workers, poll_interval_s)
+    else:
+        if mode == 'thread':
+            runner = BatchRunner(config_path, id_field=id_field, verbose=verbose)
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='docflow-batch')
+            fn = runner.run_record
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config_path, id_field, verbose))
+            fn = _run_in_worker
+        with pool:
+            futures = [pool.submit(fn, i, r) for i, r in enumerate(records)]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+    results.sort(key=lambda r: r.index)
+    succeeded = sum(1 for r in results if r.ok)
+    report = BatchReport(total=len(results), succeeded=succeeded, failed=len(results) - succeeded,
+                         elapsed_s=time.time() - t0, results=results)
+    logger.info({'event': 'batch_end', **report.summary()})
+    if mode == 'thread':
+        report.ai_stats = client_stats(runner.ai)
+        logger.info({'event': 'ai_client_stats', **report.ai_stats})
+        limiter = concurrency_limiter_for(runner.cfg)
+        if limiter is not None:
+            logger.info({'event': 'ai_concurrency', **limiter.stats()})
+    return report
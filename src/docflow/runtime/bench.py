@@ -0,0 +1,136 @@
+"""Load generator: many concurrent workflow runs against a simulated provider.
+
+:func:`run_bench` runs a workflow ``workflows`` times through the batch
+runner, ``concurrency`` at a time, with ``ai.provider`` forced to the mock
+and its simulated latency, error and throttling profile set from ``mock``
+(see :class:`docflow.config.MockConfig`). Without a config it uses a small
+synthetic workflow (two chained text actions and an image into a DOCX). The
+report gives throughput, workflow latency percentiles, provider call
+counters and the CPU time and peak memory used, which is what sizing a
+worker pool needs.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+import os
+import sys
+import tempfile
+import yaml
+from ..config import MockConfig
+from ..logging_lib import setup_logger
+from .batch import BatchReport, run_batch
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore
+
+logger = setup_logger(__name__)
+
+
+def _synthetic_project(root: Path) -> Dict[str, Any]:
+    from docx import Document
+
+    templates = root / 'templates'
+    templates.mkdir(parents=True, exist_ok=True)
+    doc = Document()
+    doc.add_paragraph('{{intro}}')
+    doc.add_paragraph('{{summary}}')
+    doc.add_paragraph('{{image:cover}}')
+    doc.save(templates / 'bench_template.docx')
+    return {
+        'project': {'base_dir': str(root)},
+        # simulated errors and throttling are retried, as a production config would
+        'ai': {'retries': 3, 'retry': {'base_delay_s': 0.05, 'max_delay_s': 1.0}},
+        'workflow': {
+            'actions': [
+                {'id': 'intro', 'type': 'generative', 'prompt': 'Write an introduction for {{customer}}',
+                 'exports': [{'name': 'intro_text', 'jinja': '{{ text }}'}]},
+                {'id': 'summary', 'type': 'generative', 'deps': ['intro'],
+                 'prompt': 'Summarize for {{customer}}: {{intro_text}}'},
+                {'id': 'cover', 'type': 'generative', 'returns': 'image', 'prompt': 'Cover image for {{customer}}'},
+            ],
+            'templates': [{'path': 'templates/bench_template.docx', 'adapter': 'docx',
+                           'placeholder_map': {'intro': 'intro', 'summary': 'summary', 'cover': 'cover'}}],
+        },
+    }
+
+
+def _user_project(config_path: str) -> Dict[str, Any]:
+    cfg_path = Path(config_path)
+    data = yaml.safe_load(cfg_path.read_text(encoding='utf-8')) or {}
+    project = data.setdefault('project', {})
+    # the bench config lives elsewhere: pin base_dir the way load_config resolves it
+    base_dir = Path(project.get('base_dir', '.'))
+    if not base_dir.is_absolute():
+        base_dir = (cfg_path.parent / base_dir).resolve()
+    project['base_dir'] = str(base_dir)
+    return data
+
+
+def _usage() -> Dict[str, float]:
+    t = os.times()
+    out = {'cpu_user_s': t.user + t.children_user, 'cpu_system_s': t.system + t.children_system}
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        out['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+        out['children_peak_rss_mb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return out
+
+
+@dataclass
+class BenchReport:
+    workflows: int
+    concurrency: int
+    mode: str
+    batch: BatchReport
+    usage: Dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        b = self.batch
+        out: Dict[str, Any] = {
+            'workflows': self.workflows,
+            'concurrency': self.concurrency,
+            'mode': self.mode,
+            'succeeded': b.succeeded,
+            'failed': b.failed,
+            'elapsed_s': round(b.elapsed_s, 3),
+            'throughput_wps': round(b.throughput, 3),
+            'latency_p50_s': round(b.latency_percentile(50), 3),
+            'latency_p95_s': round(b.latency_percentile(95), 3),
+            'latency_p99_s': round(b.latency_percentile(99), 3),
+        }
+        out.update({k: v for k, v in b.ai_stats.items() if k.startswith(('mock_', 'provider_', 'coalesced'))})
+        out.update({k: round(v, 3) for k, v in self.usage.items()})
+        return out
+
+
+def run_bench(config_path: Optional[str] = None, workflows: int = 50, concurrency: int = 8, mode: str = 'thread',
+              mock: Optional[Dict[str, Any]] = None, work_dir: Optional[str] = None) -> BenchReport:
+    """Run ``workflows`` workflow runs, ``concurrency`` at a time, against the simulated provider.
+
+    Outputs and caches go to ``work_dir`` (a fresh temp dir by default), so
+    caches from earlier runs do not flatter the numbers. Provider counters
+    are only available in thread mode.
+    """
+    root = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix='docflow-bench-'))
+    root.mkdir(parents=True, exist_ok=True)
+    data = _user_project(config_path) if config_path else _synthetic_project(root)
+    data['project'].update({'output_dir': str(root / 'out'), 'temp_dir': str(root / 'tmp')})
+    data['ai'] = {**(data.get('ai') or {}), 'provider': 'mock',
+                  'mock': MockConfig(**(mock or {})).model_dump()}
+    bench_cfg = root / 'bench.config.yaml'
+    bench_cfg.write_text(yaml.safe_dump(data, sort_keys=False), encoding='utf-8')
+
+    records = [{'id': f'w{i:05d}', 'customer': f'Customer {i}'} for i in range(workflows)]
+    before = _usage()
+    logger.info({'event': 'bench_start', 'workflows': workflows, 'concurrency': concurrency, 'mode': mode,
+                 'work_dir': str(root)})
+    batch = run_batch(str(bench_cfg), records, workers=concurrency, mode=mode)
+    after = _usage()
+    usage = {k: after[k] - before[k] for k in ('cpu_user_s', 'cpu_system_s')}
+    usage.update({k: v for k, v in after.items() if k.endswith('rss_mb')})
+    report = BenchReport(workflows=workflows, concurrency=concurrency, mode=mode, batch=batch, usage=usage)
+    logger.info({'event': 'bench_end', **report.summary()})
+    return report
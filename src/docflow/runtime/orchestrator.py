@@ -1,9 +1,20 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from ..config import load_config
 from ..core.context import ExecutionContext
 from ..ai.factory import make_ai_client
+from ..ai.coalesce import CoalescingAIClient
+from ..ai.hedge import HedgingAIClient
+from ..ai.providers.cassette import CassetteProvider
+from ..ai.providers.mock import MockProvider
+from ..ai.ratelimit import RateLimitedAIClient
+from ..ai.response_cache import CachingAIClient, ResponseCache
+from ..ai.retry import RetryPolicy
+from ..ai.concurrency import limiter_for
 from ..core.workflow import execute_workflow
+from ..core.cache import ActionCache, parse_cache_setting
+from ..core.incremental import DependencyGraph
+from ..core.actions.code_pool import get_code_pool
 from ..adapters.docx_adapter import DocxAdapter
 from ..adapters.pptx_adapter import PptxAdapter
 from ..logging_lib import setup_logger, json_log_entry, reconfigure_log_level
@@ -16,33 +27,99 @@ logger = setup_logger(__name__)
 ADAPTERS = {'docx': DocxAdapter, 'pptx': PptxAdapter}
 
 
-def run_config(path: str, verbose: bool = False) -> Dict[str, Any]:
-    cfg = load_config(path)
-    
-    # Configure logging level - use DEBUG if verbose
-    log_level = 'DEBUG' if verbose else (cfg.project.log_level or 'INFO')
-    reconfigure_log_level(log_level)
-    logger.info({'event': 'log_level_configured', 'level': log_level, 'verbose': verbose})
-    ai = make_ai_client(cfg.ai.model and {'provider': cfg.ai.provider, 'model': cfg.ai.model, 'api_key_envvar': cfg.ai.api_key_envvar} or {'provider': cfg.ai.provider})
-    ctx = ExecutionContext()
-    ctx.ai_client = ai
-    # populate context paths from configuration (normalize relative to base_dir)
-    # assets_dir -> project.output_dir / assets
-    outdir = Path(cfg.project.output_dir)
-    if not outdir.is_absolute():
-        outdir = (Path(cfg.project.base_dir) / outdir).resolve()
-    assets_dir = outdir / 'assets'
-    assets_dir.mkdir(parents=True, exist_ok=True)
-    ctx.assets_dir = assets_dir
-    # kb_cache_dir -> project.temp_dir / kb
+def resolve_temp_dir(cfg) -> Path:
+    """project.temp_dir resolved against project.base_dir."""
     tmpdir = Path(cfg.project.temp_dir)
     if not tmpdir.is_absolute():
         tmpdir = (Path(cfg.project.base_dir) / tmpdir).resolve()
-    kb_cache = tmpdir / 'kb'
-    kb_cache.mkdir(parents=True, exist_ok=True)
-    ctx.kb_cache_dir = kb_cache
+    return tmpdir
 
-    # execute workflow
+
+def result_cache_for(cfg) -> ActionCache:
+    """The persistent ActionResult cache of a loaded config."""
+    return ActionCache(resolve_temp_dir(cfg) / 'cache' / 'actions')
+
+
+def resolve_output_dir(cfg) -> Path:
+    """project.output_dir resolved against project.base_dir."""
+    outdir = Path(cfg.project.output_dir)
+    if not outdir.is_absolute():
+        outdir = (Path(cfg.project.base_dir) / outdir).resolve()
+    return outdir
+
+
+def _provider_cfg(cfg, provider: str, model: Optional[str], api_key_envvar: Optional[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {'provider': provider, 'model': model, 'api_key_envvar': api_key_envvar,
+                           'timeout_s': cfg.ai.timeout_s, 'http_pool_size': cfg.ai.http_pool_size}
+    rl = cfg.ai.rate_limit_for(provider, model)
+    if rl is not None:
+        out['rate_limit'] = {'rpm': rl.rpm, 'tpm': rl.tpm, 'state_dir': cfg.ai.rate_limit_dir}
+    if provider == 'mock' or (provider == 'cassette' and cfg.ai.cassette.provider == 'mock'):
+        out['mock'] = cfg.ai.mock.model_dump()
+    if provider == 'cassette':
+        cc = cfg.ai.cassette
+        path = cc.path if cc.path.is_absolute() else (Path(cfg.project.base_dir) / cc.path).resolve()
+        out['cassette'] = {'path': path, 'mode': cc.mode, 'provider': cc.provider}
+    return out
+
+
+def make_client_for(cfg):
+    """Build the AI client described by ``cfg.ai``.
+
+    With ``ai.response_cache.enabled`` the client is wrapped so repeated
+    requests are answered from ``<temp_dir>/kb/responses`` (next to
+    ``ctx.kb_cache_dir``), shared by all runs and batch processes.
+    """
+    ai_cfg = _provider_cfg(cfg, cfg.ai.provider, cfg.ai.model, cfg.ai.api_key_envvar)
+    ai_cfg['coalesce'] = cfg.ai.coalesce
+    hc = cfg.ai.hedge
+    if hc.enabled:
+        ai_cfg['hedge'] = {'percentile': hc.percentile, 'min_samples': hc.min_samples,
+                           'max_extra_ratio': hc.max_extra_pct / 100.0, 'min_delay_s': hc.min_delay_s}
+        if hc.fallback is not None:
+            fb = hc.fallback
+            ai_cfg['hedge']['fallback'] = _provider_cfg(cfg, fb.provider, fb.model, fb.api_key_envvar)
+    client = make_ai_client(ai_cfg)
+    rc = cfg.ai.response_cache
+    if rc.enabled:
+        ttl = parse_cache_setting(rc.ttl)[1] if rc.ttl is not None else None
+        cache = ResponseCache(resolve_temp_dir(cfg) / 'kb' / 'responses', max_bytes=rc.max_mb * 1024 * 1024, ttl=ttl)
+        client = CachingAIClient(client, cache, provider=cfg.ai.provider)
+    return client
+
+
+def client_stats(client) -> Dict[str, Any]:
+    """Counters of the wrapping layers around an AI client (cache hits, coalesced calls...)."""
+    stats: Dict[str, Any] = {}
+    while client is not None:
+        if isinstance(client, CachingAIClient):
+            stats.update({'response_cache_hits': client.cache.hits, 'response_cache_misses': client.cache.misses,
+                          'response_cache_evicted': client.cache.evicted})
+        elif isinstance(client, CoalescingAIClient):
+            stats.update({'provider_calls': client.stats['calls'], 'coalesced': client.stats['collapsed']})
+        elif isinstance(client, HedgingAIClient):
+            stats.update({'hedged': client.stats['hedged'], 'hedge_wins': client.stats['hedge_wins'],
+                          'hedge_over_budget': client.stats['over_budget']})
+        elif isinstance(client, RateLimitedAIClient):
+            stats.update({'rate_limit_waits': client.limiter.waits,
+                          'rate_limit_waited_s': round(client.limiter.waited_s, 3)})
+        elif isinstance(client, MockProvider):
+            stats.update({f'mock_{k}': v for k, v in client.stats.items()})
+        elif isinstance(client, CassetteProvider):
+            stats.update({f'cassette_{k}': v for k, v in client.stats.items()})
+        client = getattr(client, 'inner', None)
+    return stats
+
+
+def concurrency_limiter_for(cfg):
+    """Process-wide adaptive limiter of ``cfg.ai``'s provider/model, or None when disabled."""
+    cc = cfg.ai.concurrency
+    if not cc.enabled:
+        return None
+    return limiter_for(f'{cfg.ai.provider}-{cfg.ai.model or "default"}', **cc.model_dump(exclude={'enabled'}))
+
+
+def dump_actions(cfg) -> List[Dict[str, Any]]:
     # Prefer Pydantic V2 `model_dump()` when available; fall back to `.dict()` for older versions
     def _dump(a):
         if hasattr(a, 'model_dump'):
@@ -51,22 +128,39 @@ def run_config(path: str, verbose: bool = False) -> Dict[str, Any]:
             return a.dict()
         return a
 
-    actions = [_dump(a) for a in cfg.workflow.actions]
-    start_all = time.time()
-    # capture per-action results so we can map them into template placeholders
-    logger.info({'event': 'workflow_start', 'actions': len(actions), 'verbose': verbose})
-    
-    # Pass verbose flag to execution context for more detailed logging
-    ctx.verbose = verbose
-    
-    action_results = execute_workflow(actions, ctx)
-    logger.info({'event': 'workflow_end', 'actions': len(action_results), 'verbose': verbose})
-    total_time = time.time() - start_all
+    return [_dump(a) for a in cfg.workflow.actions]
 
-    # render templates
-    outdir = Path(cfg.project.output_dir)
-    if not outdir.is_absolute():
-        outdir = (Path(cfg.project.base_dir) / outdir).resolve()
+
+def build_context(cfg, ai, outdir: Path) -> ExecutionContext:
+    """ExecutionContext wired to ``ai`` with assets under ``outdir`` and caches under temp_dir."""
+    ctx = ExecutionContext(max_workers=cfg.workflow.max_workers)
+    ctx.ai_client = ai
+    ctx.ai_provider = cfg.ai.provider
+    # populate context paths from configuration (normalize relative to base_dir)
+    # assets_dir -> output dir / assets
+    assets_dir = outdir / 'assets'
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    ctx.assets_dir = assets_dir
+    # kb_cache_dir -> project.temp_dir / kb
+    kb_cache = resolve_temp_dir(cfg) / 'kb'
+    kb_cache.mkdir(parents=True, exist_ok=True)
+    ctx.kb_cache_dir = kb_cache
+    ctx.result_cache = result_cache_for(cfg)
+    ctx.retry_policy = RetryPolicy(max_attempts=cfg.ai.retries, **cfg.ai.retry.model_dump())
+    ctx.concurrency_limiter = concurrency_limiter_for(cfg)
+    cw = cfg.workflow.code_workers
+    if cw.enabled:
+        ctx.code_pool = get_code_pool(size=cw.size, max_jobs=cw.max_jobs, max_memory_mb=cw.max_memory_mb)
+    return ctx
+
+
+def render_templates(cfg, ctx: ExecutionContext, action_results: Dict[str, Any], outdir: Path,
+                     template_data: Optional[Dict[str, bytes]] = None) -> Dict[str, bool]:
+    """Render every configured template with ``ctx.global_vars`` into ``outdir``.
+
+    ``template_data`` maps template paths to their preloaded bytes so batch
+    runs read each template from disk only once.
+    """
     outdir.mkdir(parents=True, exist_ok=True)
 
     # Before rendering templates, materialize placeholder_map entries pointing
@@ -86,16 +180,59 @@ def run_config(path: str, verbose: bool = False) -> Dict[str, Any]:
     results = {}
     for t in cfg.workflow.templates:
         adapter_cls = ADAPTERS.get(t.adapter if hasattr(t, 'adapter') else t['adapter'])
-        template_path = Path(t.path) if hasattr(t, 'path') else Path(t['path'])
-        if not template_path.is_absolute():
-            template_path = (Path(cfg.project.base_dir) / template_path).resolve()
+        template_path = template_path_for(cfg, t)
         out_name = template_path.name.replace('_template', '')
         out_path = outdir / out_name
         if adapter_cls:
-            adapter = adapter_cls(str(template_path))
+            adapter = adapter_cls(str(template_path), data=(template_data or {}).get(str(template_path)))
             adapter.apply(mapping=ctx.global_vars, global_vars=ctx.global_vars)
             adapter.save(str(out_path))
             results[str(out_path)] = True
+    return results
+
+
+def template_path_for(cfg, t) -> Path:
+    template_path = Path(t.path) if hasattr(t, 'path') else Path(t['path'])
+    if not template_path.is_absolute():
+        template_path = (Path(cfg.project.base_dir) / template_path).resolve()
+    return template_path
+
+
+def run_config(path: str, verbose: bool = False, incremental: bool = False) -> Dict[str, Any]:
+    cfg = load_config(path)
+    
+    # Configure logging level - use DEBUG if verbose
+    log_level = 'DEBUG' if verbose else (cfg.project.log_level or 'INFO')
+    reconfigure_log_level(log_level)
+    logger.info({'event': 'log_level_configured', 'level': log_level, 'verbose': verbose})
+    ai = make_client_for(cfg)
+    outdir = resolve_output_dir(cfg)
+    ctx = build_context(cfg, ai, outdir)
+    # the dependency graph is recorded on every run so a later --incremental run can use it
+    ctx.dep_graph = DependencyGraph(resolve_temp_dir(cfg) / 'incremental' / 'graph.json')
+    ctx.incremental = incremental
+
+    # execute workflow
+    actions = dump_actions(cfg)
+    start_all = time.time()
+    # capture per-action results so we can map them into template placeholders
+    logger.info({'event': 'workflow_start', 'actions': len(actions), 'verbose': verbose})
+    
+    # Pass verbose flag to execution context for more detailed logging
+    ctx.verbose = verbose
+    
+    action_results = execute_workflow(actions, ctx)
+    ctx.dep_graph.save()
+    logger.info({'event': 'workflow_end', 'actions': len(action_results), 'verbose': verbose,
+                 'cache_hits': ctx.result_cache.hits, 'cache_misses': ctx.result_cache.misses,
+                 'incremental': incremental, 'reused': ctx.dep_graph.reused, 'executed': ctx.dep_graph.executed})
+    logger.info({'event': 'ai_client_stats', **client_stats(ai)})
+    if ctx.concurrency_limiter is not None:
+        logger.info({'event': 'ai_concurrency', **ctx.concurrency_limiter.stats()})
+    total_time = time.time() - start_all
+
+    # render templates
+    results = render_templates(cfg, ctx, action_results, outdir)
 
     # telemetry summary
     summary = {'total_time_s': total_time, 'files': list(results.keys()), 'actions': getattr(ctx, 'telemetry', {})}
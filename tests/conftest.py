@@ -1,3 +1,4 @@
+import json
 import sys
 from pathlib import Path
 import pytest
@@ -11,3 +12,85 @@ sys.path.insert(0, str(SRC))
 def cwd_tmp_path(tmp_path, monkeypatch):
     monkeypatch.chdir(tmp_path)
     return tmp_path
+
+
+# -- knowledge-base fixtures shared by the KB tests ---------------------------
+
+@pytest.fixture
+def make_pdf():
+    """Factory writing a PDF with one ``'<name> page <n>'`` line per page (plus a plot with ``points``)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    def _pdf(path, name, pages, points=0):
+        with PdfPages(path) as pdf:
+            for page in range(pages):
+                fig = plt.figure()
+                fig.text(0.1, 0.5, f'{name} page {page}')
+                if points:
+                    plt.plot(np.random.default_rng(page).random(points))
+                pdf.savefig(fig)
+                plt.close(fig)
+        return path
+    return _pdf
+
+
+@pytest.fixture
+def text_kb(tmp_path):
+    """``kb/`` directory with three short documents on different topics."""
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'python.md').write_text('Python is a programming language. Install Python with the installer.')
+    (kb / 'garden.txt').write_text('Tomatoes need sun and water. Prune the tomatoes weekly.')
+    (kb / 'cooking.md').write_text('Boil water, add salt, then cook the pasta.')
+    return kb
+
+
+@pytest.fixture
+def mixed_kb_files(tmp_path, make_pdf):
+    """Sorted KB files: text, multi-page PDFs, unsupported, empty and broken ones."""
+    (tmp_path / 'a.md').write_text('alpha ' * 20)
+    make_pdf(tmp_path / 'b.pdf', 'bravo', 4)
+    (tmp_path / 'c.bin').write_bytes(b'\x00')
+    (tmp_path / 'd.md').write_text('')
+    (tmp_path / 'e.json').write_text(json.dumps({'echo': 'x' * 50}))
+    (tmp_path / 'f.pdf').write_bytes(b'not a pdf')
+    make_pdf(tmp_path / 'g.pdf', 'golf', 2)
+    return sorted(p for p in tmp_path.iterdir() if p.is_file())
+
+
+@pytest.fixture
+def pdf_kb_files(tmp_path, make_pdf):
+    """Interleaved PDFs (3, 1 and 5 pages) and notes, with a broken PDF at index 3."""
+    files = []
+    for i, pages in enumerate((3, 1, 5)):
+        files.append(make_pdf(tmp_path / f'doc{i}.pdf', f'doc{i}', pages))
+        (tmp_path / f'note{i}.md').write_text(f'note {i}')
+        files.append(tmp_path / f'note{i}.md')
+    (tmp_path / 'broken.pdf').write_bytes(b'not a pdf')
+    return files[:3] + [tmp_path / 'broken.pdf'] + files[3:]
+
+
+@pytest.fixture
+def counting_extract(monkeypatch):
+    """Names of the files passed to ``loader.extract_text``, in call order."""
+    from docflow.kb import loader
+
+    calls = []
+    original = loader.extract_text
+    monkeypatch.setattr(loader, 'extract_text', lambda f: calls.append(f.name) or original(f))
+    return calls
+
+
+@pytest.fixture
+def counting_segments(monkeypatch):
+    """First six characters of every text ``bm25._segment`` indexes."""
+    from docflow.kb import bm25
+
+    calls = []
+    original = bm25._segment
+    monkeypatch.setattr(bm25, '_segment', lambda text, *a: calls.append(text[:6]) or original(text, *a))
+    return calls
@@ -0,0 +1,125 @@
+import time
+from pathlib import Path
+import pytest
+from docflow.core.cache import ActionCache, action_cache_key, parse_cache_setting
+from docflow.core.context import ExecutionContext
+from docflow.core.results import ActionResult
+from docflow.core.workflow import execute_workflow
+from docflow.ai.providers.mock import MockProvider
+
+
+class CountingProvider(MockProvider):
+    def __init__(self):
+        super().__init__(model='count-1')
+        self.calls = 0
+
+    def generate_text(self, prompt, **kwargs):
+        self.calls += 1
+        return super().generate_text(prompt, **kwargs)
+
+
+def _ctx(tmp_path, provider):
+    ctx = ExecutionContext(global_vars={'name': 'Ada'}, assets_dir=tmp_path / 'assets')
+    ctx.ai_client = provider
+    ctx.result_cache = ActionCache(tmp_path / 'cache')
+    return ctx
+
+
+def test_parse_cache_setting():
+    assert parse_cache_setting(False) == (False, None)
+    assert parse_cache_setting(True) == (True, None)
+    assert parse_cache_setting(90) == (True, 90.0)
+    assert parse_cache_setting('2h') == (True, 7200.0)
+    with pytest.raises(ValueError):
+        parse_cache_setting('soon')
+
+
+def test_cached_action_is_not_reexecuted(tmp_path):
+    provider = CountingProvider()
+    actions = [{'id': 'g', 'type': 'generative', 'prompt': 'hi {{name}}', 'cache': True}]
+    first = execute_workflow(actions, _ctx(tmp_path, provider))
+    second = execute_workflow(actions, _ctx(tmp_path, provider))
+    assert provider.calls == 1
+    assert second['g'].data == first['g'].data
+    assert second['g'].meta['cache'] == 'hit'
+
+
+def test_cache_key_tracks_inputs_and_kb_files(tmp_path):
+    kb = tmp_path / 'kb.md'
+    kb.write_text('v1')
+    ad = {'id': 'g', 'type': 'generative', 'prompt': 'hi {{name}}',
+          'kb': {'enabled': True, 'paths': [str(kb)]}}
+    ctx = _ctx(tmp_path, MockProvider())
+    k1 = action_cache_key(ad, ctx)
+    assert action_cache_key(ad, ctx) == k1
+    ctx.global_vars['name'] = 'Grace'
+    k2 = action_cache_key(ad, ctx)
+    assert k2 != k1
+    kb.write_text('version two')
+    assert action_cache_key(ad, ctx) != k2
+    ctx.ai_client = MockProvider(model='other')
+    assert action_cache_key(ad, ctx) != k2
+
+
+def test_cache_key_sees_the_provider_behind_wrappers(tmp_path, monkeypatch):
+    from docflow.ai.coalesce import CoalescingAIClient
+    from docflow.ai.providers.openai import OpenAIProvider
+
+    ad = {'id': 'g', 'type': 'generative', 'prompt': 'hi'}
+    ctx = _ctx(tmp_path, CoalescingAIClient(MockProvider(model='m')))
+    mock_key = action_cache_key(ad, ctx)
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    ctx.ai_client = CoalescingAIClient(OpenAIProvider(model='m'))
+    assert action_cache_key(ad, ctx) != mock_key
+    ctx.ai_client = CoalescingAIClient(MockProvider(model='m'))
+    ctx.ai_provider = 'cassette'
+    assert action_cache_key(ad, ctx) != mock_key
+
+
+def test_disabled_and_expired_entries_miss(tmp_path):
+    provider = CountingProvider()
+    execute_workflow([{'id': 'g', 'type': 'generative', 'prompt': 'x'}], _ctx(tmp_path, provider))
+    execute_workflow([{'id': 'g', 'type': 'generative', 'prompt': 'x'}], _ctx(tmp_path, provider))
+    assert provider.calls == 2
+
+    cache = ActionCache(tmp_path / 'c2')
+    cache.put('ab' * 32, 'g', ActionResult(kind='bytes', data=b'\x00\x01', vars={'raw': b'\x02'}))
+    hit = cache.get('ab' * 32)
+    assert hit.data == b'\x00\x01' and hit.vars['raw'] == b'\x02'
+    time.sleep(0.05)
+    assert cache.get('ab' * 32, ttl=0.01) is None
+    assert cache.purge(action_id='g') == 1
+    assert cache.entries() == []
+
+
+def test_cli_cache_info_and_purge(tmp_path, capsys):
+    import yaml
+    from docflow.cli import cache_info, cache_purge
+    from docflow.runtime.orchestrator import result_cache_for
+    from docflow.config import load_config
+
+    cfg_path = tmp_path / 'cfg.yaml'
+    cfg_path.write_text(yaml.safe_dump({
+        'project': {'base_dir': str(tmp_path)},
+        'ai': {'provider': 'mock'},
+        'workflow': {'actions': [{'id': 'g', 'type': 'generative', 'cache': '1d'}], 'templates': []},
+    }))
+    cache = result_cache_for(load_config(str(cfg_path)))
+    cache.put('cd' * 32, 'g', ActionResult(kind='text', data='x'))
+    cache_info(str(cfg_path))
+    assert '1 entries' in capsys.readouterr().out
+    cache_purge(str(cfg_path), action=None, older_than=None)
+    assert 'Removed 1 entries' in capsys.readouterr().out
+    assert not list(Path(cache.root).glob('*/*.json'))
+
+
+@pytest.mark.parametrize('strategy', ['bm25', 'vector'])
+def test_cache_key_tracks_the_rendered_kb_query(tmp_path, strategy):
+    (tmp_path / 'kb.md').write_text('facts')
+    ad = {'id': 'g', 'type': 'generative', 'prompt': 'Answer using {{kb}}',
+          'kb': {'enabled': True, 'paths': [str(tmp_path / 'kb.md')], 'strategy': strategy, 'query': '{{topic}}'}}
+    ctx = _ctx(tmp_path, MockProvider())
+    ctx.global_vars['topic'] = 'x'
+    k1 = action_cache_key(ad, ctx)
+    ctx.global_vars['topic'] = 'y'
+    assert action_cache_key(ad, ctx) != k1
@@ -24,6 +24,15 @@ def test_generative_image_mode(tmp_path):
     assert out.vars.get('hero_path') == str(p)
 
 
+def test_generated_image_paths_are_unique_per_action_and_call(tmp_path):
+    ctx = ExecutionContext(assets_dir=str(tmp_path))
+    hero = GenerativeAction({'id': 'hero/1', 'mode': 'image'})
+    paths = {hero._image_path(ctx, {}) for _ in range(50)}
+    assert len(paths) == 50
+    assert all(p.parent == tmp_path and p.name.startswith('gen_image_hero_1_') for p in paths)
+    assert GenerativeAction({'id': 'logo', 'mode': 'image'})._image_path(ctx, {}).name.startswith('gen_image_logo_')
+
+
 def test_code_action_emits_vars_and_image(tmp_path):
     # code: create a matplotlib plot, save to a temp file, print its path, and emit VARS_JSON
     out_path = tmp_path / 'out.png'
@@ -40,7 +49,7 @@ print('VARS_JSON=' + json.dumps({{"plot_ready": True}}))
 print(fpath)
 '''
 
-    cfg = {'code': code, 'returns': 'image', 'timeout': 5}
+    cfg = {'code': code, 'returns': 'image', 'timeout': 5, 'legacy_stdout': True}
     ca = CodeAction(cfg)
     ctx = ExecutionContext()
     out = ca.execute(ctx)
@@ -32,7 +32,8 @@ def test_generate_image_success(monkeypatch):
     Tests the successful generation of an image.
     """
     monkeypatch.setattr("docflow.ai.providers.openai.OpenAI", MockOpenAIClient)
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    # downloads go through the shared keep-alive session
+    monkeypatch.setattr(requests.Session, "get", lambda self, *a, **k: mock_requests_get(*a, **k))
 
     provider = OpenAIProvider(api_key="fake_key")
     result = provider.generate_image("a test prompt")
@@ -69,7 +70,7 @@ def test_generate_image_download_error(monkeypatch):
         raise requests.exceptions.RequestException("Download Failed")
 
     monkeypatch.setattr("docflow.ai.providers.openai.OpenAI", MockOpenAIClient)
-    monkeypatch.setattr(requests, "get", mock_requests_get_error)
+    monkeypatch.setattr(requests.Session, "get", lambda self, *a, **k: mock_requests_get_error(*a, **k))
 
     provider = OpenAIProvider(api_key="fake_key")
     result = provider.generate_image("a test prompt")
@@ -79,3 +80,29 @@ def test_generate_image_download_error(monkeypatch):
     assert "meta" in result
     assert "error" in result["meta"]
     assert "Failed to download image" in result["meta"]["error"]
+
+def test_agenerate_text_uses_async_client(monkeypatch):
+    """
+    Tests that the async text path goes through AsyncOpenAI.
+    """
+    import asyncio
+    from types import SimpleNamespace
+
+    class MockAsyncCompletions:
+        async def create(self, model, messages):
+            msg = SimpleNamespace(content="async " + messages[0]['content'])
+            return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+
+    class MockAsyncOpenAI:
+        def __init__(self, *args, **kwargs):
+            self.chat = SimpleNamespace(completions=MockAsyncCompletions())
+
+    monkeypatch.setattr("docflow.ai.providers.openai.OpenAI", MockOpenAIClient)
+    monkeypatch.setattr("docflow.ai.providers.openai.AsyncOpenAI", MockAsyncOpenAI)
+
+    provider = OpenAIProvider(api_key="fake_key")
+    result = asyncio.run(provider.agenerate_text("hello"))
+
+    assert result["text"] == "async hello"
+    assert result["meta"]["provider"] == "openai"
+    assert "error" not in result["meta"]
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from docflow.ai.client import AIClient
+from docflow.ai.providers.mock import MockProvider
+from docflow.core.context import ExecutionContext
+from docflow.core.workflow import aexecute_workflow
+
+
+class SleepyAsyncProvider(MockProvider):
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.peak = 0
+
+    async def agenerate_text(self, prompt, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.1)
+        self.in_flight -= 1
+        return {'text': f'ASYNC:{prompt}', 'meta': {'provider': 'mock'}}
+
+
+class SyncOnlyClient(AIClient):
+    def generate_text(self, prompt, **kwargs):
+        return {'text': f'SYNC:{prompt}', 'meta': {}}
+
+    def generate_image(self, prompt, **kwargs):
+        return {'image_bytes': b'', 'meta': {}}
+
+
+def test_aexecute_workflow_runs_independent_actions_concurrently():
+    provider = SleepyAsyncProvider()
+    ctx = ExecutionContext()
+    ctx.ai_client = provider
+    actions = [{'id': f'g{i}', 'type': 'generative', 'prompt': f'p{i}'} for i in range(20)]
+    actions.append({'id': 'final', 'type': 'generative', 'prompt': 'done', 'deps': [a['id'] for a in actions],
+                    'exports': [{'name': 'summary', 'source': 'result_text', 'jinja': '{{text}}'}]})
+    t0 = time.time()
+    mapping = asyncio.run(aexecute_workflow(actions, ctx))
+    elapsed = time.time() - t0
+    assert provider.peak == 20
+    assert elapsed < 1.0
+    assert list(mapping) == [a['id'] for a in actions]
+    assert ctx.global_vars['summary'] == 'ASYNC:done'
+
+
+def test_aexecute_workflow_respects_max_concurrency():
+    provider = SleepyAsyncProvider()
+    ctx = ExecutionContext()
+    ctx.ai_client = provider
+    actions = [{'id': f'g{i}', 'type': 'generative', 'prompt': f'p{i}'} for i in range(6)]
+    asyncio.run(aexecute_workflow(actions, ctx, max_concurrency=2))
+    assert provider.peak == 2
+
+
+def test_aexecute_workflow_falls_back_to_threads_for_sync_clients_and_code():
+    ctx = ExecutionContext()
+    ctx.ai_client = SyncOnlyClient()
+    actions = [
+        {'id': 'gen', 'type': 'generative', 'prompt': 'hello'},
+        {'id': 'code', 'type': 'code', 'deps': ['gen'],
+         'code': "def run(vars):\n    return {'vars': {'seen': vars.get('gen_seen', 'no')}, 'result_text': 'ok'}"},
+    ]
+    mapping = asyncio.run(aexecute_workflow(actions, ctx))
+    assert mapping['gen'].data == 'SYNC:hello'
+    assert mapping['code'].data == 'ok'
+    assert ctx.global_vars['seen'] == 'no'
+
+
+def test_default_async_client_methods_delegate_to_sync():
+    client = SyncOnlyClient()
+    out = asyncio.run(client.agenerate_text('x'))
+    assert out['text'] == 'SYNC:x'
+    ref = asyncio.run(MockProvider().aupload_file('a.pdf', mime_type='application/pdf'))
+    assert ref['id'] == 'mock://a.pdf'
@@ -0,0 +1,82 @@
+import json
+import yaml
+from pathlib import Path
+from docx import Document
+from docflow.runtime.batch import load_records, run_batch
+
+
+def _project(tmp_path: Path) -> Path:
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    doc = Document()
+    doc.add_paragraph('Cliente: {{customer}} - {{gen_intro}}')
+    doc.save(templates / 'report_template.docx')
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'policy.md').write_text('Shared policy text')
+    cfg = {
+        'project': {'base_dir': str(tmp_path), 'output_dir': 'out'},
+        'ai': {'provider': 'mock'},
+        'workflow': {
+            'actions': [{
+                'id': 'gen_intro', 'type': 'generative', 'prompt': 'Intro for {{customer}} {{kb}}',
+                'kb': {'enabled': True, 'paths': [str(kb / '*.md')], 'strategy': 'inline'},
+            }],
+            'templates': [{'path': 'templates/report_template.docx', 'adapter': 'docx',
+                           'placeholder_map': {'gen_intro': 'gen_intro'}}],
+        },
+    }
+    cfg_path = tmp_path / 'cfg.yaml'
+    cfg_path.write_text(yaml.safe_dump(cfg))
+    return cfg_path
+
+
+def test_load_records_jsonl_and_csv(tmp_path):
+    j = tmp_path / 'r.jsonl'
+    j.write_text('{"id": "a", "customer": "Acme"}\n\n{"id": "b", "customer": "Beta"}\n')
+    c = tmp_path / 'r.csv'
+    c.write_text('id,customer\na,Acme\nb,Beta\n')
+    assert load_records(str(j)) == load_records(str(c)) == [
+        {'id': 'a', 'customer': 'Acme'}, {'id': 'b', 'customer': 'Beta'}]
+
+
+def test_run_batch_writes_one_document_set_per_record(tmp_path, monkeypatch):
+    cfg_path = _project(tmp_path)
+    from docflow.kb import strategies
+    calls = []
+    original = strategies.kb_strategy_processor.process_kb
+    monkeypatch.setattr(strategies.kb_strategy_processor, 'process_kb',
+                        lambda cfg, vars: calls.append(1) or original(cfg, vars))
+
+    records = [{'id': f'cust/{i}', 'customer': f'Customer {i}'} for i in range(6)]
+    report = run_batch(str(cfg_path), records, workers=3)
+
+    assert report.succeeded == 6 and report.failed == 0
+    assert report.throughput > 0
+    assert len(calls) == 1  # KB extracted once for the whole batch
+    out = tmp_path / 'out' / 'cust_3' / 'report.docx'
+    assert out.exists()
+    text = '\n'.join(p.text for p in Document(out).paragraphs)
+    assert 'Customer 3' in text
+    assert report.summary()['latency_p95_s'] >= report.summary()['latency_p50_s']
+
+
+def test_batch_cli_reports_failures(tmp_path):
+    import pytest
+    import typer
+    from docflow.cli import batch
+
+    cfg_path = _project(tmp_path)
+    data = yaml.safe_load(cfg_path.read_text())
+    data['workflow']['actions'].append({'id': 'boom', 'type': 'generative', 'prompt': 'x',
+                                        'exports': [{'name': 'bad', 'jinja': '{{ vars.customer.missing() }}'}]})
+    cfg_path.write_text(yaml.safe_dump(data))
+    records = tmp_path / 'r.jsonl'
+    records.write_text(json.dumps({'id': 'x', 'customer': 'X'}) + '\n')
+    report = tmp_path / 'report.json'
+    with pytest.raises(typer.Exit):
+        batch(str(cfg_path), input_path=str(records), workers=1, mode='thread', id_field='id',
+              report=str(report), verbose=False)
+    saved = json.loads(report.read_text())
+    assert saved['summary']['failed'] == 1
+    assert saved['records'][0]['error']
@@ -0,0 +1,90 @@
+import pytest
+import yaml
+from pathlib import Path
+from docx import Document
+from docflow.ai.batch_jobs import COMPLETED, IN_PROGRESS, DeferringAIClient
+from docflow.ai.providers.mock import MockBatchBackend, MockProvider
+from docflow.errors import RequestDeferred
+from docflow.runtime.batch import run_batch
+
+
+def _project(tmp_path: Path) -> Path:
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    doc = Document()
+    doc.add_paragraph('{{summary}}')
+    doc.save(templates / 'report_template.docx')
+    cfg = {
+        'project': {'base_dir': str(tmp_path), 'output_dir': 'out'},
+        'ai': {'provider': 'mock'},
+        'workflow': {
+            'actions': [
+                {'id': 'intro', 'type': 'generative', 'prompt': 'Intro for {{customer}}',
+                 'exports': [{'name': 'intro_text', 'jinja': '{{ text }}'}]},
+                {'id': 'summary', 'type': 'generative', 'deps': ['intro'], 'prompt': 'Summarize: {{intro_text}}'},
+            ],
+            'templates': [{'path': 'templates/report_template.docx', 'adapter': 'docx',
+                           'placeholder_map': {'summary': 'summary'}}],
+        },
+    }
+    cfg_path = tmp_path / 'cfg.yaml'
+    cfg_path.write_text(yaml.safe_dump(cfg))
+    return cfg_path
+
+
+def test_mock_backend_processes_job_files(tmp_path):
+    backend = MockBatchBackend(tmp_path, complete_after_s=0.2)
+    job = backend.submit([{'custom_id': 'a', 'method': 'generate_text', 'prompt': 'hi', 'kwargs': {}},
+                          {'custom_id': 'b', 'method': 'generate_image', 'prompt': 'cat', 'kwargs': {}}])
+    assert (tmp_path / job / 'input.jsonl').read_text().count('\n') == 2
+    assert backend.status(job) == IN_PROGRESS
+    assert not (tmp_path / job / 'output.jsonl').exists()
+    backend.complete_after_s = 0
+    assert backend.status(job) == COMPLETED
+    results = backend.results(job)
+    assert results['a']['text'] == 'MOCK_TEXT:hi'
+    assert results['b']['image_bytes'].startswith(b'\x89PNG')
+
+
+def test_deferring_client_queues_then_answers():
+    client = DeferringAIClient(MockProvider())
+    with pytest.raises(RequestDeferred):
+        client.generate_text('hello')
+    with pytest.raises(RequestDeferred):
+        client.generate_text('hello')
+    (req,) = client.take_pending()
+    assert req['prompt'] == 'hello' and client.take_pending() == []
+    client.add_answers({req['custom_id']: {'text': 'hi there', 'meta': {}}})
+    assert client.generate_text('hello')['text'] == 'hi there'
+    client.add_answers({req['custom_id']: {'error': 'quota'}})
+    with pytest.raises(RuntimeError, match='quota'):
+        client.generate_text('hello')
+
+
+def test_offline_batch_runs_in_rounds(tmp_path, monkeypatch):
+    cfg_path = _project(tmp_path)
+    submitted = []
+    original = MockBatchBackend.submit
+    monkeypatch.setattr(MockBatchBackend, 'submit', lambda self, reqs: submitted.append(len(reqs)) or original(self, reqs))
+    calls = []
+    monkeypatch.setattr(MockProvider, 'generate_text',
+                        lambda self, prompt, **kw: calls.append(prompt) or {'text': f'<{prompt}>', 'meta': {}})
+
+    records = [{'id': f'c{i}', 'customer': f'Customer {i}'} for i in range(4)]
+    report = run_batch(str(cfg_path), records, workers=2, offline=True, poll_interval_s=0.01)
+
+    assert report.succeeded == 4 and report.failed == 0
+    # one job per generative level, each holding every record's request
+    assert submitted == [4, 4] and len(calls) == 8
+    assert len(list((tmp_path / 'build' / 'tmp' / 'batch_jobs').iterdir())) == 2
+    text = '\n'.join(p.text for p in Document(tmp_path / 'out' / 'c2' / 'report.docx').paragraphs)
+    assert text == '<Summarize: <Intro for Customer 2>>'
+
+
+def test_offline_batch_needs_a_batch_backend(tmp_path, monkeypatch):
+    cfg_path = _project(tmp_path)
+    monkeypatch.setattr(MockProvider, 'batch_backend', lambda self, root: None)
+    with pytest.raises(ValueError, match='no batch API'):
+        run_batch(str(cfg_path), [{'id': 'a', 'customer': 'A'}], offline=True)
+    with pytest.raises(ValueError, match="mode='thread'"):
+        run_batch(str(cfg_path), [{'id': 'a', 'customer': 'A'}], mode='process', offline=True)
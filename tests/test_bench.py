@@ -0,0 +1,84 @@
+import asyncio
+import io
+import statistics
+import threading
+import time
+import pytest
+from PIL import Image
+from typer.testing import CliRunner
+from docflow.ai.factory import make_ai_client
+from docflow.ai.providers.mock import MockProvider, MockProviderError, MockRateLimitError
+from docflow.ai.retry import RATE_LIMIT, TRANSIENT, classify_error
+from docflow.cli import app
+from docflow.runtime.bench import run_bench
+
+
+def test_latency_distributions():
+    fixed = MockProvider(latency='fixed', latency_s=0.05)
+    t0 = time.monotonic()
+    fixed.generate_text('hi')
+    assert time.monotonic() - t0 >= 0.05
+
+    normal = MockProvider(latency='normal', latency_s=1.0, latency_jitter_s=0.1, seed=1)
+    draws = [normal._draw_latency() for _ in range(2000)]
+    assert abs(statistics.mean(draws) - 1.0) < 0.02 and 0.08 < statistics.stdev(draws) < 0.12
+
+    tail = MockProvider(latency='longtail', latency_s=1.0, tail_sigma=1.0, seed=1)
+    draws = sorted(tail._draw_latency() for _ in range(2000))
+    assert 0.9 < draws[1000] < 1.1 and draws[1980] > 8  # p99 of lognormal(0, 1) is ~10x the median
+    a, b = (MockProvider(latency='normal', latency_s=1, latency_jitter_s=1, seed=7) for _ in range(2))
+    assert [a._draw_latency() for _ in range(3)] == [b._draw_latency() for _ in range(3)]
+    with pytest.raises(ValueError):
+        MockProvider(latency='uniform')
+
+
+def test_errors_and_throttling_are_classified():
+    with pytest.raises(MockProviderError) as exc:
+        MockProvider(error_rate=1.0).generate_text('hi')
+    assert classify_error(exc.value) == TRANSIENT
+    with pytest.raises(MockRateLimitError) as exc:
+        asyncio.run(MockProvider(throttle_rate=1.0).agenerate_text('hi'))
+    assert classify_error(exc.value) == RATE_LIMIT
+
+    provider = MockProvider(latency='fixed', latency_s=0.2, max_concurrency=2)
+    outcomes = []
+
+    def call():
+        try:
+            provider.generate_text('hi')
+            outcomes.append('ok')
+        except MockRateLimitError:
+            outcomes.append('429')
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(outcomes) == ['429'] * 3 + ['ok'] * 2
+    assert provider.stats == {'calls': 5, 'errors': 0, 'throttled': 3}
+
+
+def test_output_sizes():
+    provider = make_ai_client({'provider': 'mock', 'mock': {'output_chars': 5000, 'image_px': 256, 'seed': 3}})
+    assert len(provider.generate_text('hi')['text']) == 5000
+    png = provider.generate_image('cat')['image_bytes']
+    assert Image.open(io.BytesIO(png)).size == (256, 256) and len(png) > 256 * 256
+    assert len(MockProvider().generate_text('hi')['text']) == len('MOCK_TEXT:hi')
+
+
+def test_bench_runs_synthetic_workflows(tmp_path):
+    rep = run_bench(workflows=6, concurrency=3, mock={'latency': 'fixed', 'latency_s': 0.05}, work_dir=str(tmp_path))
+    summary = rep.summary()
+    assert summary['succeeded'] == 6 and summary['failed'] == 0
+    # two chained text calls and an image per workflow
+    assert summary['mock_calls'] == 18
+    assert summary['latency_p99_s'] >= 0.1 and summary['throughput_wps'] > 0
+    assert summary['cpu_user_s'] >= 0 and summary['peak_rss_mb'] > 0
+    assert len(list((tmp_path / 'out').glob('*/bench.docx'))) == 6
+
+
+def test_bench_cli(tmp_path):
+    result = CliRunner().invoke(app, ['bench', '-n', '2', '-c', '2', '--latency', 'none', '--work-dir', str(tmp_path),
+                                      '--report', str(tmp_path / 'bench.json')])
+    assert result.exit_code == 0, result.output
+    assert 'throughput_wps' in result.output and (tmp_path / 'bench.json').exists()
@@ -0,0 +1,101 @@
+import os
+import time
+import numpy as np
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+from docflow.kb import bm25
+from docflow.kb.strategies import kb_strategy_processor
+
+
+def test_ranking_and_top_k(text_kb):
+    kb = text_kb
+    index = bm25.bm25_index(sorted(kb.iterdir()), chunk_size=60, overlap=0)
+    hits = index.search('how to prune tomatoes', top_k=2)
+    assert index.source(hits[0][1]).endswith('garden.txt')
+    assert 'Prune' in index.chunk(hits[0][1])
+    assert len(hits) <= 2 and hits == sorted(hits, reverse=True)
+    assert index.search('water', top_k=5) and index.search('quantum chromodynamics') == []
+
+
+def test_strategy_packs_hits_within_max_chars(tmp_path, text_kb):
+    kb = text_kb
+    cfg = {'enabled': True, 'paths': [str(kb / '*')], 'strategy': 'bm25', 'query': '{{ topic }} tomatoes',
+           'top_k': 3, 'chunk_size': 40, 'chunk_overlap': 0, 'max_chars': 90}
+    result = kb_strategy_processor.process_kb(cfg, {'topic': 'prune', '_kb_cache_dir': tmp_path / 'cache'})
+    assert 'Prune' in result['kb_text']
+    assert len(result['kb_text']) <= 90
+    assert 'pasta' not in result['kb_text']
+    assert kb_strategy_processor.process_kb({**cfg, 'query': '{{ missing }}'}, {}) == {}
+
+
+def test_index_persists_and_rebuilds_only_changed_files(tmp_path, text_kb, counting_segments):
+    calls = counting_segments
+    kb = text_kb
+    files = sorted(kb.iterdir())
+    index_dir = tmp_path / 'cache' / 'bm25'
+    first = bm25.bm25_index(files, index_dir)
+    assert len(calls) == 3
+
+    # a later run (empty process memo) loads the saved build
+    bm25._loaded.clear()
+    again = bm25.bm25_index(files, index_dir)
+    assert len(calls) == 3 and len(again) == len(first)
+    assert again.search('pasta')[0][1] == first.search('pasta')[0][1]
+
+    (kb / 'cooking.md').write_text('Knead the dough, then bake the bread.')
+    os.utime(kb / 'cooking.md', ns=(1, 1))
+    changed = bm25.bm25_index(files, index_dir)
+    assert calls[3:] == ['Knead ']
+    assert changed.search('pasta') == [] and changed.search('bread')
+
+    # removed files drop out, along with their segments and the old builds
+    changed = bm25.bm25_index(files[1:], index_dir)
+    assert len(calls) == 4 and changed.search('bread') == []
+    assert len(list(index_dir.glob('segments/*/*.npz'))) == 2
+    assert len(list(index_dir.glob('index-*.npz'))) == 1
+
+
+def test_long_tokens_do_not_inflate_the_vocab(tmp_path):
+    junk = 'QmFzZTY0' * 6250  # one 50k-character "word", e.g. base64 from a PDF
+    words = ' '.join(f'term{i}' for i in range(2000))
+    (tmp_path / 'doc.txt').write_text(f'{words} {junk} tomatoes')
+    assert bm25.tokenize('a ' + 'x' * 64 + ' ' + 'y' * 65 + ' ok') == ['x' * 64, 'ok']
+    index_dir = tmp_path / 'idx'
+    index = bm25.bm25_index([tmp_path / 'doc.txt'], index_dir)
+    # only chunk-boundary fragments of the junk survive, none over the cap
+    assert len(index.vocab) < 2100 and max(map(len, index.vocab)) <= 64 and index.search('tomatoes')
+    # terms cost their own length on disk, not that of the longest one
+    for data in [np.load(p) for p in index_dir.glob('**/*.npz')]:
+        key = 'vocab' if 'vocab' in data else 'terms'
+        assert data[key].nbytes < 20000
+
+
+def test_action_renders_query_and_keeps_index_under_kb_cache_dir(tmp_path, text_kb):
+    kb = text_kb
+    ctx = ExecutionContext(assets_dir=str(tmp_path), kb_cache_dir=tmp_path / 'kbcache', global_vars={'q': 'pasta'})
+    cfg = {'enabled': True, 'paths': [str(kb / '*')], 'strategy': 'bm25', 'query': 'cook {{ q }}', 'top_k': 1}
+    res = GenerativeAction({'id': 'g', 'prompt': 'KB: {{kb}}', 'kb': cfg}).execute(ctx)
+    assert 'cook the pasta' in res.data
+    assert list((tmp_path / 'kbcache' / 'bm25').glob('*/manifest.json'))
+    ctx.global_vars['q'] = 'tomatoes'
+    res = GenerativeAction({'id': 'g2', 'prompt': 'KB: {{kb}}', 'kb': cfg}).execute(ctx)
+    assert 'omatoes' in res.data and 'pasta' not in res.data
+
+
+def test_lookup_on_a_large_index_is_fast():
+    rng = np.random.default_rng(0)
+    words = np.array([f'w{i}' for i in range(20000)])
+    segments = []
+    for _ in range(20):
+        # 5000 chunks of 40 Zipf-distributed words per segment
+        ids = np.minimum(rng.zipf(1.2, size=(5000, 40)), len(words)) - 1
+        text = '\n'.join(' '.join(row) for row in words[ids])
+        segments.append(bm25._segment(text, 200, 0))
+    arrays, text = bm25._merge(segments)
+    index = bm25.BM25Index(arrays, text, [f'f{i}' for i in range(20)])
+    assert len(index) > 50000
+    index.search('w1 w50 w300', top_k=10)
+    t0 = time.perf_counter()
+    for q in ('w1 w50 w300', 'w7 w8', 'w2 w3 w4 w5 w1000'):
+        assert len(index.search(q, top_k=10)) == 10
+    assert (time.perf_counter() - t0) / 3 < 0.05
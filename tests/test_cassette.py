@@ -0,0 +1,95 @@
+import asyncio
+import json
+import pytest
+import yaml
+from docx import Document
+from docflow.ai.factory import make_ai_client
+from docflow.ai.providers.cassette import CassetteProvider
+from docflow.ai.providers.mock import MockProvider
+from docflow.errors import CassetteMiss
+from docflow.runtime.orchestrator import run_config
+
+
+class FileRef:
+    def __init__(self, name):
+        self.name = name
+
+
+class RefProvider(MockProvider):
+    """Mock whose uploads return SDK-like objects, like Gemini's."""
+
+    def upload_file(self, path, mime_type=None):
+        return FileRef(f'files/{path.rsplit("/", 1)[-1]}')
+
+    def file_ref_to_json(self, ref):
+        return {'name': ref.name}
+
+    def generate_text(self, prompt, **kwargs):
+        names = [a.name for a in kwargs.get('attachments') or []]
+        return {'text': f'{prompt} with {names}', 'meta': {'provider': 'mock', 'latency': 1.5}}
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / 'c.jsonl'
+    kb = tmp_path / 'kb.txt'
+    kb.write_text('facts')
+    rec = CassetteProvider(path, mode='record', inner=RefProvider())
+    ref = rec.upload_file(str(kb), 'text/plain')
+    text = rec.generate_text('hi', attachments=[ref], temperature=0.2)['text']
+    image = rec.generate_image('cat')['image_bytes']
+    rec.generate_text('hi', attachments=[ref], temperature=0.2)
+    assert rec.stats['recorded'] == 3
+    assert len(path.read_text().splitlines()) == 3
+
+    play = CassetteProvider(path)
+    replayed_ref = play.upload_file(str(kb), 'text/plain')
+    assert replayed_ref == {'name': 'files/kb.txt'}
+    out = play.generate_text('hi', attachments=[replayed_ref], temperature=0.2)
+    assert out['text'] == text and out['meta']['cassette'] == 'replay'
+    assert out['meta']['recorded_latency'] == 1.5 and out['meta']['latency'] < 0.1
+    assert play.generate_image('cat')['image_bytes'] == image
+    assert list(play.stream_text('hi', attachments=[replayed_ref], temperature=0.2)) == [text]
+    assert asyncio.run(play.agenerate_text('hi', attachments=[replayed_ref], temperature=0.2))['text'] == text
+    with pytest.raises(CassetteMiss):
+        play.generate_text('hi', temperature=0.9)
+    assert play.stats == {'recorded': 0, 'replayed': 5, 'missed': 1}
+
+
+def test_replay_needs_a_cassette(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        make_ai_client({'provider': 'cassette', 'cassette': {'path': tmp_path / 'none.jsonl'}})
+    with pytest.raises(ValueError):
+        CassetteProvider(tmp_path / 'c.jsonl', mode='record')
+
+
+def test_workflow_replays_without_the_provider(tmp_path, monkeypatch):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    doc = Document()
+    doc.add_paragraph('{{summary}}')
+    doc.save(templates / 'report_template.docx')
+    cfg = {
+        'project': {'base_dir': str(tmp_path), 'output_dir': 'out'},
+        'ai': {'provider': 'cassette', 'cassette': {'path': 'cassettes/run.jsonl', 'mode': 'record'}},
+        'workflow': {
+            'actions': [{'id': 'summary', 'type': 'generative', 'prompt': 'Summarize the quarter'}],
+            'templates': [{'path': 'templates/report_template.docx', 'adapter': 'docx',
+                           'placeholder_map': {'summary': 'summary'}}],
+        },
+    }
+    cfg_path = tmp_path / 'cfg.yaml'
+    cfg_path.write_text(yaml.safe_dump(cfg))
+    run_config(str(cfg_path))
+    lines = (tmp_path / 'cassettes' / 'run.jsonl').read_text().splitlines()
+    assert [json.loads(line)['method'] for line in lines] == ['generate_text']
+
+    cfg['ai']['cassette']['mode'] = 'replay'
+    cfg['project']['output_dir'] = 'out2'
+    cfg_path.write_text(yaml.safe_dump(cfg))
+
+    def offline(self, prompt, **kwargs):
+        raise AssertionError('the provider must not be called on replay')
+    monkeypatch.setattr(MockProvider, 'generate_text', offline)
+    run_config(str(cfg_path))
+    texts = ['\n'.join(p.text for p in Document(tmp_path / out / 'report.docx').paragraphs) for out in ('out', 'out2')]
+    assert texts[0] == texts[1] == 'MOCK_TEXT:Summarize the quarter'
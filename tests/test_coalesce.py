@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+import pytest
+from docflow.ai.coalesce import CoalescingAIClient
+from docflow.ai.factory import make_ai_client
+from docflow.ai.providers.mock import MockProvider
+
+
+class SlowProvider(MockProvider):
+    def __init__(self, fail=False):
+        super().__init__(model='slow-1')
+        self.calls = 0
+        self.fail = fail
+
+    def generate_text(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(0.2)
+        if self.fail:
+            raise RuntimeError('provider down')
+        return super().generate_text(prompt, **kwargs)
+
+    async def agenerate_text(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.2)
+        return super().generate_text(prompt, **kwargs)
+
+
+def _parallel(fn, n):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_identical_concurrent_requests_share_one_call():
+    inner = SlowProvider()
+    client = CoalescingAIClient(inner)
+    results, _ = _parallel(lambda: client.generate_text('same prompt'), 5)
+    assert inner.calls == 1
+    assert client.stats == {'calls': 1, 'collapsed': 4}
+    assert len({r['text'] for r in results}) == 1
+    # every caller owns its result
+    results[0]['meta']['latency'] = -1
+    assert all(r['meta']['latency'] != -1 for r in results[1:])
+    # different prompts and sequential repeats are separate calls
+    client.generate_text('same prompt')
+    client.generate_text('other prompt')
+    assert inner.calls == 3
+
+
+def test_followers_get_the_leaders_error():
+    client = CoalescingAIClient(SlowProvider(fail=True))
+    results, errors = _parallel(lambda: client.generate_text('p'), 3)
+    assert not results and len(errors) == 3
+    assert all(str(e) == 'provider down' for e in errors)
+    assert client.stats['calls'] == 1
+
+
+def test_async_requests_are_coalesced():
+    inner = SlowProvider()
+    client = CoalescingAIClient(inner)
+
+    async def main():
+        return await asyncio.gather(*(client.agenerate_text('p') for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert inner.calls == 1
+    assert client.stats['collapsed'] == 3
+    assert results[0] == results[3] and results[0] is not results[3]
+
+
+@pytest.mark.parametrize('coalesce', [True, False])
+def test_factory_wraps_provider(coalesce):
+    client = make_ai_client({'provider': 'mock', 'coalesce': coalesce})
+    assert isinstance(client, CoalescingAIClient) is coalesce
+    assert 'MOCK_TEXT' in client.generate_text('hello')['text']
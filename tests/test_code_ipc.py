@@ -0,0 +1,96 @@
+import io
+import pytest
+from docflow.core.actions import ipc
+from docflow.core.actions.code import CodeAction
+from docflow.core.actions.code_pool import CodeWorkerPool
+from docflow.core.context import ExecutionContext
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+
+def _run(code, returns='text', pool=None, global_vars=None):
+    ctx = ExecutionContext(global_vars=global_vars or {}, code_pool=pool)
+    return CodeAction({'id': 't', 'code': code, 'returns': returns, 'timeout': 20}).execute(ctx)
+
+
+def test_message_round_trip_with_blobs_and_shm():
+    buf = io.BytesIO()
+    msg = {'kind': 'dict', 'vars': {'n': 1, 'nested': [b'\x00\xff', 'x']}, 'images': {'image': PNG}}
+    ipc.write_message(buf, msg, shm_threshold=512)
+    buf.seek(0)
+    assert ipc.read_message(buf) == {'kind': 'dict', 'vars': {'n': 1, 'nested': [b'\x00\xff', 'x']}, 'images': {'image': PNG}}
+    assert ipc.read_message(io.BytesIO(b'')) is None
+
+
+@pytest.mark.parametrize('pooled', [False, True])
+def test_code_action_returns_image_bytes(pooled, monkeypatch):
+    # force the shared-memory path for the image blob
+    monkeypatch.setenv(ipc.SHM_THRESHOLD_ENV, '64')
+    pool = CodeWorkerPool(size=1) if pooled else None
+    try:
+        code = f"def run(vars):\n    return {{'vars': {{'rows': vars['rows']}}, 'image': {PNG!r}}}"
+        out = _run(code, returns='image', pool=pool, global_vars={'rows': 3})
+    finally:
+        if pool is not None:
+            pool.close()
+    assert out.kind == 'image'
+    assert out.data == PNG
+    assert out.vars == {'rows': 3}
+
+
+def test_result_text_ending_in_png_is_not_taken_for_an_image():
+    out = _run("def run(vars):\n    return {'result_text': 'see chart.png'}")
+    assert out.kind == 'text'
+    assert out.data == 'see chart.png'
+
+
+def test_tuple_outputs_carry_bytes():
+    code = "def run(vars):\n    return ({'a': 1}, b'\\x00raw')"
+    assert _run(code, returns=['vars', 'image']) == ({'a': 1}, b'\x00raw')
+
+
+@pytest.mark.parametrize('pooled', [False, True])
+def test_only_declared_vars_are_sent_and_others_fetched_lazily(pooled):
+    pool = CodeWorkerPool(size=1) if pooled else None
+    global_vars = {'n': 2, 'big': 'x' * 100_000, 'raw': b'\x00\x01', 'unused': 'y' * 50_000}
+    code = ("def run(vars):\n"
+            "    return {'vars': {'n2': vars['n'] * 2, 'raw_len': len(vars['raw']), 'has_big': 'big' in vars}}")
+    try:
+        ctx = ExecutionContext(global_vars=global_vars, code_pool=pool)
+        out = CodeAction({'id': 't', 'code': code, 'input_vars': ['n'], 'timeout': 20}).execute(ctx)
+    finally:
+        if pool is not None:
+            pool.close()
+    assert out.vars == {'n2': 4, 'raw_len': 2, 'has_big': True}
+    assert out.meta['payload_bytes'] < 1000
+    assert out.meta['vars_fetched'] == ['raw']
+
+
+@pytest.mark.parametrize('pooled', [False, True])
+def test_main_ctx_reads_held_back_vars_lazily(pooled):
+    pool = CodeWorkerPool(size=1) if pooled else None
+    global_vars = {'n': 2, 'other': 'hello', 'raw': b'\x00\x01'}
+    code = "def main(ctx):\n    return {'result_text': f'{ctx.other} {ctx.n} {len(ctx.raw)} {hasattr(ctx, \"nope\")}'}"
+    try:
+        ctx = ExecutionContext(global_vars=global_vars, code_pool=pool)
+        out = CodeAction({'id': 't', 'code': code, 'input_vars': ['n'], 'timeout': 20}).execute(ctx)
+    finally:
+        if pool is not None:
+            pool.close()
+    assert out.data == 'hello 2 2 False'
+    assert out.meta['vars_fetched'] == ['other', 'raw']
+
+
+def test_undeclared_mode_still_sends_everything_but_holds_bytes():
+    code = "def run(vars):\n    return {'result_text': type(vars['raw']).__name__ + str(vars['n'])}"
+    out = _run(code, global_vars={'n': 1, 'raw': b'abc'})
+    assert out.data == 'bytes1'
+    assert out.meta['vars_fetched'] == ['raw']
+
+
+def test_unknown_key_is_not_fetched():
+    code = "def run(vars):\n    return {'result_text': str(vars.get('nope', 'default'))}"
+    ctx = ExecutionContext(global_vars={'a': 1, 'b': 2})
+    out = CodeAction({'id': 't', 'code': code, 'input_vars': ['a'], 'timeout': 20}).execute(ctx)
+    assert out.data == 'default'
+    assert 'vars_fetched' not in out.meta
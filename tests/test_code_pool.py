@@ -0,0 +1,62 @@
+import time
+import pytest
+from docflow.core.actions.code import CodeAction
+from docflow.core.actions.code_pool import CodeWorkerPool
+from docflow.core.context import ExecutionContext
+
+
+@pytest.fixture
+def pool():
+    p = CodeWorkerPool(size=1, max_jobs=3)
+    yield p
+    p.close()
+
+
+def _run(pool, code, timeout=10, global_vars=None):
+    ctx = ExecutionContext(global_vars=global_vars or {}, code_pool=pool)
+    return CodeAction({'id': 't', 'code': code, 'timeout': timeout}).execute(ctx)
+
+
+def test_pool_runs_code_with_same_semantics(pool):
+    out = _run(pool, "def run(vars):\n    return {'vars': {'double': vars['n'] * 2}, 'result_text': 'ok'}",
+               global_vars={'n': 21})
+    assert out.data == 'ok'
+    assert out.vars == {'double': 42}
+
+    failed = _run(pool, "def run(vars):\n    raise ValueError('bad input')")
+    assert failed.meta['error'] == 'nonzero_exit'
+    assert 'ERROR_IN_USER_CODE:bad input' in failed.meta['stderr']
+
+
+def test_pool_isolates_jobs_and_reuses_worker(pool):
+    _run(pool, "import math\nmath.leaked = True\nprint('set')")
+    out = _run(pool, "import math\nprint(hasattr(math, 'leaked'))")
+    assert out.data == 'False'
+    assert pool.stats['spawned'] == 1
+
+
+def test_pool_timeout_keeps_worker_warm(pool):
+    t0 = time.time()
+    out = _run(pool, "while True:\n    pass", timeout=1)
+    assert out.meta.get('timeout') is True
+    assert time.time() - t0 < 5
+    assert _run(pool, "print('after')").data == 'after'
+
+
+def test_pool_recycles_after_max_jobs(pool):
+    for i in range(4):
+        assert _run(pool, f"print({i})").data == str(i)
+    assert pool.stats['spawned'] == 2
+    assert pool.stats['recycled'] == 1
+
+
+def test_pool_recycles_on_the_jobs_peak_rss():
+    pool = CodeWorkerPool(size=1, max_memory_mb=150)
+    try:
+        assert _run(pool, "print('small')").data == 'small'
+        assert pool.stats['recycled'] == 0
+        # the forked child peaks at 200+ MiB; the worker itself never grows
+        assert _run(pool, "blob = b'x' * (200 << 20)\nprint(len(blob))").data == str(200 << 20)
+        assert pool.stats['recycled'] == 1
+    finally:
+        pool.close()
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+import pytest
+from docflow.ai.concurrency import AdaptiveLimiter, is_congestion_error
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+def _fail(limiter, exc):
+    with pytest.raises(type(exc)):
+        with limiter.slot():
+            raise exc
+
+
+def test_congestion_errors():
+    assert is_congestion_error(ThrottledError())
+    assert is_congestion_error(TimeoutError())
+    assert not is_congestion_error(ValueError('bad prompt'))
+
+
+def test_additive_increase_and_multiplicative_decrease():
+    limiter = AdaptiveLimiter('p', initial=2, max_limit=8)
+    for _ in range(10):
+        with limiter.slot():
+            pass
+    assert limiter.stats()['limit'] > 2
+    grown = limiter.limit
+    _fail(limiter, ThrottledError())
+    assert limiter.limit == pytest.approx(grown / 2)
+    # other errors do not shrink the limit
+    _fail(limiter, ValueError('bad prompt'))
+    assert limiter.limit == pytest.approx(grown / 2)
+    assert limiter.stats()['errors'] == 2 and limiter.stats()['in_flight'] == 0
+
+
+def test_failures_of_one_window_back_off_once():
+    limiter = AdaptiveLimiter('p', initial=8)
+    with limiter.slot():
+        time.sleep(0.05)
+    _fail(limiter, ThrottledError())
+    _fail(limiter, ThrottledError())
+    assert limiter.stats()['decreases'] == 1 and limiter.stats()['limit'] == 4
+
+
+def test_slow_calls_do_not_grow_the_limit():
+    limiter = AdaptiveLimiter('p', initial=2, latency_target_s=0.01)
+    for _ in range(5):
+        with limiter.slot():
+            time.sleep(0.02)
+    assert limiter.limit == 2
+
+
+def test_limit_caps_threads_and_reports_queue():
+    limiter = AdaptiveLimiter('p', initial=2, max_limit=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with limiter.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = limiter.stats()
+    assert peak[0] == 2
+    assert stats['max_queue_depth'] >= 3 and stats['queue_depth'] == 0 and stats['in_flight'] == 0
+
+
+def test_async_waiters_and_cancellation():
+    limiter = AdaptiveLimiter('p', initial=1, max_limit=1)
+    order = []
+
+    async def work(i):
+        async with limiter.aslot():
+            order.append(i)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        first = asyncio.create_task(work(0))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(work(1))
+        rest = [asyncio.create_task(work(i)) for i in (2, 3)]
+        await asyncio.sleep(0.005)
+        assert limiter.queue_depth == 3
+        cancelled.cancel()
+        await asyncio.gather(first, *rest)
+
+    asyncio.run(main())
+    assert order == [0, 2, 3]
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_generative_action_reports_limiter_metrics():
+    ctx = ExecutionContext()
+    ctx.concurrency_limiter = AdaptiveLimiter('mock', initial=3)
+    res = GenerativeAction({'id': 'g', 'type': 'generative', 'prompt': 'hi'}).execute(ctx)
+    assert res.meta['concurrency_limit'] == 3 and res.meta['queue_depth'] == 0
+    assert 'queue_wait_s' in res.meta
+    assert ctx.concurrency_limiter.stats()['in_flight'] == 0
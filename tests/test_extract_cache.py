@@ -0,0 +1,68 @@
+import json
+import os
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+from docflow.kb import extract_cache, loader
+from docflow.kb.extract_cache import ExtractCache
+
+
+def test_unchanged_files_are_served_from_cache(tmp_path, counting_extract):
+    calls = counting_extract
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'a.md').write_text('alpha')
+    (kb / 'b.json').write_text(json.dumps({'k': 'v'}))
+    (kb / 'c.bin').write_bytes(b'\x00')
+    files = sorted(kb.iterdir())
+    cache = ExtractCache(tmp_path / 'cache')
+
+    first = loader.read_kb_texts(files, cache)
+    assert first == loader.read_kb_texts(files) == loader.read_kb_texts(files, cache)
+    assert calls.count('a.md') == 2 and calls.count('b.json') == 2
+    assert (cache.hits, cache.misses) == (2, 4)  # unsupported c.bin is never stored
+
+    # a copy elsewhere has the same content hash: no extraction
+    (tmp_path / 'copy.md').write_text('alpha')
+    assert loader.read_kb_texts([tmp_path / 'copy.md'], cache) == ['alpha']
+    assert 'copy.md' not in calls
+
+    # a changed file is extracted again
+    (kb / 'a.md').write_text('alpha, revised')
+    os.utime(kb / 'a.md', ns=(1, 1))
+    assert loader.read_kb_texts([kb / 'a.md'], cache) == ['alpha, revised']
+    assert calls.count('a.md') == 3
+
+
+def test_unchanged_files_are_not_rehashed(tmp_path, monkeypatch):
+    hashed = []
+    original = extract_cache.file_digest
+    monkeypatch.setattr(extract_cache, 'file_digest', lambda p: hashed.append(p) or original(p))
+    (tmp_path / 'a.txt').write_text('x' * 100)
+    for _ in range(3):
+        # a fresh instance, as in a later run
+        ExtractCache(tmp_path / 'cache').get_or_extract(tmp_path / 'a.txt', loader.extract_text)
+    assert len(hashed) == 1
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    cache = ExtractCache(tmp_path / 'cache', max_bytes=2500)
+    for name in 'abc':
+        (tmp_path / f'{name}.txt').write_text(name * 1000)
+        cache.get_or_extract(tmp_path / f'{name}.txt', loader.extract_text)
+    assert cache.evicted == 1
+    cache.get_or_extract(tmp_path / 'a.txt', loader.extract_text)
+    assert cache.stats() == {'hits': 0, 'misses': 4, 'evicted': 2}
+
+
+def test_actions_share_the_cache(tmp_path, counting_extract):
+    calls = counting_extract
+    (tmp_path / 'notes.md').write_text('KB facts')
+    ctx = ExecutionContext(assets_dir=str(tmp_path), kb_cache_dir=tmp_path / 'kbcache')
+    for max_chars in (100, 200):
+        kb = {'enabled': True, 'paths': [str(tmp_path / 'notes.md')], 'max_chars': max_chars}
+        GenerativeAction({'id': f'a{max_chars}', 'prompt': 'Use {{kb}}', 'kb': kb}).execute(ctx)
+    assert calls == ['notes.md']
+    assert extract_cache.extract_cache_for(tmp_path / 'kbcache').hits == 1
+    kb['extract_cache'] = False
+    GenerativeAction({'id': 'nocache', 'prompt': 'Use {{kb}}', 'kb': kb}).execute(ctx)
+    assert calls == ['notes.md', 'notes.md']
@@ -0,0 +1,27 @@
+from docflow.kb import extract_pool, loader
+from docflow.kb.extract_cache import ExtractCache
+
+
+def test_parallel_extraction_keeps_file_and_page_order(pdf_kb_files):
+    files = pdf_kb_files
+    serial = loader.read_kb_texts(files)
+    parallel = loader.read_kb_texts(files, workers=2)
+    assert parallel == serial
+    assert 2 in extract_pool._pools
+    assert parallel[0].split('\n') == ['doc0 page 0', 'doc0 page 1', 'doc0 page 2']
+    assert parallel[3] == '' and parallel[-2].split('\n')[-1] == 'doc2 page 4'
+
+
+def test_parallel_extraction_fills_the_cache(tmp_path, pdf_kb_files):
+    files = pdf_kb_files
+    cache = ExtractCache(tmp_path / 'cache')
+    first = loader.read_kb_texts(files, cache, workers=2)
+    assert cache.misses == len(files) and cache.hits == 0
+    assert loader.read_kb_texts(files, cache, workers=2) == first
+    assert cache.hits == len(files)
+
+
+def test_workers_setting():
+    assert extract_pool.resolve_workers(3) == 3
+    assert extract_pool.resolve_workers(0) >= 1
+    assert extract_pool._chunksize(1000, 8) == 31 and extract_pool._chunksize(3, 8) == 1
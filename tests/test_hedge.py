@@ -0,0 +1,138 @@
+import asyncio
+import time
+import pytest
+from docflow.ai.coalesce import CoalescingAIClient
+from docflow.ai.factory import make_ai_client
+from docflow.ai.hedge import HedgingAIClient, LatencyTracker
+from docflow.ai.providers.mock import MockProvider
+
+
+class SlowProvider(MockProvider):
+    """Mock whose next calls take ``delays`` seconds (then ``default``)."""
+
+    def __init__(self, name, delays=(), default=0.0, fail=False):
+        super().__init__(model='m')
+        self.name = name
+        self.delays = list(delays)
+        self.default = default
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    def _delay(self):
+        self.calls += 1
+        return self.delays.pop(0) if self.delays else self.default
+
+    def generate_text(self, prompt, **kwargs):
+        time.sleep(self._delay())
+        if self.fail:
+            raise RuntimeError(f'{self.name} down')
+        return {'text': self.name, 'meta': {}}
+
+    async def agenerate_text(self, prompt, **kwargs):
+        try:
+            await asyncio.sleep(self._delay())
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f'{self.name} down')
+        return {'text': self.name, 'meta': {}}
+
+
+def _warm(client, n=20, latency=0.01):
+    for _ in range(n):
+        client.tracker.record('m', latency)
+    client.stats['calls'] += n
+
+
+def test_latency_percentile():
+    tracker = LatencyTracker()
+    for i in range(1, 101):
+        tracker.record('m', i / 100)
+    assert tracker.percentile('m', 95) == pytest.approx(0.95)
+    assert tracker.percentile('m', 50) == pytest.approx(0.5)
+    assert tracker.percentile('other', 95) is None
+
+
+def test_no_hedging_until_enough_samples():
+    primary = SlowProvider('primary', default=0.05)
+    client = HedgingAIClient(primary, SlowProvider('secondary'), min_samples=5, max_extra_ratio=1.0)
+    for _ in range(5):
+        assert client.generate_text('p')['text'] == 'primary'
+    assert client.stats['hedged'] == 0 and client.tracker.count('m') == 5
+
+
+def test_slow_call_is_hedged_to_secondary():
+    primary = SlowProvider('primary', delays=[0.6])
+    secondary = SlowProvider('secondary')
+    client = HedgingAIClient(primary, secondary, max_extra_ratio=0.5)
+    _warm(client)
+    t0 = time.monotonic()
+    out = client.generate_text('p')
+    assert time.monotonic() - t0 < 0.4
+    assert out['text'] == 'secondary'
+    assert out['meta'] == {'hedged': True, 'hedge_winner': 'hedge'}
+    assert client.stats['hedged'] == 1 and client.stats['hedge_wins'] == 1
+
+
+def test_spend_cap_limits_hedges():
+    primary = SlowProvider('primary', default=0.05)
+    secondary = SlowProvider('secondary')
+    client = HedgingAIClient(primary, secondary, max_extra_ratio=0.0)
+    _warm(client)
+    assert client.generate_text('p')['text'] == 'primary'
+    assert secondary.calls == 0 and client.stats['over_budget'] == 1
+
+
+def test_attachments_hedge_on_primary_provider():
+    primary = SlowProvider('primary', delays=[0.5])
+    secondary = SlowProvider('secondary')
+    client = HedgingAIClient(primary, secondary, max_extra_ratio=0.5)
+    _warm(client)
+    assert client.generate_text('p', attachments=['file-1'])['text'] == 'primary'
+    assert secondary.calls == 0 and primary.calls == 2
+
+
+def test_both_failing_raise_primary_error():
+    primary = SlowProvider('primary', delays=[0.1], fail=True)
+    client = HedgingAIClient(primary, SlowProvider('secondary', fail=True), max_extra_ratio=0.5)
+    _warm(client)
+    with pytest.raises(RuntimeError, match='primary down'):
+        client.generate_text('p')
+
+
+def test_pool_grows_with_concurrent_callers():
+    from concurrent.futures import ThreadPoolExecutor
+
+    primary = SlowProvider('primary', default=0.2)
+    client = HedgingAIClient(primary, min_delay_s=5.0)
+    _warm(client)
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=40) as callers:
+        outs = list(callers.map(lambda _: client.generate_text('p'), range(40)))
+    # with a fixed 16-thread pool the 40 calls would queue in three waves
+    assert time.monotonic() - t0 < 0.45
+    assert [o['text'] for o in outs] == ['primary'] * 40 and client.stats['hedged'] == 0
+
+
+def test_async_hedge_cancels_loser():
+    primary = SlowProvider('primary', delays=[1.0])
+    secondary = SlowProvider('secondary')
+    client = HedgingAIClient(primary, secondary, max_extra_ratio=0.5)
+    _warm(client)
+    out = asyncio.run(client.agenerate_text('p'))
+    assert out['text'] == 'secondary'
+    assert primary.cancelled == 1
+    # the cancelled primary still informs the percentile as a lower bound
+    assert client.tracker.count('m') == 21
+
+
+def test_factory_builds_hedging_client_with_fallback():
+    client = make_ai_client({'provider': 'mock', 'model': 'a',
+                             'hedge': {'percentile': 90, 'fallback': {'provider': 'mock', 'model': 'b'}}})
+    assert isinstance(client, CoalescingAIClient)
+    hedging = client.inner
+    assert isinstance(hedging, HedgingAIClient)
+    assert hedging.percentile == 90 and hedging.secondary.model == 'b'
+    assert client.generate_text('hi')['text']
@@ -0,0 +1,116 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from docflow.ai import http
+from docflow.ai.providers import gemini
+from docflow.ai.providers.gemini import GeminiProvider
+from docflow.ai.providers.openai import OpenAIProvider
+from docflow.ai.response_cache import CachingAIClient, ResponseCache
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / 'www'
+    root.mkdir()
+    (root / 'image.png').write_bytes(b'\x89PNG' + b'x' * 300_000)
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(root))
+    handler.log_message = lambda *a: None
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{srv.server_address[1]}'
+    srv.shutdown()
+
+
+def _openai_factory(url, created):
+    def factory(*args, **kwargs):
+        created.append(kwargs)
+        client = MagicMock()
+        client.images.generate.return_value = SimpleNamespace(data=[SimpleNamespace(url=url)])
+        return client
+    return factory
+
+
+def test_session_is_shared_per_pool_size():
+    assert http.http_session(3) is http.http_session(3)
+    assert http.http_session(3) is not http.http_session(4)
+    assert http.http_session(3).get_adapter('https://x')._pool_maxsize == 3
+
+
+def test_download_streams_to_file(server, tmp_path):
+    dest = tmp_path / 'assets' / 'img.png'
+    assert http.download(f'{server}/image.png', dest, timeout=5) == 300_004
+    assert dest.read_bytes().startswith(b'\x89PNG')
+    assert [p.name for p in dest.parent.iterdir()] == ['img.png']
+    with pytest.raises(Exception):
+        http.download(f'{server}/missing.png', tmp_path / 'missing.png', timeout=5)
+    assert not (tmp_path / 'missing.png').exists()
+
+
+def test_openai_reuses_sdk_client_and_applies_timeout(monkeypatch):
+    created = []
+    monkeypatch.setattr('docflow.ai.providers.openai.OpenAI', _openai_factory('http://unused', created))
+    a = OpenAIProvider(api_key='k1', timeout_s=7)
+    b = OpenAIProvider(api_key='k1', timeout_s=7)
+    c = OpenAIProvider(api_key='k2', timeout_s=7)
+    assert a.client is b.client and a.client is not c.client
+    assert len(created) == 2 and created[0]['timeout'] == 7
+
+
+def test_openai_image_streams_to_out_path(monkeypatch, server, tmp_path):
+    monkeypatch.setattr('docflow.ai.providers.openai.OpenAI', _openai_factory(f'{server}/image.png', []))
+    provider = OpenAIProvider(api_key='k3', timeout_s=5)
+    out = provider.generate_image('a cat', out_path=str(tmp_path / 'cat.png'))
+    assert out['image_path'] == str(tmp_path / 'cat.png') and 'image_bytes' not in out
+    assert (tmp_path / 'cat.png').stat().st_size == 300_004
+    # without a destination the bytes are returned as before
+    assert provider.generate_image('a cat')['image_bytes'].startswith(b'\x89PNG')
+    # the response cache keeps the bytes of a streamed image, not the path
+    cached = CachingAIClient(provider, ResponseCache(tmp_path / 'rc'))
+    cached.generate_image('a dog', out_path=str(tmp_path / 'dog.png'))
+    hit = cached.generate_image('a dog', out_path=str(tmp_path / 'dog2.png'))
+    assert hit['meta']['response_cache'] == 'hit' and len(hit['image_bytes']) == 300_004
+
+
+def test_gemini_caches_model_handles_and_applies_timeout(monkeypatch):
+    built, calls = [], []
+
+    class FakeModel:
+        def __init__(self, name):
+            built.append(name)
+
+        def generate_content(self, prompt, **kwargs):
+            calls.append(kwargs)
+            return SimpleNamespace(text=f'ok {prompt}')
+
+    monkeypatch.setattr(gemini, 'genai', SimpleNamespace(GenerativeModel=FakeModel, configure=lambda **k: None))
+    provider = GeminiProvider(api_key='g', model='gemini-test', timeout_s=12)
+    for _ in range(3):
+        assert provider.generate_text('hi')['text'] == 'ok hi'
+    assert built == ['gemini-test']
+    assert calls[0] == {'request_options': {'timeout': 12}}
+
+
+def test_gemini_async_image_uses_generate_content_async(monkeypatch):
+    import asyncio
+    import base64
+
+    calls = []
+
+    class FakeModel:
+        def __init__(self, name):
+            pass
+
+        def generate_content(self, prompt, **kwargs):
+            calls.append('sync')
+
+        async def generate_content_async(self, prompt, **kwargs):
+            calls.append('async')
+            return SimpleNamespace(images=[SimpleNamespace(base64_data=base64.b64encode(b'PNG').decode())])
+
+    monkeypatch.setattr(gemini, 'genai', SimpleNamespace(GenerativeModel=FakeModel, configure=lambda **k: None))
+    out = asyncio.run(GeminiProvider(model='gemini-img').agenerate_image('a cat'))
+    assert out['image_bytes'] == b'PNG' and out['meta']['model'] == 'gemini-img'
+    assert calls == ['async']
@@ -0,0 +1,73 @@
+import pytest
+from docflow.core.context import ExecutionContext
+from docflow.core.incremental import DependencyGraph, action_reads
+from docflow.core.workflow import execute_workflow
+from docflow.ai.providers.mock import MockProvider
+
+
+class RecordingProvider(MockProvider):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate_text(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return super().generate_text(prompt, **kwargs)
+
+
+def _actions(x_value):
+    return [
+        {'id': 'seed_x', 'type': 'generative', 'prompt': 'seed x', 'vars': {'x': x_value}},
+        {'id': 'seed_y', 'type': 'generative', 'prompt': 'seed y', 'vars': {'y': 'fixed'}},
+        {'id': 'use_x', 'type': 'generative', 'prompt': 'x is {{x}}', 'deps': ['seed_x']},
+        {'id': 'use_y', 'type': 'generative', 'prompt': 'y is {{ y | upper }}', 'deps': ['seed_y']},
+    ]
+
+
+def _run(tmp_path, actions, incremental):
+    provider = RecordingProvider()
+    ctx = ExecutionContext(incremental=incremental)
+    ctx.ai_client = provider
+    ctx.dep_graph = DependencyGraph(tmp_path / 'graph.json')
+    mapping = execute_workflow(actions, ctx)
+    ctx.dep_graph.save()
+    return provider.prompts, mapping, ctx
+
+
+def test_action_reads_from_prompt_and_input_vars():
+    ad = {'id': 'a', 'type': 'generative', 'prompt': 'Hi {{name}} {% for i in items %}{{i}}{% endfor %} {{kb}}',
+          'input_vars': ['extra']}
+    assert action_reads(ad, {'name': 1, 'other': 2}) == ['extra', 'items', 'name']
+    code = {'id': 'c', 'type': 'code', 'code': 'x = 1'}
+    assert action_reads(code, {'name': 1, 'other': 2}) == ['name', 'other']
+    code['input_vars'] = ['name']
+    assert action_reads(code, {'name': 1, 'other': 2}) == ['name']
+
+
+@pytest.mark.parametrize('strategy', ['bm25', 'vector'])
+def test_action_reads_kb_query_vars(strategy):
+    ad = {'id': 'a', 'type': 'generative', 'prompt': 'Answer using {{kb}}',
+          'kb': {'enabled': True, 'paths': ['kb'], 'strategy': strategy, 'query': '{{topic}} {{lang}}'}}
+    assert action_reads(ad, {'topic': 'x', 'lang': 'it', 'other': 1}) == ['lang', 'topic']
+
+
+def test_incremental_run_only_reexecutes_dirty_subgraph(tmp_path):
+    prompts, _, _ = _run(tmp_path, _actions('one'), incremental=False)
+    assert len(prompts) == 4
+
+    prompts, mapping, ctx = _run(tmp_path, _actions('one'), incremental=True)
+    assert prompts == []
+    assert mapping['use_x'].meta['incremental'] == 'reused'
+    assert ctx.global_vars['x'] == 'one'
+
+    prompts, mapping, ctx = _run(tmp_path, _actions('two'), incremental=True)
+    assert sorted(prompts) == ['seed x', 'x is two']
+    assert mapping['use_y'].meta['incremental'] == 'reused'
+    assert ctx.dep_graph.dependents('x') == ['use_x']
+
+
+def test_non_incremental_run_still_records_graph(tmp_path):
+    _run(tmp_path, _actions('one'), incremental=False)
+    graph = DependencyGraph(tmp_path / 'graph.json')
+    assert graph.actions['seed_x']['writes'] == ['x']
+    assert list(graph.actions['use_y']['reads']) == ['y']
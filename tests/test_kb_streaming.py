@@ -0,0 +1,64 @@
+from docflow.kb import loader
+from docflow.kb.extract_cache import ExtractCache
+from docflow.kb.strategies import kb_strategy_processor
+
+
+def test_same_text_as_full_extraction(mixed_kb_files):
+    files = mixed_kb_files
+    full = '\n\n'.join(t for t in loader.read_kb_texts(files) if t)
+    for max_chars in (0, 1, 50, 121, 122, 123, 150, 200, len(full) - 1, len(full), 10000):
+        expected = loader.concat_and_truncate(loader.read_kb_texts(files), max_chars)
+        for workers in (1, 2):
+            text, stats = loader.assemble_kb_text(files, max_chars, workers=workers)
+            assert text == expected, (max_chars, workers)
+            assert stats['bytes_used'] == len(expected.encode('utf-8'))
+
+
+def test_stops_reading_once_the_budget_is_met(mixed_kb_files, counting_extract):
+    files = mixed_kb_files
+    extracted = counting_extract
+
+    text, stats = loader.assemble_kb_text(files, 130)
+    assert text.endswith('alpha \n\nbravo pa')
+    assert extracted == ['a.md']  # PDFs are parsed page by page, nothing after b.pdf
+    assert stats['files_read'] == 2 and stats['pages_read'] == 1 and stats['budget_reached']
+
+    _, stats = loader.assemble_kb_text(files, 10000)
+    assert stats['files_read'] == len(files) and stats['pages_read'] == 6 and not stats['budget_reached']
+
+
+def test_bytes_read_against_bytes_used(tmp_path, make_pdf):
+    big = make_pdf(tmp_path / 'plots.pdf', 'plots', 12, points=3000)
+    text, stats = loader.assemble_kb_text([big], 10)
+    assert len(text) == stats['bytes_used'] == 10
+    assert stats['pages_read'] == 1 and 0 < stats['bytes_read'] < big.stat().st_size / 2
+
+
+def test_only_fully_read_files_are_cached(tmp_path, mixed_kb_files):
+    files = mixed_kb_files
+    cache = ExtractCache(tmp_path / 'cache')
+    loader.assemble_kb_text(files, 130, cache)
+    assert [cache.lookup(f)[0] is not None for f in files[:2]] == [True, False]
+    first, _ = loader.assemble_kb_text(files, 10000, cache)
+    cached, stats = loader.assemble_kb_text(files, 10000, cache)
+    assert cached == first and stats['pages_read'] == 0
+
+
+def test_bytes_read_counts_disk_reads_only(tmp_path, mixed_kb_files):
+    files = mixed_kb_files
+    on_disk = sum(f.stat().st_size for f in files if f.suffix != '.bin')  # unsupported: never opened
+    for workers in (1, 2):
+        cache = ExtractCache(tmp_path / f'cache{workers}')
+        _, stats = loader.assemble_kb_text(files, 10000, cache, workers=workers)
+        # PDFs streamed page by page count the blocks pypdf touched, the rest whole files
+        assert 0 < stats['bytes_read'] <= on_disk
+        if workers > 1:
+            assert stats['bytes_read'] == on_disk
+        _, stats = loader.assemble_kb_text(files, 10000, cache, workers=workers)
+        assert stats['bytes_read'] == 0, workers
+
+
+def test_inline_strategy_renders_templated_max_chars(mixed_kb_files):
+    files = mixed_kb_files
+    cfg = {'enabled': True, 'paths': [str(f) for f in files], 'strategy': 'inline', 'max_chars': '{{ budget }}'}
+    assert kb_strategy_processor.process_kb(cfg, {'budget': 11}) == {'kb_text': 'alpha alpha'}
@@ -126,6 +126,7 @@ def test_code_legacy_vars_json():
         'id': 'test_legacy',
         'type': 'code',
         'returns': 'text',
+        'legacy_stdout': True,
         'code': '''
 print('VARS_JSON={"test_var": "test_value", "number": 42}')
 print('This is the main output text')
@@ -145,6 +146,22 @@ print('This is the main output text')
     assert result.vars['number'] == 42
 
 
+def test_code_stdout_markers_are_text_without_legacy_flag():
+    """Without legacy_stdout printed VARS_JSON/image lines are not parsed"""
+    cfg = {
+        'id': 'test_plain',
+        'type': 'code',
+        'returns': 'text',
+        'code': """
+print('VARS_JSON={"test_var": "test_value"}')
+print('chart.png')
+""",
+    }
+    result = CodeAction(cfg).execute(ExecutionContext())
+    assert result.vars == {}
+    assert result.data == 'VARS_JSON={"test_var": "test_value"}\nchart.png'
+
+
 def test_workflow_integration_multiple_outputs(tmp_path):
     """Test that workflow correctly handles multiple outputs"""
     
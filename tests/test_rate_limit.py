@@ -0,0 +1,141 @@
+import asyncio
+import multiprocessing
+import time
+from docflow.ai.coalesce import CoalescingAIClient
+from docflow.ai.factory import make_ai_client
+from docflow.ai.ratelimit import RateLimiter, RateLimitedAIClient, estimate_tokens
+from docflow.ai.providers.mock import MockProvider
+from docflow.config import AIConfig
+from docflow.runtime.orchestrator import client_stats
+
+
+def test_token_bucket_waits_for_refill(tmp_path):
+    # 6000 tokens/min = 100 tokens/s
+    limiter = RateLimiter('mock-m', tpm=6000, state_dir=tmp_path)
+    t0 = time.monotonic()
+    limiter.acquire(6000)
+    assert time.monotonic() - t0 < 0.2
+    limiter.acquire(50)
+    assert time.monotonic() - t0 >= 0.4
+    assert limiter.waits == 1 and limiter.waited_s > 0.3
+
+
+def test_request_bucket_is_shared_between_limiters(tmp_path):
+    a = RateLimiter('openai-gpt', rpm=60, state_dir=tmp_path)
+    b = RateLimiter('openai-gpt', rpm=60, state_dir=tmp_path)
+    for _ in range(30):
+        a.acquire()
+        b.acquire()
+    # the shared bucket (1 req/s) is empty now: the next request waits
+    t0 = time.monotonic()
+    b.acquire()
+    assert time.monotonic() - t0 >= 0.5
+    assert a.waits == 0 and b.waits == 1
+    # a different model has its own budget
+    other = RateLimiter('openai-other', rpm=60, state_dir=tmp_path)
+    t0 = time.monotonic()
+    other.acquire()
+    assert time.monotonic() - t0 < 0.05
+
+
+def _drain(state_dir):
+    RateLimiter('gemini-flash', tpm=600, state_dir=state_dir).acquire(600)
+
+
+def test_bucket_is_shared_across_processes(tmp_path):
+    proc = multiprocessing.get_context('spawn').Process(target=_drain, args=(str(tmp_path),))
+    proc.start()
+    proc.join(30)
+    assert proc.exitcode == 0
+    limiter = RateLimiter('gemini-flash', tpm=600, state_dir=tmp_path)
+    # refilled at 10 tokens/s since the child drained the bucket
+    assert limiter._load(time.time())['tokens'] < 300
+
+
+def test_output_tokens_are_debited(tmp_path):
+    limiter = RateLimiter('mock-m', tpm=6000, state_dir=tmp_path)
+    client = RateLimitedAIClient(MockProvider(model='m'), limiter)
+    out = client.generate_text('x' * 400)
+    state = limiter._load(time.time())
+    charged = estimate_tokens('x' * 400) + estimate_tokens(out['text'])
+    assert 6000 - charged <= state['tokens'] < 6000 - charged + 5
+
+
+def test_async_calls_wait_without_blocking_loop(tmp_path):
+    limiter = RateLimiter('mock-m', rpm=120, state_dir=tmp_path)
+    client = RateLimitedAIClient(MockProvider(model='m'), limiter)
+    for _ in range(120):
+        limiter.acquire()
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        return await asyncio.gather(client.agenerate_text('hello'), ticker())
+
+    out, _ = asyncio.run(main())
+    assert out['text'] and len(ticks) == 5
+    assert limiter.waits == 1
+
+
+def test_async_acquire_waits_for_the_file_lock_off_the_loop(tmp_path):
+    import threading
+    from docflow.ai.ratelimit import file_lock
+
+    limiter = RateLimiter('mock-m', rpm=120, state_dir=tmp_path)
+    held, release = threading.Event(), threading.Event()
+
+    def other_process():
+        # another docflow run holding the shared bucket
+        with file_lock(limiter.lock_path):
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=other_process)
+    holder.start()
+    held.wait(5)
+    ticks = []
+
+    async def ticker():
+        for _ in range(10):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+        release.set()
+
+    async def main():
+        await asyncio.gather(limiter.aacquire(), ticker())
+
+    t0 = time.monotonic()
+    asyncio.run(main())
+    holder.join()
+    # the ticker, not the holder's 5s timeout, released the lock
+    assert time.monotonic() - t0 < 2
+    assert len(ticks) == 10 and max(b - a for a, b in zip(ticks, ticks[1:])) < 0.15
+
+
+def test_config_selects_most_specific_limit():
+    cfg = AIConfig(provider='openai', model='gpt-4o', rate_limits=[
+        {'rpm': 10},
+        {'provider': 'openai', 'tpm': 1000},
+        {'provider': 'openai', 'model': 'gpt-4o', 'rpm': 500, 'tpm': 90000},
+        {'provider': 'gemini', 'rpm': 1},
+    ])
+    assert cfg.rate_limit_for().rpm == 500
+    assert cfg.rate_limit_for(model='gpt-4o-mini').tpm == 1000
+    assert cfg.rate_limit_for(provider='gemini').rpm == 1
+    assert cfg.rate_limit_for(provider='mock').rpm == 10
+    assert AIConfig().rate_limit_for() is None
+
+
+def test_factory_wraps_provider_under_coalescing(tmp_path):
+    client = make_ai_client({'provider': 'mock', 'model': 'm',
+                             'rate_limit': {'rpm': 600, 'state_dir': tmp_path}})
+    assert isinstance(client, CoalescingAIClient)
+    assert isinstance(client.inner, RateLimitedAIClient)
+    assert client.generate_text('hi')['text']
+    stats = client_stats(client)
+    assert stats['rate_limit_waits'] == 0
+    assert not isinstance(make_ai_client({'provider': 'mock'}).inner, RateLimitedAIClient)
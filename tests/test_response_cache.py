@@ -0,0 +1,80 @@
+import asyncio
+import os
+import time
+from docflow.ai.providers.mock import MockProvider
+from docflow.ai.response_cache import CachingAIClient, ResponseCache
+from docflow.config import load_config
+from docflow.runtime.orchestrator import make_client_for
+
+
+class CountingProvider(MockProvider):
+    def __init__(self):
+        super().__init__(model='count-1')
+        self.calls = 0
+
+    def generate_text(self, prompt, **kwargs):
+        self.calls += 1
+        return super().generate_text(prompt, **kwargs)
+
+
+def test_repeated_prompt_is_served_from_disk(tmp_path):
+    inner = CountingProvider()
+    client = CachingAIClient(inner, ResponseCache(tmp_path))
+    first = client.generate_text('Boilerplate section')
+    second = client.generate_text('Boilerplate section')
+    assert inner.calls == 1
+    assert second['text'] == first['text']
+    assert second['meta']['response_cache'] == 'hit'
+    # a different attachment or kwarg is a different request
+    client.generate_text('Boilerplate section', attachments=[{'id': 'file-1'}])
+    client.generate_text('Boilerplate section', temperature=0.2)
+    assert inner.calls == 3
+    # another process (new client, same directory) shares the entries
+    other = CachingAIClient(CountingProvider(), ResponseCache(tmp_path))
+    assert other.generate_text('Boilerplate section')['meta']['response_cache'] == 'hit'
+    assert asyncio.run(other.agenerate_text('Boilerplate section'))['meta']['response_cache'] == 'hit'
+    assert other.inner.calls == 0
+
+
+def test_image_bytes_round_trip(tmp_path):
+    client = CachingAIClient(MockProvider(), ResponseCache(tmp_path))
+    img = client.generate_image('logo')['image_bytes']
+    assert client.generate_image('logo')['image_bytes'] == img
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=1000, ttl=60)
+    for i in range(4):
+        cache.put(f'{i:02d}' + 'a' * 62, {'text': 'x' * 100})
+        os.utime(cache._path(f'{i:02d}' + 'a' * 62), (time.time() - 100 + i, time.time() - 100 + i))
+    assert cache.get('00' + 'a' * 62) is not None  # refreshed: now most recent
+    cache.put('04' + 'a' * 62, {'text': 'x' * 100})
+    assert cache.evicted >= 1
+    assert cache.get('00' + 'a' * 62) is not None
+    assert cache.get('01' + 'a' * 62) is None
+    expired = ResponseCache(tmp_path, ttl=0.0)
+    assert expired.get('00' + 'a' * 62) is None
+
+
+def test_errors_are_not_cached(tmp_path):
+    class Failing(MockProvider):
+        def generate_text(self, prompt, **kwargs):
+            return {'text': '', 'meta': {'error': 'boom'}}
+
+    client = CachingAIClient(Failing(), ResponseCache(tmp_path))
+    client.generate_text('p')
+    assert client.cache.get(client.cache_key('generate_text', 'p', {})) is None
+
+
+def test_enabled_from_ai_config(tmp_path):
+    cfg_path = tmp_path / 'config.yaml'
+    cfg_path.write_text(
+        "project:\n  temp_dir: tmp\n"
+        "ai:\n  provider: mock\n  response_cache:\n    enabled: true\n    max_mb: 10\n    ttl: 12h\n"
+        "workflow:\n  actions: []\n  templates: []\n", encoding='utf-8')
+    cfg = load_config(str(cfg_path))
+    cfg.project.base_dir = tmp_path
+    client = make_client_for(cfg)
+    assert isinstance(client, CachingAIClient)
+    assert client.cache.ttl == 12 * 3600
+    assert client.cache.root == (tmp_path / 'tmp' / 'kb' / 'responses').resolve()
@@ -0,0 +1,189 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from docflow.ai.providers.mock import MockProvider
+from docflow.ai.providers.openai import OpenAIProvider
+from docflow.ai.retry import (PERMANENT, RATE_LIMIT, TRANSIENT, CircuitBreaker, RetryPolicy, classify_error,
+                              retry_after)
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+from docflow.errors import ProviderUnavailableError
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f'HTTP {status}')
+        self.status_code = status
+        self.response = MagicMock(headers=headers or {}, status_code=status)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_classify_error():
+    assert classify_error(HTTPError(429)) == RATE_LIMIT
+    assert classify_error(RateLimitError('slow down')) == RATE_LIMIT
+    assert classify_error(HTTPError(503)) == TRANSIENT
+    assert classify_error(TimeoutError()) == TRANSIENT
+    assert classify_error(HTTPError(400)) == PERMANENT
+    assert classify_error(HTTPError(401)) == PERMANENT
+    assert classify_error(ValueError('bad config')) == PERMANENT
+    assert classify_error(RuntimeError('something odd')) == TRANSIENT
+
+
+def test_retry_after_hints():
+    assert retry_after(HTTPError(429, {'retry-after': '7'})) == 7.0
+    assert retry_after(HTTPError(429, {'retry-after-ms': '250'})) == 0.25
+    assert retry_after(HTTPError(503)) is None
+    policy = RetryPolicy(base_delay_s=0.1, max_delay_s=1.0, max_retry_after_s=5.0)
+    assert policy.delay(1, HTTPError(429, {'retry-after': '3'})) == 3.0
+    assert policy.delay(1, HTTPError(429, {'retry-after': '60'})) == 5.0
+    assert all(0 <= policy.delay(10, HTTPError(503)) <= 1.0 for _ in range(50))
+
+
+def test_transient_errors_are_retried_with_backoff():
+    failures = [HTTPError(503), HTTPError(429, {'retry-after': '2'})]
+    sleeps = []
+
+    def fn():
+        if failures:
+            raise failures.pop(0)
+        return 'ok'
+
+    policy = RetryPolicy(max_attempts=3, base_delay_s=0.5)
+    assert policy.call(fn, 'test-backoff', sleep=sleeps.append) == 'ok'
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5
+    assert sleeps[1] >= 2.0
+
+
+def test_permanent_errors_fail_at_once():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise HTTPError(400)
+
+    with pytest.raises(HTTPError):
+        RetryPolicy(max_attempts=5).call(fn, 'test-permanent', sleep=lambda s: None)
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker('test-breaker', threshold=2, reset_s=0.05)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(ProviderUnavailableError):
+        breaker.before_call()
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    breaker.before_call()  # the probe
+    with pytest.raises(ProviderUnavailableError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_open_breaker_fails_batch_fast_instead_of_sleeping():
+    policy = RetryPolicy(max_attempts=10, base_delay_s=10, breaker_threshold=2, breaker_reset_s=60)
+    sleeps = []
+
+    def down():
+        raise HTTPError(503)
+
+    with pytest.raises(HTTPError):
+        policy.call(down, 'test-outage', sleep=sleeps.append)
+    assert len(sleeps) == 1
+    with pytest.raises(ProviderUnavailableError):
+        policy.call(down, 'test-outage', sleep=sleeps.append)
+    assert len(sleeps) == 1
+
+
+def test_rate_limit_burst_does_not_open_the_breaker():
+    policy = RetryPolicy(max_attempts=4, base_delay_s=0, breaker_threshold=2, breaker_reset_s=60)
+    sleeps = []
+
+    def throttled():
+        raise HTTPError(429, {'retry-after': '3'})
+
+    for _ in range(3):
+        with pytest.raises(HTTPError):
+            policy.call(throttled, 'test-throttled', sleep=sleeps.append)
+    # every retry waited for the hint instead of failing fast on an open circuit
+    assert sleeps == [3.0] * 9
+    assert policy.breaker('test-throttled').state == 'closed'
+    assert policy.call(lambda: 'ok', 'test-throttled') == 'ok'
+
+
+def test_probe_ending_without_a_verdict_frees_the_breaker():
+    policy = RetryPolicy(breaker_threshold=1, breaker_reset_s=0.05)
+    with pytest.raises(TimeoutError):
+        policy.call(lambda: (_ for _ in ()).throw(TimeoutError()), 'test-probe-permanent')
+    time.sleep(0.06)
+    with pytest.raises(ValueError):  # permanent: says nothing about the provider's health
+        policy.call(lambda: (_ for _ in ()).throw(ValueError('bad request')), 'test-probe-permanent')
+    with pytest.raises(ProviderUnavailableError):
+        policy.call(lambda: 'ok', 'test-probe-permanent')
+    time.sleep(0.06)
+    assert policy.call(lambda: 'ok', 'test-probe-permanent') == 'ok'
+    assert policy.breaker('test-probe-permanent').state == 'closed'
+
+
+def test_cancelled_async_probe_frees_the_breaker():
+    import asyncio
+
+    policy = RetryPolicy(breaker_threshold=1, breaker_reset_s=0.05)
+
+    async def fail():
+        raise TimeoutError()
+
+    async def ok():
+        return 'ok'
+
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            await policy.acall(fail, 'test-probe-cancel')
+        await asyncio.sleep(0.06)
+        probe = asyncio.create_task(policy.acall(lambda: asyncio.sleep(10), 'test-probe-cancel'))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        await asyncio.sleep(0.06)
+        return await policy.acall(ok, 'test-probe-cancel')
+
+    assert asyncio.run(scenario()) == 'ok'
+
+
+class FlakyProvider(MockProvider):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = list(failures)
+
+    def generate_text(self, prompt, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        return super().generate_text(prompt, **kwargs)
+
+
+def test_generative_action_uses_context_policy():
+    ctx = ExecutionContext(ai_client=FlakyProvider([TimeoutError('t1')]),
+                           retry_policy=RetryPolicy(max_attempts=2, base_delay_s=0.01))
+    out = GenerativeAction({'id': 'g', 'prompt': 'hi'}).execute(ctx)
+    assert out.meta['attempts'] == 2
+    ctx = ExecutionContext(ai_client=FlakyProvider([HTTPError(401)]),
+                           retry_policy=RetryPolicy(max_attempts=3, base_delay_s=0.01))
+    with pytest.raises(HTTPError):
+        GenerativeAction({'id': 'g', 'prompt': 'hi'}).execute(ctx)
+
+
+def test_openai_text_errors_are_raised_not_echoed(monkeypatch):
+    client = MagicMock()
+    client.chat.completions.create.side_effect = HTTPError(500)
+    monkeypatch.setattr('docflow.ai.providers.openai.OpenAI', lambda *a, **k: client)
+    provider = OpenAIProvider(api_key='k', model='gpt-test')
+    with pytest.raises(HTTPError):
+        provider.generate_text('secret prompt')
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from docflow.ai.factory import make_ai_client
+from docflow.ai.providers.mock import MockProvider
+from docflow.ai.providers.openai import OpenAIProvider
+from docflow.ai.ratelimit import RateLimiter, RateLimitedAIClient
+from docflow.ai.response_cache import CachingAIClient, ResponseCache
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+
+
+def _action(**extra):
+    return GenerativeAction({'id': 'g', 'type': 'generative', 'prompt': 'tell me a long story', 'stream': True, **extra})
+
+
+def test_mock_stream_matches_full_text():
+    provider = MockProvider()
+    chunks = list(provider.stream_text('a b c'))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == provider.generate_text('a b c')['text']
+
+
+def test_generative_action_consumes_stream():
+    ctx = ExecutionContext()
+    ctx.ai_client = make_ai_client({'provider': 'mock'})
+    seen = []
+    ctx.on_stream = lambda action_id, chunk: seen.append((action_id, chunk))
+    res = _action().execute(ctx)
+    assert res.data == 'MOCK_TEXT:tell me a long story'
+    assert ''.join(c for _, c in seen) == res.data and {a for a, _ in seen} == {'g'}
+    assert res.meta['streamed'] and res.meta['stream_chunks'] == len(seen)
+    assert res.meta['ttft_s'] is not None and 'tokens_per_s' in res.meta
+
+
+def test_async_generative_action_consumes_stream():
+    ctx = ExecutionContext()
+    ctx.ai_client = MockProvider()
+    seen = []
+    ctx.on_stream = lambda action_id, chunk: seen.append(chunk)
+    res = asyncio.run(_action().aexecute(ctx))
+    assert res.data == ''.join(seen) and res.meta['streamed']
+
+
+def test_stream_disabled_by_default():
+    ctx = ExecutionContext()
+    ctx.ai_client = MockProvider()
+    ctx.on_stream = MagicMock()
+    res = _action(stream=False).execute(ctx)
+    assert 'streamed' not in res.meta and not ctx.on_stream.called
+
+
+def test_response_cache_stores_completed_stream(tmp_path):
+    client = CachingAIClient(MockProvider(), ResponseCache(tmp_path))
+    first = list(client.stream_text('a b c'))
+    assert len(first) > 1
+    assert list(client.stream_text('a b c')) == [''.join(first)]
+    assert client.generate_text('a b c')['meta']['response_cache'] == 'hit'
+
+
+def test_rate_limited_stream_debits_output(tmp_path):
+    limiter = RateLimiter('mock-s', tpm=6000, state_dir=tmp_path)
+    client = RateLimitedAIClient(MockProvider(), limiter)
+    text = ''.join(client.stream_text('x' * 400))
+    tokens = limiter._load(time.time())['tokens']
+    assert tokens < 6000 - 100 - len(text) // 4 + 5
+
+
+def test_openai_stream_yields_deltas(monkeypatch):
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=c))]) for c in ('Hel', None, 'lo')]
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter(chunks)
+    monkeypatch.setattr('docflow.ai.providers.openai.OpenAI', lambda *a, **k: client)
+    provider = OpenAIProvider(api_key='k', model='gpt-test')
+    assert list(provider.stream_text('hi')) == ['Hel', 'lo']
+    assert client.chat.completions.create.call_args.kwargs['stream'] is True
@@ -0,0 +1,69 @@
+import threading
+import time
+from docflow.ai.providers.mock import MockProvider
+from docflow.ai.upload_cache import UploadCache, file_digest, upload_files
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+
+
+class SlowUploads(MockProvider):
+    def __init__(self, ttl=None):
+        super().__init__()
+        self.uploads = []
+        self.threads = set()
+        self.file_ttl_s = ttl
+
+    def upload_file(self, path, mime_type=None):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.05)
+        self.uploads.append(path)
+        return super().upload_file(path, mime_type=mime_type)
+
+
+def _files(tmp_path, n):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f'doc{i}.txt'
+        p.write_text(f'content {i}')
+        paths.append(p)
+    return paths
+
+
+def test_uploads_are_reused_across_actions_and_runs(tmp_path):
+    docs = _files(tmp_path, 3)
+    cache_dir = tmp_path / 'kb'
+    cfg = {'id': 'a', 'kb': {'enabled': True, 'strategy': 'upload', 'paths': [str(tmp_path / '*.txt')]}}
+    client = SlowUploads()
+    for _ in range(2):
+        ctx = ExecutionContext(ai_client=client, kb_cache_dir=cache_dir)
+        GenerativeAction(cfg).execute(ctx)
+    assert sorted(client.uploads) == sorted(str(p) for p in docs)
+    # a copy with the same content, under another name, reuses the same remote file
+    copy = tmp_path / 'sub' / 'copy.txt'
+    copy.parent.mkdir()
+    copy.write_text('content 0')
+    refs, stats = upload_files(client, [{'path': str(copy)}], cache_dir)
+    assert stats == {'reused': 1, 'uploaded': 0, 'failed': 0}
+    assert refs == [{'id': f'mock://{docs[0]}', 'mime_type': 'text/plain'}]
+
+
+def test_misses_upload_in_parallel_and_keep_order(tmp_path):
+    docs = _files(tmp_path, 6)
+    client = SlowUploads()
+    t0 = time.time()
+    refs, stats = upload_files(client, [{'path': str(p)} for p in docs], tmp_path / 'kb', max_workers=3)
+    assert time.time() - t0 < 0.05 * 6
+    assert len(client.threads) > 1
+    assert [r['id'] for r in refs] == [f'mock://{p}' for p in docs]
+    assert stats['uploaded'] == 6
+
+
+def test_expired_entries_are_uploaded_again(tmp_path):
+    (doc,) = _files(tmp_path, 1)
+    client = SlowUploads(ttl=0.01)
+    upload_files(client, [{'path': str(doc)}], tmp_path / 'kb')
+    time.sleep(0.02)
+    _, stats = upload_files(client, [{'path': str(doc)}], tmp_path / 'kb')
+    assert stats['uploaded'] == 1
+    entry = UploadCache(tmp_path / 'kb' / 'uploads', 'SlowUploads').get(file_digest(doc))
+    assert entry is None or entry['expires_at'] > time.time()
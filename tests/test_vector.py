@@ -0,0 +1,139 @@
+import os
+import time
+import numpy as np
+from docflow.ai.coalesce import CoalescingAIClient
+from docflow.ai.providers.mock import MockProvider
+from docflow.ai.ratelimit import RateLimitedAIClient
+from docflow.ai.retry import RetryPolicy
+from docflow.core.actions.generative import GenerativeAction
+from docflow.core.context import ExecutionContext
+from docflow.kb import vector
+from docflow.kb.strategies import kb_strategy_processor
+
+
+class CountingEmbedder(vector.HashingEmbedder):
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.seen = []
+
+    def embed(self, texts):
+        self.seen.extend(texts)
+        return super().embed(texts)
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    emb = vector.HashingEmbedder(128)
+    a, b, c = emb.embed(['prune the tomatoes', 'prune tomatoes weekly', 'cook the pasta'])
+    assert np.allclose(a, vector.HashingEmbedder(128).embed(['prune the tomatoes'])[0])
+    assert abs(np.linalg.norm(a) - 1) < 1e-5
+    assert a @ b > a @ c
+    assert not vector.HashingEmbedder(128).embed(['']).any()
+
+
+def test_strategy_returns_closest_chunks(tmp_path, text_kb):
+    kb = text_kb
+    cfg = {'enabled': True, 'paths': [str(kb / '*')], 'strategy': 'vector', 'query': 'how to {{ verb }} tomatoes',
+           'top_k': 1}
+    result = kb_strategy_processor.process_kb(cfg, {'verb': 'prune', '_kb_cache_dir': tmp_path / 'cache'})
+    assert result['kb_text'].startswith('Tomatoes need sun')
+    index_dir = next((tmp_path / 'cache' / 'vector').iterdir())
+    assert {p.name.split('-')[0] for p in index_dir.iterdir()} == {'manifest.json', 'vectors', 'table', 'chunks'}
+
+
+def test_reindexing_embeds_only_changed_chunks(tmp_path, text_kb):
+    kb = text_kb
+    files = sorted(kb.iterdir())
+    index_dir = tmp_path / 'vec'
+    emb = CountingEmbedder()
+    first = vector.vector_index(files, emb, index_dir, chunk_size=30, overlap=0)
+    assert len(emb.seen) == len(first)
+    assert isinstance(first.vectors, np.memmap) and first.vectors.dtype == np.float32
+
+    # a later run (empty process memo) maps the saved build without embedding
+    vector._loaded.clear()
+    again = vector.vector_index(files, CountingEmbedder(), index_dir, chunk_size=30, overlap=0)
+    assert np.array_equal(again.vectors, first.vectors)
+
+    # only the edited (second) chunk of garden.txt is embedded again
+    emb = CountingEmbedder()
+    (kb / 'garden.txt').write_text('Tomatoes need sun and water. Prune the tomatoes in August.')
+    os.utime(kb / 'garden.txt', ns=(1, 1))
+    changed = vector.vector_index(files, emb, index_dir, chunk_size=30, overlap=0)
+    assert emb.seen == ['rune the tomatoes in August.']
+    q = emb.embed(['august'])[0]
+    assert 'August' in changed.chunk(changed.search(q, 1)[0][1])
+
+    # removed files drop out; a different embedder re-embeds everything
+    emb = CountingEmbedder(dim=32)
+    smaller = vector.vector_index(files[1:], emb, index_dir, chunk_size=30, overlap=0)
+    assert len(emb.seen) == len(smaller) and smaller.vectors.shape[1] == 32
+    assert {smaller.source(i) for i in range(len(smaller))} == {str(f) for f in files[1:]}
+    assert len(list(index_dir.glob('vectors-*.npy'))) == 1
+
+
+def test_provider_embeddings_through_an_action(tmp_path, text_kb):
+    kb = text_kb
+    provider = MockProvider()
+    ctx = ExecutionContext(assets_dir=str(tmp_path), kb_cache_dir=tmp_path / 'kbcache', global_vars={'q': 'pasta'},
+                           ai_client=CoalescingAIClient(provider))
+    cfg = {'enabled': True, 'paths': [str(kb / '*')], 'strategy': 'vector', 'embedder': 'provider',
+           'query': '{{ q }}', 'top_k': 1}
+    res = GenerativeAction({'id': 'g', 'prompt': 'KB: {{kb}}', 'kb': cfg}).execute(ctx)
+    assert 'cook the pasta' in res.data
+    calls = provider.stats['calls']
+    ctx.global_vars['q'] = 'tomatoes'
+    res = GenerativeAction({'id': 'g2', 'prompt': 'KB: {{kb}}', 'kb': cfg}).execute(ctx)
+    assert 'omatoes' in res.data
+    # the index is reused: one embedding call for the query, one generation
+    assert provider.stats['calls'] == calls + 2
+
+
+class FlakyEmbeddings(MockProvider):
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    def embed_texts(self, texts, model=None):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError('embeddings timed out')
+        return super().embed_texts(texts, model=model)
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, tokens=1):
+        self.acquired.append(tokens)
+
+    def debit(self, tokens):
+        pass
+
+
+def test_provider_embeddings_go_through_wrappers_and_retries():
+    provider = FlakyEmbeddings()
+    limiter = RecordingLimiter()
+    client = CoalescingAIClient(RateLimitedAIClient(provider, limiter))
+    emb = vector.make_embedder({'embedder': 'provider'}, client,
+                               RetryPolicy(max_attempts=2, base_delay_s=0, breaker_threshold=5))
+    assert emb.key == 'provider-FlakyEmbeddings-mock-1'
+    out = emb.embed(['prune the tomatoes', 'cook the pasta'])
+    assert out.shape == (2, 64) and provider.failures == 0
+    assert len(limiter.acquired) == 2  # the failed attempt was throttled too
+
+
+def test_lookup_on_a_large_index_is_fast():
+    rng = np.random.default_rng(0)
+    n, dim = 100000, 256
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    table = {'text_offsets': np.zeros(n + 1, dtype=np.int64), 'chunk_file': np.zeros(n, dtype=np.int32),
+             'chunk_hash': np.zeros(n, dtype='S16')}
+    index = vector.VectorIndex(vectors, table, b'', ['f'])
+    index.search(vectors[0], 10)
+    t0 = time.perf_counter()
+    for i in (1, 2, 3):
+        hits = index.search(vectors[i], 10)
+        assert hits[0][1] == i and len(hits) <= 10
+    assert (time.perf_counter() - t0) / 3 < 0.05
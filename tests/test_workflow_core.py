@@ -35,3 +35,111 @@ def test_execute_and_chaining_and_exports():
     assert "gen1" in mapping and "code1" in mapping
     assert ctx.global_vars.get("from_code") == "ok"
     assert ctx.global_vars.get("greeting_export") == "code result - done"
+
+
+def test_parallel_execution_overlaps_and_merges_in_order():
+    import threading
+    import time
+    from docflow.ai.providers.mock import MockProvider
+
+    class SlowProvider(MockProvider):
+        def __init__(self):
+            super().__init__()
+            self.active = 0
+            self.peak = 0
+            self.lock = threading.Lock()
+
+        def generate_text(self, prompt, **kwargs):
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.2)
+            with self.lock:
+                self.active -= 1
+            return {'text': '{"%s": 1}' % prompt, 'meta': {'provider': 'mock'}}
+
+    provider = SlowProvider()
+    ctx = ExecutionContext(max_workers=4)
+    ctx.ai_client = provider
+    actions = [
+        {"id": "a", "type": "generative", "prompt": "a", "vars": {"shared": "a"}},
+        {"id": "b", "type": "generative", "prompt": "b", "vars": {"shared": "b"}},
+        {"id": "c", "type": "generative", "prompt": "c", "vars": {"shared": "c"}},
+        {"id": "d", "type": "generative", "prompt": "d", "deps": ["a", "b", "c"],
+         "exports": [{"name": "seen", "source": "result_text", "jinja": "{{vars.shared}}"}]},
+    ]
+    t0 = time.time()
+    mapping = execute_workflow(actions, ctx)
+    elapsed = time.time() - t0
+
+    assert provider.peak == 3
+    assert elapsed < 0.75
+    assert list(mapping) == ["a", "b", "c", "d"]
+    # merged in toposort order: last independent writer wins, as in a sequential run
+    assert ctx.global_vars["shared"] == "c"
+    assert ctx.global_vars["seen"] == "c"
+    assert all(ctx.global_vars[k] == 1 for k in "abcd")
+
+
+class _TimedProvider:
+    """Sleeps ``durations[name]`` seconds for ``name:...`` prompts and emits ``{name: 1}``."""
+
+    def __init__(self, durations):
+        self.durations = durations
+        self.prompts = []
+
+    def generate_text(self, prompt, **kwargs):
+        import json
+        import time
+
+        self.prompts.append(prompt)
+        name = prompt.split(':')[0]
+        time.sleep(self.durations[name])
+        return {'text': json.dumps({name: 1}), 'meta': {'provider': 'mock'}}
+
+    async def agenerate_text(self, prompt, **kwargs):
+        import asyncio
+        import json
+
+        self.prompts.append(prompt)
+        name = prompt.split(':')[0]
+        await asyncio.sleep(self.durations[name])
+        return {'text': json.dumps({name: 1}), 'meta': {'provider': 'mock'}}
+
+
+def _chain_behind_slow_action():
+    return [
+        {"id": "slow", "type": "generative", "prompt": "slow"},
+        {"id": "f1", "type": "generative", "prompt": "f1"},
+        {"id": "f2", "type": "generative", "prompt": "f2", "deps": ["f1"]},
+        {"id": "f3", "type": "generative", "prompt": "f3:{{ f1 }}{{ f2 }}{{ slow }}", "deps": ["f2"],
+         "exports": [{"name": "chain", "source": "result_text", "jinja": "{{vars.f1}}{{vars.f2}}{{vars.slow}}"}]},
+    ]
+
+
+def test_parallel_chain_is_not_held_behind_a_slow_action():
+    import asyncio
+    import time
+    from docflow.core.workflow import aexecute_workflow
+
+    durations = {"slow": 1.0, "f1": 0.2, "f2": 0.2, "f3": 0.2}
+    # warm up action imports so the timing covers scheduling only
+    execute_workflow([{"id": "warm", "type": "generative", "prompt": "warm"}],
+                     ExecutionContext(ai_client=_TimedProvider({"warm": 0})))
+    for run in ("threads", "async"):
+        ctx = ExecutionContext(max_workers=4)
+        provider = _TimedProvider(durations)
+        ctx.ai_client = provider
+        t0 = time.time()
+        if run == "threads":
+            mapping = execute_workflow(_chain_behind_slow_action(), ctx)
+        else:
+            mapping = asyncio.run(aexecute_workflow(_chain_behind_slow_action(), ctx))
+        elapsed = time.time() - t0
+        assert elapsed < 1.25, (run, elapsed)
+        assert list(mapping) == ["slow", "f1", "f2", "f3"]
+        # f3 ran on the vars of its transitive deps, before slow finished
+        assert "f3:11" in provider.prompts
+        # exports are re-rendered by the in-order merge, as in a sequential run
+        assert ctx.global_vars["chain"] == "111"
+        assert all(ctx.global_vars[k] == 1 for k in durations)